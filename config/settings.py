@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,11 +46,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista para medir também os demais middlewares
+    'finances.metrics.RequestMetricsMiddleware',
+    # Leituras nas réplicas, principal depois de uma escrita (finances.routers)
+    'finances.routers.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Shard do usuário autenticado para Wallet/Transaction (finances.sharding)
+    'finances.sharding.ShardScopeMiddleware',
+    # Perfil sob demanda (?_profile=1) para staff; precisa de request.user
+    'finances.profiling.RequestProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,6 +93,147 @@ DATABASES = {
     }
 }
 
+# Perfil de produção do SQLite, ativado com FINANCES_DB_PROFILE=production:
+# - WAL: leitores não esperam pelo escritor (e vice-versa)
+# - synchronous=NORMAL: seguro com WAL, sem fsync a cada commit
+# - busy_timeout: escritas concorrentes esperam o lock em vez de falhar com
+#   "database is locked"; transaction_mode IMMEDIATE pega o lock de escrita já
+#   no início do atomic(), evitando o impasse de dois leitores que tentam
+#   escrever ao mesmo tempo (que o busy_timeout não resolve)
+# - cache_size (KiB, negativo) e mmap_size: páginas em memória por conexão
+# - CONN_MAX_AGE: reaproveita a conexão (e os pragmas) entre requisições
+# Compare os dois perfis com: python manage.py benchmark_concurrency
+
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -65536,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+FINANCES_DB_PROFILE = os.environ.get('FINANCES_DB_PROFILE', 'development')
+
+if FINANCES_DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(
+                f'PRAGMA {name}={value}' for name, value in SQLITE_PRODUCTION_PRAGMAS.items()
+            ),
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_PRODUCTION_PRAGMAS['busy_timeout'] / 1000,
+        },
+    })
+
+# Réplicas de leitura: FINANCES_DB_REPLICAS com os caminhos dos arquivos,
+# separados por vírgula. Localmente, mantenha-as em dia com
+# python manage.py sync_replica --interval 5
+FINANCES_READ_REPLICAS = []
+
+for index, replica_path in enumerate(filter(None, os.environ.get('FINANCES_DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': replica_path.strip(),
+        'OPTIONS': {
+            **DATABASES['default'].get('OPTIONS', {}),
+            # Escritas por engano na réplica falham em vez de divergir do principal
+            'init_command': ';'.join(
+                filter(None, [DATABASES['default'].get('OPTIONS', {}).get('init_command'), 'PRAGMA query_only=1'])
+            ),
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    FINANCES_READ_REPLICAS.append(alias)
+
+# Shards de dados financeiros por usuário: FINANCES_DB_SHARDS com os caminhos
+# dos bancos adicionais, separados por vírgula (default continua sendo um
+# shard). Depois de configurar, rode migrate --database em cada shard e
+# python manage.py rebalance_shards
+FINANCES_SHARDS = ['default']
+
+for index, shard_path in enumerate(filter(None, os.environ.get('FINANCES_DB_SHARDS', '').split(',')), 1):
+    alias = f'shard{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': shard_path.strip()}
+    FINANCES_SHARDS.append(alias)
+
+# Cache do diretório de shards: precisa ser compartilhado por todos os
+# processos (rebalance_shards invalida a posição do usuário movido nele).
+# None lê o diretório uma vez por requisição
+FINANCES_SHARD_CACHE_ALIAS = None
+
+DATABASE_ROUTERS = ['finances.routers.ShardRouter', 'finances.routers.PrimaryReplicaRouter']
+
+# Segundos em que as leituras continuam no principal depois de uma escrita.
+# Precisa passar do atraso máximo da réplica: com sync_replica, o --interval
+# mais o tempo de uma cópia (15 cobre --interval 5 com folga)
+FINANCES_REPLICA_PIN_SECONDS = 15
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Para compartilhar o cache entre processos, troque por exemplo para
+# 'django.core.cache.backends.filebased.FileBasedCache' com LOCATION em disco.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'financial-control',
+    },
+    # Cache limitado das consultas token -> usuário (finances.authentication);
+    # em produção com vários processos, use um cache compartilhado
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'financial-control-tokens',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Cache dos indicadores do dashboard (finances.dashboard_cache)
+FINANCES_DASHBOARD_CACHE_ALIAS = 'default'
+FINANCES_DASHBOARD_CACHE_TIMEOUT = 300
+
+# Projeções Monte Carlo (finances.forecasting)
+FINANCES_FORECAST_WORKERS = None  # tamanho do pool de processos; None: número de CPUs
+FINANCES_FORECAST_PARALLEL_THRESHOLD = 20000
+FINANCES_FORECAST_CACHE_TIMEOUT = 3600
+
+# Arquivamento de transações antigas (finances.archive, comando archive_transactions)
+FINANCES_ARCHIVE_AFTER_DAYS = 730
+
+# Cache da autenticação por token (finances.authentication)
+FINANCES_TOKEN_CACHE_ALIAS = 'tokens'
+FINANCES_TOKEN_CACHE_TIMEOUT = 300
+
+# Métricas por requisição (finances.metrics): requisições acima deste tempo
+# são registradas como WARNING; as demais como INFO
+FINANCES_METRICS_SLOW_MS = 500
+
+# Perfis sob demanda (finances.profiling)
+FINANCES_PROFILE_DIR = BASE_DIR / 'profiles'
+FINANCES_PROFILE_KEEP = 50
+FINANCES_PROFILE_TOP = 25
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+# Para registrar uma linha JSON por requisição, troque o nível de
+# 'finances.metrics' para 'INFO'.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'finances.metrics': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,7 +294,7 @@ LOGOUT_REDIRECT_URL = '/'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'finances.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -1,3 +1,101 @@
 from django.contrib import admin
+from django.contrib.auth.models import User
+from django.http import QueryDict
 
-# Register your models here.
+from . import sharding
+from .models import ArchivedTransaction, Wallet, Transaction
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """Escolhe o shard exibido (com vários shards, cada um é listado à parte)"""
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        if sharding.is_enabled():
+            return [(alias, alias) for alias in sharding.get_shards()]
+        return None
+
+    def queryset(self, request, queryset):
+        # O shard já foi aplicado pelo escopo aberto em ShardedModelAdmin
+        return queryset
+
+
+class ShardedModelAdmin(admin.ModelAdmin):
+    """
+    Admin dos modelos particionados: as views rodam no shard escolhido no
+    filtro (preservado pelo admin em ``_changelist_filters`` nas telas de
+    edição), o primeiro por padrão.
+    """
+    # Campo com o id do dono, para a busca por nome de usuário
+    user_lookup = None
+
+    def get_shard(self, request):
+        alias = request.GET.get(ShardListFilter.parameter_name)
+        if alias is None:
+            alias = QueryDict(request.GET.get('_changelist_filters', '')).get(ShardListFilter.parameter_name)
+        return alias if alias in sharding.get_shards() else sharding.get_shards()[0]
+
+    def get_list_filter(self, request):
+        return [ShardListFilter, *super().get_list_filter(request)]
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term and self.user_lookup:
+            # Os usuários ficam em default: busca pelo nome lá e filtra pelos ids
+            user_ids = list(User.objects.filter(username__icontains=search_term).values_list('pk', flat=True))
+            results |= queryset.filter(**{f'{self.user_lookup}__in': user_ids})
+        return results, may_have_duplicates
+
+    def changelist_view(self, request, extra_context=None):
+        with sharding.shard_scope(self.get_shard(request)):
+            return super().changelist_view(request, extra_context)
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        with sharding.shard_scope(self.get_shard(request)):
+            return super().changeform_view(request, object_id, form_url, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        with sharding.shard_scope(self.get_shard(request)):
+            return super().delete_view(request, object_id, extra_context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        with sharding.shard_scope(self.get_shard(request)):
+            return super().history_view(request, object_id, extra_context)
+
+
+@admin.register(Wallet)
+class WalletAdmin(ShardedModelAdmin):
+    list_display = ('name', 'user', 'balance', 'transaction_count', 'created_at')
+    search_fields = ('name',)
+    user_lookup = 'user_id'
+    readonly_fields = ('balance', 'total_deposits', 'total_withdrawals', 'total_dividends', 'transaction_count')
+
+
+@admin.register(Transaction)
+class TransactionAdmin(ShardedModelAdmin):
+    list_display = ('wallet', 'transaction_type', 'amount', 'date', 'created_at')
+    list_filter = ('transaction_type', 'date')
+    search_fields = ('description', 'wallet__name')
+    user_lookup = 'wallet__user_id'
+    list_select_related = ('wallet',)
+    raw_id_fields = ('wallet',)
+
+
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(ShardedModelAdmin):
+    """Somente leitura: o arquivo é mantido por finances.archive"""
+    list_display = ('wallet', 'transaction_type', 'amount', 'date', 'archived_at')
+    list_filter = ('transaction_type', 'date')
+    search_fields = ('description', 'wallet__name')
+    user_lookup = 'wallet__user_id'
+    list_select_related = ('wallet',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
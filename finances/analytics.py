@@ -0,0 +1,233 @@
+"""
+Indicadores de carteira vetorizados com NumPy.
+
+As colunas ``(carteira, data, tipo, valor)`` das transações são lidas em uma
+única consulta e carregadas em arrays; médias móveis de rendimentos, evolução
+do dividend yield, drawdowns do saldo e a divisão entre aportes e retorno por
+carteira são calculados com operações vetorizadas (``bincount``, ``cumsum``,
+``maximum.accumulate``), sem laços Python por transação.
+
+O NumPy é opcional (ver requirements.txt): sem ele, ``is_available()`` é
+False e ``require_numpy()`` levanta ``ImproperlyConfigured``.
+"""
+from collections import namedtuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Case, CharField, FloatField, IntegerField, Value, When
+from django.db.models.functions import Cast
+
+from . import ledger
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depende do ambiente
+    np = None
+
+
+# Código numérico de cada tipo de transação nas colunas
+TYPE_CODES = {transaction_type: code for code, transaction_type in enumerate(ledger.TYPE_FIELDS)}
+DEPOSIT, WITHDRAWAL, DIVIDEND = (TYPE_CODES[t] for t in ('deposit', 'withdrawal', 'dividend'))
+
+DEFAULT_WINDOW = 3
+CHUNK_SIZE = 20000
+
+Columns = namedtuple('Columns', ['wallet_ids', 'dates', 'types', 'amounts'])
+
+
+def is_available():
+    return np is not None
+
+
+def require_numpy():
+    if np is None:
+        raise ImproperlyConfigured('finances.analytics requer o NumPy (pip install numpy)')
+
+
+def load_columns(transactions, chunk_size=CHUNK_SIZE, archived=None):
+    """
+    Lê ``(wallet_id, date, tipo, valor)`` das transações em uma única consulta,
+    ordenada por data, e devolve ``Columns`` com arrays NumPy. Datas e valores
+    chegam do banco já como texto ISO e float, evitando criar ``date`` e
+    ``Decimal`` linha a linha. ``archived`` são as transações arquivadas das
+    mesmas carteiras (ver ``finances.archive``), lidas em uma segunda consulta.
+    """
+    require_numpy()
+    columns = _query_columns(transactions, chunk_size)
+    if archived is None:
+        return columns
+    archived_columns = _query_columns(archived, chunk_size)
+    if not len(archived_columns.dates):
+        return columns
+    # Transações lançadas depois com data antiga podem ser anteriores às arquivadas
+    merged = [np.concatenate(parts) for parts in zip(archived_columns, columns)]
+    order = np.argsort(merged[1], kind='stable')
+    return Columns(*(column[order] for column in merged))
+
+
+def _query_columns(transactions, chunk_size):
+    rows = (
+        transactions.order_by('date', 'id')
+        .annotate(
+            date_text=Cast('date', CharField()),
+            type_code=Case(
+                *[When(transaction_type=t, then=Value(code)) for t, code in TYPE_CODES.items()],
+                output_field=IntegerField(),
+            ),
+            amount_float=Cast('amount', FloatField()),
+        )
+        .values_list('wallet_id', 'date_text', 'type_code', 'amount_float')
+        .iterator(chunk_size=chunk_size)
+    )
+
+    chunks = []
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            chunks.append(_chunk_arrays(batch))
+            batch = []
+    if batch or not chunks:
+        chunks.append(_chunk_arrays(batch))
+    return Columns(*(np.concatenate(parts) for parts in zip(*chunks)))
+
+
+def _chunk_arrays(batch):
+    wallet_ids, dates, types, amounts = zip(*batch) if batch else ((), (), (), ())
+    return (
+        np.array(wallet_ids, dtype=np.int64),
+        np.array(dates, dtype='datetime64[D]'),
+        np.array(types, dtype=np.int8),
+        np.array(amounts, dtype=np.float64),
+    )
+
+
+def signed_amounts(columns):
+    """Efeito de cada transação no saldo (saques negativos)"""
+    signs = np.ones(len(ledger.TYPE_FIELDS))
+    for transaction_type, code in TYPE_CODES.items():
+        signs[code] = ledger.BALANCE_SIGNS[transaction_type]
+    return columns.amounts * signs[columns.types]
+
+
+def moving_average(values, window):
+    """Média móvel simples; os primeiros ``window - 1`` pontos usam a janela disponível"""
+    cumulative = np.cumsum(np.insert(values, 0, 0.0))
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    upper = np.arange(1, len(values) + 1)
+    return (cumulative[upper] - cumulative[upper - counts]) / counts
+
+
+def monthly_metrics(columns, window=DEFAULT_WINDOW):
+    """
+    Totais mensais por tipo, saldo no fim de cada mês, média móvel dos
+    rendimentos e dividend yield (rendimentos do mês sobre o saldo inicial
+    do mês; acumulado em 12 meses sobre o saldo de 12 meses antes).
+    """
+    if not len(columns.dates):
+        return {'months': []}
+    months = columns.dates.astype('datetime64[M]')
+    first = months.min()
+    index = (months - first).astype(np.int64)
+    size = int(index.max()) + 1
+
+    totals = {
+        code: np.bincount(index, weights=np.where(columns.types == code, columns.amounts, 0.0), minlength=size)
+        for code in TYPE_CODES.values()
+    }
+    net = totals[DEPOSIT] - totals[WITHDRAWAL] + totals[DIVIDEND]
+    balance = np.cumsum(net)
+    opening = balance - net
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        monthly_yield = np.where(opening > 0, totals[DIVIDEND] / opening, np.nan)
+        dividends_12m = moving_average(totals[DIVIDEND], 12) * np.minimum(np.arange(1, size + 1), 12)
+        base_12m = np.concatenate([np.zeros(min(12, size)), balance[:max(size - 12, 0)]])
+        trailing_yield = np.where(base_12m > 0, dividends_12m / base_12m, np.nan)
+
+    return {
+        'months': [str(month) for month in first + np.arange(size)],
+        'deposits': totals[DEPOSIT],
+        'withdrawals': totals[WITHDRAWAL],
+        'dividends': totals[DIVIDEND],
+        'balance': balance,
+        'income_moving_average': moving_average(totals[DIVIDEND], window),
+        'dividend_yield': monthly_yield,
+        'trailing_12m_yield': trailing_yield,
+    }
+
+
+def drawdown(columns):
+    """
+    Drawdown do saldo diário: queda relativa em relação ao maior saldo
+    anterior. Devolve o máximo (com datas do pico e do vale) e o atual.
+    """
+    if not len(columns.dates):
+        return {'max_drawdown': 0.0, 'peak_date': None, 'trough_date': None, 'current_drawdown': 0.0}
+    balance = np.cumsum(signed_amounts(columns))
+    # Saldo ao fim de cada dia: última transação de cada data (colunas ordenadas por data)
+    last_of_day = np.append(columns.dates[1:] != columns.dates[:-1], True)
+    days, balance = columns.dates[last_of_day], balance[last_of_day]
+
+    peaks = np.maximum.accumulate(balance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = np.where(peaks > 0, (peaks - balance) / peaks, 0.0)
+    trough = int(np.argmax(drawdowns))
+    peak = int(np.argmax(balance[:trough + 1])) if drawdowns[trough] > 0 else trough
+    return {
+        'max_drawdown': _round(drawdowns[trough], 6),
+        'peak_date': str(days[peak]) if drawdowns[trough] > 0 else None,
+        'trough_date': str(days[trough]) if drawdowns[trough] > 0 else None,
+        'current_drawdown': _round(drawdowns[-1], 6),
+    }
+
+
+def contributions(columns):
+    """
+    Por carteira: aportes líquidos (depósitos - saques), retorno (rendimentos)
+    e retorno sobre os aportes.
+    """
+    if not len(columns.wallet_ids):
+        return []
+    wallet_ids, index = np.unique(columns.wallet_ids, return_inverse=True)
+
+    def per_wallet(code):
+        return np.bincount(index, weights=np.where(columns.types == code, columns.amounts, 0.0),
+                           minlength=len(wallet_ids))
+
+    contributed = per_wallet(DEPOSIT) - per_wallet(WITHDRAWAL)
+    returns = per_wallet(DIVIDEND)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(contributed > 0, returns / contributed, np.nan)
+    return [
+        {
+            'wallet': int(wallet_id),
+            'contributions': _round(contributed[i]),
+            'returns': _round(returns[i]),
+            'return_on_contributions': _round(ratio[i], 6),
+        }
+        for i, wallet_id in enumerate(wallet_ids)
+    ]
+
+
+def _round(value, digits=2):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _round_array(values, digits):
+    return [None if np.isnan(value) else round(value, digits) for value in values.tolist()]
+
+
+def portfolio_analytics(columns, window=DEFAULT_WINDOW):
+    """Todos os indicadores em tipos nativos, prontos para o JSON da API"""
+    require_numpy()
+    monthly = monthly_metrics(columns, window)
+    return {
+        'transaction_count': int(len(columns.dates)),
+        'window': window,
+        'monthly': {
+            key: value if key == 'months' else _round_array(value, 6 if key.endswith('yield') else 2)
+            for key, value in monthly.items()
+        },
+        'drawdown': drawdown(columns),
+        'contributions': contributions(columns),
+    }
@@ -26,18 +26,37 @@ urlpatterns = [
 # PUT    /api/wallets/{id}/               - Atualiza carteira completa
 # PATCH  /api/wallets/{id}/               - Atualização parcial
 # DELETE /api/wallets/{id}/               - Remove carteira
-# GET    /api/wallets/{id}/transactions/  - Transações da carteira
+# GET    /api/wallets/{id}/transactions/  - Transações da carteira (paginadas por ?cursor=)
+# GET    /api/wallets/{id}/archived_transactions/ - Transações arquivadas da carteira (somente leitura)
 # POST   /api/wallets/{id}/add_transaction/ - Adiciona transação à carteira
+# POST   /api/wallets/{id}/import_transactions/ - Importa extrato CSV/OFX (multipart "file")
 # GET    /api/wallets/summary/            - Resumo das carteiras
+# GET    /api/wallets/{id}/series/?start=&end=&granularity=day|week|month - Fluxo e saldo por período
+# GET    /api/wallets/series/?start=&end=&granularity= - Mesma série somando todas as carteiras
+# GET    /api/wallets/{id}/analytics/?window=3 - Indicadores com NumPy (médias móveis, yield, drawdown)
+# GET    /api/wallets/analytics/?window=3 - Mesmos indicadores para todas as carteiras
+# GET    /api/wallets/{id}/balance/?date=2024-06-15 - Saldo e totais no fim do dia (checkpoint + transações)
+# GET    /api/wallets/{id}/forecast/?years=10&paths=10000 - Projeção Monte Carlo (percentis por ano)
 
-# GET    /api/transactions/               - Lista todas as transações
+# GET    /api/transactions/               - Lista todas as transações (paginadas por ?cursor=)
 # POST   /api/transactions/               - Cria nova transação
 # GET    /api/transactions/{id}/          - Busca transação específica
 # PUT    /api/transactions/{id}/          - Atualiza transação completa
 # PATCH  /api/transactions/{id}/          - Atualização parcial
 # DELETE /api/transactions/{id}/          - Remove transação
 # GET    /api/transactions/by_type/?type=deposit - Filtra por tipo
-# GET    /api/transactions/monthly_summary/ - Resumo mensal
+# GET    /api/transactions/monthly_summary/?year=&month= - Resumo mensal
+# GET    /api/transactions/yearly_summary/?year= - Resumo anual, mês a mês
+# POST   /api/transactions/batch/     - Lote de create/update/delete em uma transação
+# GET    /api/transactions/export/?file_format=csv|ndjson&wallet=&archived=1 - Exportação em fluxo
+#
+# /api/wallets/, /api/wallets/{id}/transactions/ e /api/transactions/monthly_summary/
+# enviam ETag (e Last-Modified, por carteira) e respondem 304 a If-None-Match
+# quando nada mudou (ver finances.conditional)
+#
+# Versões assíncronas (ASGI, ver finances.async_views e finances/urls.py), com a mesma saída:
+# GET    /api/async/wallets/, /api/async/wallets/summary/, /api/async/transactions/,
+#        /api/async/transactions/monthly_summary/ e /api/async/dashboard/ (indicadores do dashboard)
 
 # GET    /api/categories/                 - Lista todas as categorias
 # POST   /api/categories/                 - Cria nova categoria
@@ -1,9 +1,48 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from django.db.models import Q
-from .models import Wallet, Transaction
-from .serializers import WalletSerializer, TransactionSerializer
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import F, Q, QuerySet, Sum
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.utils.timezone import now
+from . import analytics, forecasting, sharding
+from .conditional import conditional, user_month_state, user_state, wallet_state
+from .exports import EXPORT_FORMATS, iter_export
+from .fast_serializers import TransactionReadSerializer, WalletReadSerializer
+from .importers import IMPORT_FORMATS, detect_format, import_transactions
+from .models import ArchivedTransaction, Wallet, Transaction, WalletMonthlySummary
+from .pagination import TransactionCursorPagination
+from .renderers import FastJSONRenderer
+from .series import GRANULARITIES, MAX_BUCKETS, build_series, count_buckets
+from .serializers import WalletSerializer, TransactionSerializer, BatchOperationSerializer
+from . import ledger
+
+# Limite de operações aceitas por requisição no endpoint de lote
+BATCH_MAX_OPERATIONS = 500
+
+# Chave usada nas respostas para cada tipo de transação
+TYPE_KEYS = {'deposit': 'deposits', 'withdrawal': 'withdrawals', 'dividend': 'dividends'}
+
+
+def int_query_param(request, name, default, minimum, maximum):
+    """Lê um parâmetro inteiro da query string, dentro de [minimum, maximum]"""
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: 'Deve ser um número inteiro.'})
+    if not minimum <= value <= maximum:
+        raise ValidationError({name: f'Deve estar entre {minimum} e {maximum}.'})
+    return value
+
 
 class WalletViewSet(viewsets.ModelViewSet):
     """
@@ -20,25 +59,54 @@ class WalletViewSet(viewsets.ModelViewSet):
     queryset = Wallet.objects.all()
     serializer_class = WalletSerializer
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     
     def get_queryset(self):
-        """Retorna apenas carteiras do usuário logado"""
-        return Wallet.objects.filter(user=self.request.user)
+        """Retorna apenas carteiras do usuário logado (o saldo serializado é o armazenado)"""
+        return Wallet.objects.filter(user=self.request.user).order_by('created_at', 'id')
+    
+    @conditional(user_state)
+    def list(self, request, *args, **kwargs):
+        """Listagem somente leitura direto de values(), com o saldo armazenado na carteira"""
+        queryset = (
+            Wallet.objects.filter(user=request.user).order_by('created_at', 'id')
+            .values('id', 'name', 'user_id', 'created_at', total_balance=F('balance'))
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(WalletReadSerializer(page).data)
+        return Response(WalletReadSerializer(queryset).data)
     
     def perform_create(self, serializer):
         """Automaticamente associa a carteira ao usuário logado"""
         serializer.save(user=self.request.user)
     
     @action(detail=True, methods=['get'])
+    @conditional(wallet_state)
     def transactions(self, request, pk=None):
         """
-        Endpoint customizado: GET /api/wallets/1/transactions/
-        Retorna todas as transações de uma carteira específica
+        Endpoint customizado: GET /api/wallets/1/transactions/?cursor=...
+        Retorna as transações de uma carteira específica, paginadas por cursor
         """
         wallet = self.get_object()
-        transactions = Transaction.objects.filter(wallet=wallet).order_by('-date', '-created_at')
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        transactions = TransactionReadSerializer.values(Transaction.objects.filter(wallet=wallet))
+        paginator = TransactionCursorPagination()
+        page = paginator.paginate_queryset(transactions, request, view=self)
+        return paginator.get_paginated_response(TransactionReadSerializer(page).data)
+    
+    @action(detail=True, methods=['get'])
+    @conditional(wallet_state)
+    def archived_transactions(self, request, pk=None):
+        """
+        Endpoint customizado: GET /api/wallets/1/archived_transactions/?cursor=...
+        Transações arquivadas da carteira (somente leitura, ver finances.archive),
+        paginadas por cursor como as atuais
+        """
+        wallet = self.get_object()
+        transactions = TransactionReadSerializer.values(ArchivedTransaction.objects.filter(wallet=wallet))
+        paginator = TransactionCursorPagination()
+        page = paginator.paginate_queryset(transactions, request, view=self)
+        return paginator.get_paginated_response(TransactionReadSerializer(page).data)
     
     @action(detail=True, methods=['post'])
     def add_transaction(self, request, pk=None):
@@ -53,21 +121,190 @@ class WalletViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser])
+    def import_transactions(self, request, pk=None):
+        """
+        Endpoint customizado: POST /api/wallets/1/import_transactions/ (multipart, campo "file")
+        Importa um extrato CSV ou OFX em lotes e retorna o relatório com erros por linha
+        """
+        wallet = self.get_object()
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'Envie o extrato no campo "file".'})
+        
+        import_format = request.data.get('file_format') or detect_format(upload.name)
+        if import_format not in IMPORT_FORMATS:
+            raise ValidationError({'file_format': f'Use um de: {", ".join(IMPORT_FORMATS)}.'})
+        
+        report = import_transactions(wallet, upload, import_format)
+        return Response(report.as_dict(), status=status.HTTP_201_CREATED if report.created else status.HTTP_200_OK)
+    
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """
         Endpoint customizado: GET /api/wallets/summary/
         Retorna resumo de todas as carteiras do usuário
         """
-        wallets = self.get_queryset()
-        total_balance = sum([w.get_total_balance() for w in wallets])
+        wallets = list(self.get_queryset().with_balances())
+        total_balance = float(sum(w.total_balance for w in wallets))
         
         return Response({
-            'total_wallets': wallets.count(),
+            'total_wallets': len(wallets),
             'total_balance': total_balance,
             'wallets': WalletSerializer(wallets, many=True).data
         })
 
+    def _series_params(self, request):
+        """Intervalo (start/end, padrão: últimos 12 meses) e granularidade da série"""
+        params = {}
+        for name in ('start', 'end'):
+            value = request.query_params.get(name)
+            if value:
+                try:
+                    params[name] = parse_date(value)
+                except ValueError:
+                    params[name] = None
+                if params[name] is None:
+                    raise ValidationError({name: 'Use o formato AAAA-MM-DD.'})
+        end = params.get('end') or now().date()
+        start = params.get('start') or end - timedelta(days=365)
+        granularity = request.query_params.get('granularity') or 'month'
+        
+        if granularity not in GRANULARITIES:
+            raise ValidationError({'granularity': f'Use um de: {", ".join(GRANULARITIES)}.'})
+        if start > end:
+            raise ValidationError({'start': 'Deve ser anterior ou igual a end.'})
+        if count_buckets(start, end, granularity) > MAX_BUCKETS:
+            raise ValidationError({'granularity': f'O intervalo excede {MAX_BUCKETS} períodos; use uma granularidade maior.'})
+        return start, end, granularity
+    
+    def _series_response(self, transactions, archived, current_balance, wallet_id, request):
+        start, end, granularity = self._series_params(request)
+        series = build_series(transactions, current_balance, start, end, granularity, archived)
+        return Response({
+            'wallet': wallet_id,
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'opening_balance': series.opening_balance,
+            'closing_balance': series.closing_balance,
+            'buckets': [
+                {
+                    'period': bucket.period,
+                    **{TYPE_KEYS[transaction_type]: total for transaction_type, total in bucket.totals.items()},
+                    'net': bucket.net,
+                    'transaction_count': bucket.transaction_count,
+                    'balance': bucket.balance,
+                }
+                for bucket in series.buckets
+            ],
+        })
+    
+    @action(detail=True, methods=['get'])
+    def series(self, request, pk=None):
+        """
+        Endpoint customizado: GET /api/wallets/1/series/?start=2021-01-01&end=2025-12-31&granularity=month
+        Entradas, saídas, rendimentos e saldo acumulado por dia, semana ou mês,
+        agrupados no banco em uma única consulta
+        """
+        wallet = get_object_or_404(Wallet.objects.filter(user=request.user).only('id', 'balance'), pk=pk)
+        return self._series_response(
+            Transaction.objects.filter(wallet=wallet), ArchivedTransaction.objects.filter(wallet=wallet),
+            wallet.balance, wallet.id, request,
+        )
+    
+    @action(detail=False, methods=['get'], url_path='series')
+    def all_series(self, request):
+        """
+        Endpoint customizado: GET /api/wallets/series/?start=&end=&granularity=week
+        Mesma série de /api/wallets/{id}/series/ somando todas as carteiras do usuário
+        """
+        current_balance = Wallet.objects.filter(user=request.user).aggregate(total=Sum('balance'))['total']
+        return self._series_response(
+            Transaction.objects.filter(wallet__user=request.user),
+            ArchivedTransaction.objects.filter(wallet__user=request.user),
+            current_balance or Decimal('0'), None, request,
+        )
+
+    def _analytics_response(self, transactions, archived, request):
+        if not analytics.is_available():
+            return Response({'detail': 'Indicadores indisponíveis: o NumPy não está instalado.'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        window = int_query_param(request, 'window', analytics.DEFAULT_WINDOW, 1, 36)
+        columns = analytics.load_columns(transactions, archived=archived)
+        return Response(analytics.portfolio_analytics(columns, window))
+    
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """
+        Endpoint customizado: GET /api/wallets/1/analytics/?window=3
+        Médias móveis dos rendimentos mensais, dividend yield, drawdowns do
+        saldo e aportes x retorno, calculados com NumPy sobre uma única consulta
+        """
+        wallet = get_object_or_404(Wallet.objects.filter(user=request.user).only('id'), pk=pk)
+        return self._analytics_response(
+            Transaction.objects.filter(wallet=wallet), ArchivedTransaction.objects.filter(wallet=wallet), request
+        )
+    
+    @action(detail=False, methods=['get'], url_path='analytics')
+    def all_analytics(self, request):
+        """
+        Endpoint customizado: GET /api/wallets/analytics/?window=3
+        Mesmos indicadores de /api/wallets/{id}/analytics/ para todas as carteiras do usuário
+        """
+        return self._analytics_response(
+            Transaction.objects.filter(wallet__user=request.user),
+            ArchivedTransaction.objects.filter(wallet__user=request.user), request,
+        )
+
+    @action(detail=True, methods=['get'])
+    def balance(self, request, pk=None):
+        """
+        Endpoint customizado: GET /api/wallets/1/balance/?date=2024-06-15
+        Saldo e totais acumulados no fim do dia (padrão: hoje), a partir do
+        checkpoint de fim de mês anterior e das transações depois dele
+        """
+        value = request.query_params.get('date')
+        day = now().date()
+        if value:
+            try:
+                day = parse_date(value)
+            except ValueError:
+                day = None
+            if day is None:
+                raise ValidationError({'date': 'Use o formato AAAA-MM-DD.'})
+        wallet = get_object_or_404(Wallet.objects.filter(user=request.user).only('id'), pk=pk)
+        totals, checkpoint = wallet.totals_as_of(day)
+        return Response({
+            'wallet': wallet.id,
+            'date': day,
+            'balance': totals['balance'],
+            **{TYPE_KEYS[transaction_type]: totals[field] for transaction_type, field in ledger.TYPE_FIELDS.items()},
+            'transaction_count': totals['transaction_count'],
+            'checkpoint': checkpoint,
+        })
+
+    @action(detail=True, methods=['get'])
+    def forecast(self, request, pk=None):
+        """
+        Endpoint customizado: GET /api/wallets/1/forecast/?years=10&paths=10000&history=36&seed=
+        Projeção do saldo por Monte Carlo, com aportes e rendimentos ajustados
+        ao histórico; faixas de percentis ao fim de cada ano (em cache até a
+        próxima escrita na carteira)
+        """
+        wallet = get_object_or_404(Wallet.objects.filter(user=request.user).only('id', 'user_id', 'version', 'balance'), pk=pk)
+        if not analytics.is_available():
+            return Response({'detail': 'Projeção indisponível: o NumPy não está instalado.'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        result, cached = forecasting.forecast(
+            wallet,
+            years=int_query_param(request, 'years', forecasting.DEFAULT_YEARS, 1, 50),
+            paths=int_query_param(request, 'paths', forecasting.DEFAULT_PATHS, 100, 200000),
+            history=int_query_param(request, 'history', forecasting.DEFAULT_HISTORY, 1, 600),
+            seed=int_query_param(request, 'seed', None, 0, 2 ** 32 - 1),
+        )
+        return Response({**result, 'cached': cached})
+
 class TransactionViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gerenciar transações.
@@ -83,19 +320,29 @@ class TransactionViewSet(viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TransactionCursorPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     
     def get_queryset(self):
         """Retorna apenas transações do usuário logado"""
         user = self.request.user
         return Transaction.objects.filter(
-            Q(wallet__user=user)
-        ).select_related('wallet').order_by('-date', '-created_at')
+            Q(user=user)
+        ).select_related('wallet').order_by('-date', '-created_at', '-id')
+    
+    def _read_response(self, queryset):
+        """Página de transações serializada direto de values(), sem instanciar modelos"""
+        page = self.paginate_queryset(TransactionReadSerializer.values(queryset))
+        return self.get_paginated_response(TransactionReadSerializer(page).data)
+    
+    def list(self, request, *args, **kwargs):
+        return self._read_response(self.get_queryset())
     
     @action(detail=False, methods=['get'])
     def by_type(self, request):
         """
-        Endpoint customizado: GET /api/transactions/by_type/?type=deposit
-        Filtra transações por tipo
+        Endpoint customizado: GET /api/transactions/by_type/?type=deposit&cursor=...
+        Filtra transações por tipo, paginadas por cursor
         """
         transaction_type = request.query_params.get('type')
         queryset = self.get_queryset()
@@ -103,37 +350,228 @@ class TransactionViewSet(viewsets.ModelViewSet):
         if transaction_type:
             queryset = queryset.filter(transaction_type=transaction_type)
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self._read_response(queryset)
+    
+    def _period_param(self, name, default, minimum, maximum):
+        """Lê um parâmetro inteiro de período (ano/mês) da query string"""
+        return int_query_param(self.request, name, default, minimum, maximum)
     
     @action(detail=False, methods=['get'])
+    @conditional(user_month_state)
     def monthly_summary(self, request):
         """
-        Endpoint customizado: GET /api/transactions/monthly_summary/
-        Retorna resumo mensal das transações
+        Endpoint customizado: GET /api/transactions/monthly_summary/?year=2025&month=10
+        Retorna resumo mensal das transações (padrão: mês atual), a partir
+        dos resumos mensais pré-agregados
         """
-        from django.db.models import Sum
-        from datetime import datetime
+        today = now().date()
+        year = self._period_param('year', today.year, 1, 9999)
+        month = self._period_param('month', today.month, 1, 12)
         
-        current_month = datetime.now().month
-        current_year = datetime.now().year
+        totals = WalletMonthlySummary.objects.filter(
+            wallet__user=request.user, year=year, month=month
+        ).totals()
+        
+        return Response({
+            'month': month,
+            'year': year,
+            'deposits': totals['deposit'],
+            'withdrawals': totals['withdrawal'],
+            'dividends': totals['dividend'],
+            'net_income': totals['deposit'] + totals['dividend'] - totals['withdrawal'],
+            'total_transactions': totals['transaction_count']
+        })
+    
+    @action(detail=False, methods=['get'])
+    def yearly_summary(self, request):
+        """
+        Endpoint customizado: GET /api/transactions/yearly_summary/?year=2025
+        Retorna o resumo anual (padrão: ano atual) com a quebra mês a mês
+        """
+        year = self._period_param('year', now().date().year, 1, 9999)
         
-        queryset = self.get_queryset().filter(
-            date__month=current_month,
-            date__year=current_year
+        rows = (
+            WalletMonthlySummary.objects.filter(wallet__user=request.user, year=year)
+            .order_by('month')
+            .values('month', 'transaction_type')
+            .annotate(total=Sum('total_amount'), count=Sum('transaction_count'))
         )
         
-        deposits = queryset.filter(transaction_type='deposit').aggregate(Sum('amount'))['amount__sum'] or 0
-        withdrawals = queryset.filter(transaction_type='withdrawal').aggregate(Sum('amount'))['amount__sum'] or 0
-        dividends = queryset.filter(transaction_type='dividend').aggregate(Sum('amount'))['amount__sum'] or 0
+        months = {}
+        for row in rows:
+            month = months.setdefault(row['month'], {
+                'month': row['month'], 'deposits': Decimal('0'), 'withdrawals': Decimal('0'),
+                'dividends': Decimal('0'), 'total_transactions': 0,
+            })
+            month[TYPE_KEYS[row['transaction_type']]] += row['total']
+            month['total_transactions'] += row['count']
+        for month in months.values():
+            month['net_income'] = month['deposits'] + month['dividends'] - month['withdrawals']
+        
+        summary = {
+            key: sum((m[key] for m in months.values()), Decimal('0'))
+            for key in ('deposits', 'withdrawals', 'dividends', 'net_income')
+        }
         
         return Response({
-            'month': current_month,
-            'year': current_year,
-            'deposits': deposits,
-            'withdrawals': withdrawals,
-            'dividends': dividends,
-            'net_income': deposits + dividends - withdrawals,
-            'total_transactions': queryset.count()
+            'year': year,
+            **summary,
+            'total_transactions': sum(m['total_transactions'] for m in months.values()),
+            'months': list(months.values()),
         })
-
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Endpoint customizado: GET /api/transactions/export/?file_format=csv&wallet=1&archived=1
+        Exporta as transações do usuário (ou de uma carteira) em CSV ou NDJSON,
+        em fluxo, sem paginação; com archived=1, inclui as arquivadas
+        """
+        export_format = request.query_params.get('file_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'file_format': f'Use um de: {", ".join(EXPORT_FORMATS)}.'})
+        
+        # Carteiras por subconsulta (IN): a exportação percorre o índice por carteira sem ordenar
+        lookup = {'wallet_id__in': Wallet.objects.filter(user=request.user).values('pk')}
+        wallet_id = request.query_params.get('wallet')
+        if wallet_id:
+            if not wallet_id.isdigit():
+                raise ValidationError({'wallet': 'Deve ser um número inteiro.'})
+            lookup['wallet_id'] = wallet_id
+        archived = None
+        if request.query_params.get('archived') in ('1', 'true'):
+            archived = ArchivedTransaction.objects.filter(**lookup)
+        
+        response = StreamingHttpResponse(
+            iter_export(Transaction.objects.filter(**lookup), export_format, archived=archived),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="transacoes.{export_format}"'
+        return response
+    
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Endpoint customizado: POST /api/transactions/batch/
+        Corpo: {"operations": [{"op": "create", "data": {...}},
+                               {"op": "update", "id": 1, "data": {...}},
+                               {"op": "delete", "id": 2}]}
+        Valida todas as operações juntas; se alguma for inválida nada é gravado
+        e a resposta (400) traz o erro de cada item. Caso contrário aplica tudo
+        em uma única transação de banco, com operações em lote.
+        """
+        operations = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        if not isinstance(operations, list) or not operations:
+            raise ValidationError({'operations': 'Envie uma lista de operações.'})
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            raise ValidationError({'operations': f'No máximo {BATCH_MAX_OPERATIONS} operações por lote.'})
+        
+        operations_serializer = BatchOperationSerializer(data=operations, many=True)
+        if not operations_serializer.is_valid():
+            return Response({'results': [
+                {'index': index, 'status': 'error', 'errors': errors} if errors else {'index': index, 'status': 'valid'}
+                for index, errors in enumerate(operations_serializer.errors)
+            ]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results, serializers_by_index, has_errors = self._validate_batch(request, operations_serializer.validated_data)
+        if has_errors:
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not self._apply_batch(operations_serializer.validated_data, serializers_by_index, results):
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results})
+    
+    def _validate_batch(self, request, operations):
+        """Valida as operações com apenas duas consultas (carteiras e transações alvo)"""
+        wallets = {wallet.id: wallet for wallet in Wallet.objects.filter(user=request.user)}
+        target_ids = [operation['id'] for operation in operations if operation['op'] != 'create']
+        instances = {
+            instance.id: instance
+            for instance in Transaction.objects.filter(wallet__user=request.user, pk__in=target_ids).select_related('wallet')
+        }
+        context = {**self.get_serializer_context(), 'wallets': wallets}
+        
+        results, serializers_by_index, seen = [], {}, set()
+        has_errors = False
+        for index, operation in enumerate(operations):
+            result = {'index': index, 'op': operation['op'], 'status': 'valid'}
+            errors = None
+            instance = None
+            if operation['op'] != 'create':
+                instance = instances.get(operation['id'])
+                if instance is None:
+                    errors = {'id': 'Transação não encontrada.'}
+                elif operation['id'] in seen:
+                    errors = {'id': 'Transação repetida no lote.'}
+                seen.add(operation['id'])
+            if errors is None and operation['op'] != 'delete':
+                serializer = TransactionSerializer(
+                    instance, data=operation['data'], partial=instance is not None, context=context
+                )
+                if serializer.is_valid():
+                    serializers_by_index[index] = serializer
+                else:
+                    errors = serializer.errors
+            if errors is not None:
+                result.update(status='error', errors=errors)
+                has_errors = True
+            results.append(result)
+        return results, serializers_by_index, has_errors
+    
+    def _apply_batch(self, operations, serializers_by_index, results):
+        """
+        Aplica as operações já validadas: bulk_create, bulk_update e um único
+        DELETE. As transações alteradas e excluídas são relidas com
+        ``select_for_update()`` dentro da transação, como em
+        ``Transaction.save``: o estado lido na validação pode ter mudado, e o
+        ledger desfaz o efeito do estado atual. Devolve False, sem gravar nada,
+        se alguma delas deixou de existir desde a validação.
+        """
+        target_ids = [operation['id'] for operation in operations if operation['op'] != 'create']
+        created, updated, removed = {}, {}, []
+        with sharding.atomic():
+            targets = {
+                instance.pk: instance
+                for instance in Transaction.objects.select_for_update(of=('self',)).select_related('wallet')
+                .filter(wallet__user=self.request.user, pk__in=target_ids)
+            }
+            missing = False
+            for index, operation in enumerate(operations):
+                if operation['op'] != 'create' and operation['id'] not in targets:
+                    results[index].update(status='error', errors={'id': 'Transação não encontrada.'})
+                    missing = True
+            if missing:
+                return False
+            
+            for index, operation in enumerate(operations):
+                if operation['op'] == 'create':
+                    created[index] = Transaction(**serializers_by_index[index].validated_data)
+                    continue
+                instance = targets[operation['id']]
+                removed.append(instance.ledger_entry())
+                if operation['op'] == 'update':
+                    for attr, value in serializers_by_index[index].validated_data.items():
+                        setattr(instance, attr, value)
+                    updated[index] = instance
+            
+            Transaction.objects.bulk_create(created.values())
+            Transaction.objects.bulk_update(
+                updated.values(), fields=['amount', 'transaction_type', 'date', 'description', 'wallet']
+            )
+            delete_ids = [operation['id'] for operation in operations if operation['op'] == 'delete']
+            if delete_ids:
+                # Exclusão direta, sem o ledger.apply próprio do queryset: o lote aplica tudo de uma vez
+                QuerySet.delete(Transaction.objects.filter(pk__in=delete_ids))
+            ledger.apply(
+                added=[instance.ledger_entry() for instance in [*created.values(), *updated.values()]],
+                removed=removed,
+            )
+        
+        for index, result in enumerate(results):
+            instance = created.get(index) or updated.get(index)
+            if instance is not None:
+                result.update(status='created' if index in created else 'updated',
+                              id=instance.id, data=TransactionSerializer(instance).data)
+            else:
+                result.update(status='deleted', id=operations[index]['id'])
+        return True
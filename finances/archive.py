@@ -0,0 +1,111 @@
+"""
+Arquivamento das transações antigas (armazenamento quente/frio).
+
+A maior parte das leituras toca só os meses recentes, mas as listagens e
+agregações percorrem o histórico inteiro de ``Transaction``. Aqui as
+transações anteriores a um horizonte (``FINANCES_ARCHIVE_AFTER_DAYS``) são
+movidas, em lotes, para ``ArchivedTransaction`` no mesmo banco (o shard do
+usuário), e seus totais são acumulados no saldo de abertura da carteira
+(``WalletOpeningBalance``). Cada lote copia, apaga e atualiza o saldo de
+abertura na mesma transação, então os totais nunca ficam inexatos:
+
+- ``Wallet.balance`` e os resumos mensais já incluem todo o histórico e não
+  mudam com o arquivamento;
+- as séries, os indicadores e a projeção leem também o arquivo (só as linhas
+  do intervalo pedido, pelo índice), e ``rebuild_wallet_totals`` confere os
+  totais e os saldos de abertura com as duas tabelas.
+
+As transações arquivadas são somente leitura: continuam disponíveis em
+``/api/wallets/{id}/archived_transactions/``, no admin e em
+``export_transactions --include-archived``.
+
+Configurações opcionais:
+
+- ``FINANCES_ARCHIVE_AFTER_DAYS``: idade, em dias, a partir da qual as transações são arquivadas (padrão 730)
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, QuerySet
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import ledger, sharding
+
+
+def default_cutoff(today=None, days=None):
+    """Data antes da qual as transações com mais de ``days`` dias (padrão: o horizonte configurado) são arquivadas"""
+    today = today or timezone.now().date()
+    if days is None:
+        days = getattr(settings, 'FINANCES_ARCHIVE_AFTER_DAYS', 730)
+    return today - timedelta(days=days)
+
+
+def opening_updates(entries):
+    """Deltas dos campos de ``WalletOpeningBalance`` para os lançamentos arquivados"""
+    updates = ledger.zero_totals()
+    for entry in entries:
+        ledger.add_entry(updates, entry.transaction_type, entry.amount, entry.count)
+    return updates
+
+
+def archive_wallet(wallet, before, batch_size=1000):
+    """
+    Arquiva as transações da carteira anteriores a ``before``, em lotes de
+    ``batch_size`` (uma transação de banco por lote, no banco da carteira).
+    Devolve a quantidade de transações arquivadas.
+    """
+    from . import dashboard_cache
+    from .models import ArchivedTransaction, Transaction, Wallet, WalletOpeningBalance
+
+    using = wallet._state.db or sharding.shard_for_user(wallet.user_id)
+    archived = 0
+    while True:
+        with sharding.writing(using):
+            rows = list(
+                Transaction.objects.using(using).select_for_update()
+                .filter(wallet_id=wallet.pk, date__lt=before).order_by('pk')[:batch_size]
+            )
+            if not rows:
+                break
+            ArchivedTransaction.objects.using(using).bulk_create([
+                ArchivedTransaction(
+                    wallet_id=row.wallet_id, amount=row.amount, transaction_type=row.transaction_type,
+                    date=row.date, description=row.description, created_at=row.created_at,
+                )
+                for row in rows
+            ])
+            batch = Transaction.objects.using(using).filter(pk__in=[row.pk for row in rows])
+            updates = opening_updates(ledger.entries_from_queryset(batch))
+            # Exclusão sem finances.ledger: os totais da carteira não mudam
+            QuerySet.delete(batch)
+
+            opening, created = WalletOpeningBalance.objects.using(using).get_or_create(
+                wallet_id=wallet.pk, defaults={'archived_before': before, **updates}
+            )
+            if not created:
+                WalletOpeningBalance.objects.using(using).filter(pk=opening.pk).update(
+                    archived_before=Greatest('archived_before', before),
+                    **{field: F(field) + delta for field, delta in updates.items()},
+                )
+            # As listagens mudaram: novo ETag para as respostas já entregues
+            Wallet.objects.using(using).filter(pk=wallet.pk).update(
+                version=F('version') + 1, updated_at=timezone.now()
+            )
+        archived += len(rows)
+
+    if archived:
+        dashboard_cache.invalidate_user(wallet.user_id)
+    return archived
+
+
+def opening_totals(wallet_ids):
+    """
+    Saldos de abertura armazenados das carteiras, no formato de
+    ``ledger.live_totals`` (carteiras sem arquivo ficam zeradas).
+    """
+    from .models import WalletOpeningBalance
+
+    totals = {wallet_id: ledger.zero_totals() for wallet_id in wallet_ids}
+    for row in WalletOpeningBalance.objects.filter(wallet_id__in=list(totals)).values('wallet_id', *ledger.STORED_FIELDS):
+        totals[row.pop('wallet_id')].update(row)
+    return totals
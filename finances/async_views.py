@@ -0,0 +1,161 @@
+"""
+Versões assíncronas (ASGI) dos endpoints de leitura mais acessados.
+
+O DRF não executa views assíncronas, então estas são views Django puras
+que devolvem o mesmo JSON dos ViewSets correspondentes, usando o ORM
+assíncrono (``aaggregate``, ``acount``, ``async for``). O ORM assíncrono do
+Django roda cada consulta via ``sync_to_async(thread_sensitive=True)``: as
+consultas de uma requisição (e as das demais views assíncronas) rodam uma de
+cada vez, na mesma thread, e não em paralelo. O ganho é outro: enquanto o
+banco responde, o loop de eventos continua atendendo as outras requisições
+em vez de prender uma thread do servidor por requisição.
+"""
+from functools import wraps
+
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils.timezone import now
+from django.views.decorators.http import require_GET
+
+from . import dashboard_cache
+from .authentication import aauthenticate
+from .fast_serializers import TransactionReadSerializer, WalletReadSerializer
+from .models import Transaction, Wallet, WalletMonthlySummary
+from .pagination import TransactionCursorPagination
+from .renderers import FastJSONRenderer
+from .views import dividend_aggregates
+
+
+WALLETS_PER_PAGE = 20
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def async_api_view(view):
+    """Somente GET, autenticado por sessão ou token (mesmas regras da API síncrona)"""
+    @require_GET
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aauthenticate(request)
+        if user is None:
+            return json_response({'detail': 'As credenciais de autenticação não foram fornecidas.'}, status=403)
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _wallet_rows(user):
+    return (
+        Wallet.objects.filter(user=user).order_by('created_at', 'id')
+        .values('id', 'name', 'user_id', 'created_at', total_balance=F('balance'))
+    )
+
+
+def _period_param(request, name, default, minimum, maximum):
+    """Parâmetro inteiro de período (ano/mês); devolve (valor, erro)"""
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return default, None
+    try:
+        value = int(value)
+    except ValueError:
+        return None, {name: ['Deve ser um número inteiro.']}
+    if not minimum <= value <= maximum:
+        return None, {name: [f'Deve estar entre {minimum} e {maximum}.']}
+    return value, None
+
+
+@async_api_view
+async def wallet_list(request):
+    """GET /api/async/wallets/?page=N - mesma saída de /api/wallets/"""
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        page = 1
+    offset = (page - 1) * WALLETS_PER_PAGE
+    rows = _wallet_rows(request.user)
+    count = await rows.acount()
+    results = [row async for row in rows[offset:offset + WALLETS_PER_PAGE]]
+    if page > 1 and not results:
+        return json_response({'detail': 'Página inválida.'}, status=404)
+
+    url = request.build_absolute_uri(request.path)
+    return json_response({
+        'count': count,
+        'next': f'{url}?page={page + 1}' if offset + WALLETS_PER_PAGE < count else None,
+        'previous': (f'{url}?page={page - 1}' if page > 2 else url) if page > 1 else None,
+        'results': WalletReadSerializer(results).data,
+    })
+
+
+@async_api_view
+async def wallet_summary(request):
+    """GET /api/async/wallets/summary/ - mesma saída de /api/wallets/summary/"""
+    rows = [row async for row in _wallet_rows(request.user)]
+    return json_response({
+        'total_wallets': len(rows),
+        'total_balance': float(sum(row['total_balance'] for row in rows)),
+        'wallets': WalletReadSerializer(rows).data,
+    })
+
+
+@async_api_view
+async def transaction_list(request):
+    """GET /api/async/transactions/?cursor=... - mesma saída de /api/transactions/"""
+    queryset = TransactionReadSerializer.values(Transaction.objects.filter(user=request.user))
+    paginator = TransactionCursorPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    return json_response(paginator.get_paginated_data(TransactionReadSerializer(page).data))
+
+
+@async_api_view
+async def monthly_summary(request):
+    """GET /api/async/transactions/monthly_summary/?year=&month= - mesma saída da versão síncrona"""
+    today = now().date()
+    year, year_error = _period_param(request, 'year', today.year, 1, 9999)
+    month, month_error = _period_param(request, 'month', today.month, 1, 12)
+    if year_error or month_error:
+        return json_response({**(year_error or {}), **(month_error or {})}, status=400)
+
+    totals = await WalletMonthlySummary.objects.filter(
+        wallet__user=request.user, year=year, month=month
+    ).atotals()
+    return json_response({
+        'month': month,
+        'year': year,
+        'deposits': totals['deposit'],
+        'withdrawals': totals['withdrawal'],
+        'dividends': totals['dividend'],
+        'net_income': totals['deposit'] + totals['dividend'] - totals['withdrawal'],
+        'total_transactions': totals['transaction_count'],
+    })
+
+
+@async_api_view
+async def dashboard_data(request):
+    """
+    GET /api/async/dashboard/ - indicadores do dashboard em JSON, com o mesmo
+    cache por usuário da página.
+    """
+    user = request.user
+    today = now().date()
+
+    async def compute():
+        rows = [
+            row async for row in Wallet.objects.filter(user=user).order_by('created_at', 'id')
+            .values('id', 'name', 'balance')
+        ]
+        dividends = await WalletMonthlySummary.objects.filter(
+            wallet__user=user, transaction_type='dividend'
+        ).aaggregate(**dividend_aggregates(today))
+        return {
+            'wallets': [
+                {'id': row['id'], 'name': row['name'], 'total_balance': float(row['balance'])} for row in rows
+            ],
+            'total': float(sum(row['balance'] for row in rows)),
+            **{key: float(value) for key, value in dividends.items()},
+        }
+
+    return json_response(await dashboard_cache.aget_or_compute(user.id, today, compute))
@@ -0,0 +1,89 @@
+"""
+Autenticação por token com cache das consultas token -> usuário.
+
+``TokenAuthentication`` faz um JOIN ``authtoken_token``/``auth_user`` a cada
+requisição. Aqui o par (usuário, token) fica em cache por um tempo limitado,
+em uma chave derivada do hash do token (o token em si nunca vira chave).
+As entradas são apagadas assim que o token é excluído (``regenerate_token``,
+``delete_token``, admin) ou o usuário é alterado/desativado, via sinais em
+``finances.signals``.
+
+Com vários processos, use um cache compartilhado (Redis, Memcached...) para
+que a revogação valha em todos eles imediatamente; com LocMem cada processo
+só enxerga as próprias invalidações.
+
+Configurações opcionais:
+
+- ``FINANCES_TOKEN_CACHE_ALIAS``: alias do cache usado (padrão ``'default'``)
+- ``FINANCES_TOKEN_CACHE_TIMEOUT``: validade das entradas em segundos (padrão 300)
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+KEY_PREFIX = 'finances:token'
+
+
+def get_cache():
+    return caches[getattr(settings, 'FINANCES_TOKEN_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'FINANCES_TOKEN_CACHE_TIMEOUT', 300)
+
+
+def _cache_key(key):
+    return f'{KEY_PREFIX}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def invalidate_token(key):
+    get_cache().delete(_cache_key(key))
+
+
+def invalidate_user(user_id):
+    """Remove do cache os tokens do usuário (uma consulta pela chave única de Token.user)"""
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    get_cache().delete_many([_cache_key(key) for key in keys])
+
+
+async def aauthenticate(request):
+    """
+    Usuário autenticado de uma view assíncrona (fora do DRF): sessão ou
+    cabeçalho ``Authorization: Token <chave>``, com o mesmo cache. None se anônimo.
+    """
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+
+    auth = request.headers.get('Authorization', '').split()
+    if len(auth) != 2 or auth[0].lower() != CachedTokenAuthentication.keyword.lower():
+        return None
+    cache = get_cache()
+    cache_key = _cache_key(auth[1])
+    cached = await cache.aget(cache_key)
+    if cached is not None:
+        return cached[0]
+    token = await Token.objects.select_related('user').filter(key=auth[1]).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    await cache.aset(cache_key, (token.user, token), get_timeout())
+    return token.user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` que só consulta o banco quando o token não está em cache"""
+
+    def authenticate_credentials(self, key):
+        cache = get_cache()
+        cache_key = _cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        # Tokens inválidos e usuários inativos continuam falhando sem ir para o cache
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, (user, token), get_timeout())
+        return user, token
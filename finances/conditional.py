@@ -0,0 +1,84 @@
+"""
+GET condicional (ETag / Last-Modified) para os endpoints de leitura da API.
+
+O estado de cada recurso vem de ``Wallet.version``/``Wallet.updated_at``,
+mantidos por ``finances.ledger`` a cada escrita: uma consulta pequena sobre a
+tabela de carteiras basta para responder 304 a um ``If-None-Match`` antes de
+qualquer serialização ou agregação sobre as transações.
+"""
+import zlib
+from functools import wraps
+
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .models import Wallet
+
+
+def wallet_state(view, request, pk=None, **kwargs):
+    """``(partes do ETag, última modificação)`` da carteira ``pk`` do usuário, ou None"""
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    row = Wallet.objects.filter(pk=pk, user=request.user).values_list('version', 'updated_at').first()
+    if row is None:
+        return None
+    version, updated_at = row
+    return ('wallet', pk, version), updated_at
+
+
+def user_state(view, request, *args, **kwargs):
+    """
+    ``(partes do ETag, None)`` do conjunto de carteiras do usuário. Não há
+    Last-Modified confiável: excluir uma carteira não deixa data para trás, mas
+    altera a contagem e a soma das versões, então o ETag muda.
+    """
+    state = Wallet.objects.filter(user=request.user).aggregate(
+        count=Count('id'), version=Sum('version'), updated_at=Max('updated_at')
+    )
+    updated_at = state['updated_at'].timestamp() if state['updated_at'] else 0
+    return ('user', request.user.pk, state['count'], state['version'] or 0, f'{updated_at:.6f}'), None
+
+
+def user_month_state(view, request, *args, **kwargs):
+    """Como ``user_state``, mas muda também na virada do mês (período padrão dos resumos)"""
+    parts, last_modified = user_state(view, request)
+    return (*parts, timezone.now().date().strftime('%Y-%m')), last_modified
+
+
+def conditional(state):
+    """
+    Decora uma ação de ViewSet: ``state(view, request, *args, **kwargs)`` devolve
+    ``(partes do ETag, última modificação ou None)`` ou None (deixa a ação seguir,
+    por exemplo para responder 404). Requisições com ``If-None-Match`` (ou
+    ``If-Modified-Since``) ainda válidos recebem 304 sem executar a ação.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            current = state(view, request, *args, **kwargs) if request.method in ('GET', 'HEAD') else None
+            if current is None:
+                return method(view, request, *args, **kwargs)
+
+            parts, last_modified = current
+            # O formato negociado (JSON ou API navegável) e a URL completa entram
+            # no ETag: cada representação/página é um recurso distinto
+            etag = quote_etag('-'.join(str(part) for part in (
+                request.accepted_renderer.format, *parts, zlib.crc32(request.get_full_path().encode())
+            )))
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.headers.setdefault('ETag', etag)
+            if timestamp is not None:
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,118 @@
+"""
+Cache por usuário dos indicadores do dashboard.
+
+Os indicadores ficam em uma chave versionada por usuário; qualquer escrita
+em carteiras ou transações desse usuário (views, API REST ou admin)
+incrementa a versão, tornando as entradas antigas inacessíveis sem precisar
+apagá-las. Funciona com qualquer backend de cache configurado em
+``CACHES`` (LocMem, arquivo, Redis, Memcached...).
+
+Configurações opcionais:
+
+- ``FINANCES_DASHBOARD_CACHE_ALIAS``: alias do cache usado (padrão ``'default'``)
+- ``FINANCES_DASHBOARD_CACHE_TIMEOUT``: validade das entradas em segundos (padrão 300)
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+
+KEY_PREFIX = 'finances:dashboard'
+STATS_KEYS = {
+    'hits': f'{KEY_PREFIX}:stats:hits',
+    'misses': f'{KEY_PREFIX}:stats:misses',
+}
+
+
+def get_cache():
+    return caches[getattr(settings, 'FINANCES_DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'FINANCES_DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def _version_key(user_id):
+    return f'{KEY_PREFIX}:version:{user_id}'
+
+
+def get_version(user_id):
+    """Versão atual dos dados do usuário no cache"""
+    cache = get_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Parte de um valor baseado no relógio para nunca reaproveitar uma
+        # versão antiga caso a chave tenha sido despejada do cache
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user(user_id):
+    """Incrementa a versão do usuário, invalidando os indicadores em cache"""
+    cache = get_cache()
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_users(user_ids):
+    for user_id in set(user_ids):
+        invalidate_user(user_id)
+
+
+def _count(kind):
+    cache = get_cache()
+    key = STATS_KEYS[kind]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def _lookup(user_id, today):
+    """Chave dos indicadores do usuário e o valor em cache (ou None), contando acerto/falta"""
+    key = f'{KEY_PREFIX}:{user_id}:{get_version(user_id)}:{today.isoformat()}'
+    data = get_cache().get(key)
+    _count('hits' if data is not None else 'misses')
+    return key, data
+
+
+def get_or_compute(user_id, today, compute):
+    """
+    Retorna os indicadores do usuário a partir do cache ou, em caso de falta,
+    chama ``compute()`` e armazena o resultado.
+
+    A data de hoje faz parte da chave porque os indicadores mensais e anuais
+    mudam na virada do dia mesmo sem novas escritas.
+    """
+    key, data = _lookup(user_id, today)
+    if data is None:
+        data = compute()
+        get_cache().set(key, data, get_timeout())
+    return data
+
+
+async def aget_or_compute(user_id, today, compute):
+    """Versão assíncrona de ``get_or_compute``; ``compute()`` é uma corrotina"""
+    key, data = await sync_to_async(_lookup)(user_id, today)
+    if data is None:
+        data = await compute()
+        await get_cache().aset(key, data, get_timeout())
+    return data
+
+
+def stats():
+    """Contadores de acertos e faltas do cache do dashboard"""
+    values = get_cache().get_many(STATS_KEYS.values())
+    return {kind: values.get(key, 0) for kind, key in STATS_KEYS.items()}
+
+
+def reset_stats():
+    get_cache().delete_many(STATS_KEYS.values())
@@ -0,0 +1,107 @@
+"""
+Exportação de transações em CSV ou NDJSON (um objeto JSON por linha) em fluxo.
+
+As linhas vêm de ``values_list().iterator(chunk_size=...)``, então nenhuma
+instância de modelo ou serializer é criada e a memória usada não depende da
+quantidade de transações exportadas.
+"""
+import csv
+import itertools
+import json
+
+# (coluna exportada, campo consultado)
+EXPORT_COLUMNS = (
+    ('id', 'id'),
+    ('date', 'date'),
+    ('transaction_type', 'transaction_type'),
+    ('amount', 'amount'),
+    ('description', 'description'),
+    ('wallet', 'wallet_id'),
+    ('wallet_name', 'wallet__name'),
+    ('created_at', 'created_at'),
+)
+
+# Chave dos índices (wallet, date, created_at, id) de Transaction e ArchivedTransaction
+EXPORT_ORDERING = ('wallet_id', 'date', 'created_at', 'id')
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """Pseudo-arquivo para o csv.writer: devolve a linha em vez de gravá-la"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE, archived=None):
+    """
+    Tuplas das transações por carteira, em ordem cronológica dentro de cada
+    uma, lidas do banco em lotes. Com ``archived`` (transações arquivadas),
+    elas vêm antes das atuais, em uma segunda leitura: cada leitura percorre o
+    índice (wallet, date, created_at, id) na ordem pedida, sem ordenação
+    prévia de todo o resultado, e as linhas saem desde o primeiro lote.
+
+    O banco é escolhido agora, não na leitura: a resposta em fluxo é consumida
+    depois que a requisição (e o escopo do shard do usuário) já terminou.
+    """
+    fields = [field for _, field in EXPORT_COLUMNS]
+    parts = [queryset] if archived is None else [archived, queryset]
+    return itertools.chain.from_iterable([
+        part.using(part.db).values_list(*fields).order_by(*EXPORT_ORDERING).iterator(chunk_size=chunk_size)
+        for part in parts
+    ])
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def iter_csv(rows, batch_size=500):
+    """Gera o CSV em blocos de ``batch_size`` linhas, começando pelo cabeçalho"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([column for column, _ in EXPORT_COLUMNS])
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow([_format_value(value) for value in row]))
+        if len(batch) >= batch_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def iter_ndjson(rows, batch_size=500):
+    """Gera um objeto JSON por linha, em blocos de ``batch_size`` linhas"""
+    columns = [column for column, _ in EXPORT_COLUMNS]
+    batch = []
+    for row in rows:
+        record = {
+            column: value if value is None or isinstance(value, (int, str)) else _format_value(value)
+            for column, value in zip(columns, row)
+        }
+        batch.append(json.dumps(record, ensure_ascii=False) + '\n')
+        if len(batch) >= batch_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def iter_export(queryset, export_format, chunk_size=DEFAULT_CHUNK_SIZE, archived=None):
+    """Gerador do conteúdo exportado no formato pedido (``'csv'`` ou ``'ndjson'``)"""
+    rows = export_rows(queryset, chunk_size=chunk_size, archived=archived)
+    if export_format == 'csv':
+        return iter_csv(rows)
+    if export_format == 'ndjson':
+        return iter_ndjson(rows)
+    raise ValueError(f'Formato de exportação desconhecido: {export_format}')
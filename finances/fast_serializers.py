@@ -0,0 +1,90 @@
+"""
+Serialização somente leitura das listagens, a partir de linhas ``values()``.
+
+Os ``ModelSerializer`` continuam responsáveis pelas escritas; nas listagens,
+porém, o custo está em instanciar modelos e percorrer os campos do DRF linha
+a linha. Aqui cada serializer declara uma vez o mapeamento
+``campo de saída -> (lookup do values(), conversão)`` e a saída é montada
+direto dos dicionários devolvidos pelo banco, com o mesmo formato JSON dos
+serializers do DRF.
+"""
+from datetime import timezone
+
+
+def _string(value):
+    return None if value is None else str(value)
+
+
+def _date(value):
+    return None if value is None else value.isoformat()
+
+
+def _datetime(value):
+    """Mesmo formato do ``DateTimeField`` do DRF com TIME_ZONE='UTC' (sufixo Z)"""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+class ValuesSerializer:
+    """
+    Serializer de linhas ``values()``. As subclasses definem ``fields`` como
+    uma lista de ``(campo de saída, lookup, conversão ou None)``.
+    """
+    fields = ()
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def lookups(cls):
+        """Lookups a passar para ``queryset.values()``"""
+        return [lookup for _, lookup, _ in cls.fields]
+
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values(*cls.lookups())
+
+    @property
+    def data(self):
+        plain = [(name, lookup) for name, lookup, convert in self.fields if convert is None]
+        converted = [(name, lookup, convert) for name, lookup, convert in self.fields if convert is not None]
+        data = []
+        for row in self.rows:
+            item = {name: row[lookup] for name, lookup in plain}
+            for name, lookup, convert in converted:
+                item[name] = convert(row[lookup])
+            data.append(item)
+        return data
+
+
+class TransactionReadSerializer(ValuesSerializer):
+    """Mesma saída de ``TransactionSerializer``, incluindo ``wallet_name`` pelo JOIN"""
+    fields = (
+        ('id', 'id', None),
+        ('amount', 'amount', _string),
+        ('transaction_type', 'transaction_type', None),
+        ('date', 'date', _date),
+        ('description', 'description', None),
+        ('wallet', 'wallet_id', None),
+        ('wallet_name', 'wallet__name', None),
+        ('created_at', 'created_at', _datetime),
+    )
+
+
+class WalletReadSerializer(ValuesSerializer):
+    """Mesma saída de ``WalletSerializer``; as linhas precisam trazer ``total_balance``"""
+    fields = (
+        ('id', 'id', None),
+        ('name', 'name', None),
+        ('user', 'user_id', None),
+        ('created_at', 'created_at', _datetime),
+        ('total_balance', 'total_balance', _float),
+    )
@@ -0,0 +1,180 @@
+"""
+Projeção de saldo por simulação de Monte Carlo.
+
+Os parâmetros são ajustados ao histórico mensal da carteira (via
+``finances.analytics``): aporte líquido mensal (depósitos - saques) e
+rendimento mensal sobre o saldo, cada um como uma normal com a média e o
+desvio observados nos últimos meses. Cada caminho evolui mês a mês como
+``saldo = saldo * (1 + rendimento) + aporte``, vetorizado sobre todos os
+caminhos de um bloco.
+
+Os caminhos são divididos em blocos de tamanho fixo, cada um com a sua
+semente derivada (``SeedSequence.spawn``), então o resultado é o mesmo
+rodando os blocos em série ou em um pool de processos, usado quando o número
+de caminhos passa de ``FINANCES_FORECAST_PARALLEL_THRESHOLD``. O pool é um só
+por processo, criado no primeiro uso e reaproveitado entre requisições, com
+processos iniciados por ``spawn``: um ``fork`` do servidor com várias threads
+herdaria travas presas por outras threads. O resultado
+fica em cache por (shard e usuário, carteira, ``Wallet.version``, parâmetros):
+os ids das carteiras se repetem entre shards.
+
+Configurações opcionais:
+
+- ``FINANCES_FORECAST_WORKERS``: tamanho máximo do pool (padrão: número de CPUs; 1 desativa o pool)
+- ``FINANCES_FORECAST_PARALLEL_THRESHOLD``: caminhos a partir dos quais usa o pool (padrão 20000)
+- ``FINANCES_FORECAST_CACHE_TIMEOUT``: validade do cache em segundos (padrão 3600)
+"""
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import analytics
+
+
+PERCENTILES = (5, 25, 50, 75, 95)
+CHUNK_PATHS = 5000
+DEFAULT_YEARS = 10
+DEFAULT_PATHS = 10000
+DEFAULT_HISTORY = 36
+
+KEY_PREFIX = 'finances:forecast'
+
+Fit = namedtuple('Fit', ['contribution_mean', 'contribution_std', 'yield_mean', 'yield_std', 'history_months'])
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def fit(columns, history=DEFAULT_HISTORY):
+    """Média e desvio do aporte líquido e do rendimento mensais nos últimos ``history`` meses"""
+    np = analytics.np
+    monthly = analytics.monthly_metrics(columns)
+    if not monthly['months']:
+        return Fit(0.0, 0.0, 0.0, 0.0, 0)
+    contributions = (monthly['deposits'] - monthly['withdrawals'])[-history:]
+    yields = monthly['dividend_yield'][-history:]
+    yields = yields[~np.isnan(yields)]
+    return Fit(
+        contribution_mean=float(contributions.mean()),
+        contribution_std=float(contributions.std()),
+        yield_mean=float(yields.mean()) if len(yields) else 0.0,
+        yield_std=float(yields.std()) if len(yields) else 0.0,
+        history_months=len(contributions),
+    )
+
+
+def simulate_chunk(starting_balance, fitted, years, paths, seed):
+    """
+    Simula ``paths`` caminhos e devolve o saldo ao fim de cada ano, em um
+    array ``(paths, years)``. Saldos não ficam negativos (saques param no zero).
+    """
+    np = analytics.np
+    rng = np.random.default_rng(seed)
+    balance = np.full(paths, float(starting_balance))
+    yearly = np.empty((paths, years))
+    for month in range(years * 12):
+        monthly_yield = rng.normal(fitted.yield_mean, fitted.yield_std, paths)
+        contribution = rng.normal(fitted.contribution_mean, fitted.contribution_std, paths)
+        balance = np.maximum(balance * (1 + monthly_yield) + contribution, 0.0)
+        if month % 12 == 11:
+            yearly[:, month // 12] = balance
+    return yearly
+
+
+def pool_size():
+    return getattr(settings, 'FINANCES_FORECAST_WORKERS', None) or os.cpu_count() or 1
+
+
+def get_pool():
+    """Pool de processos do módulo, criado no primeiro uso"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=pool_size(), mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _discard_pool(pool):
+    """Descarta um pool quebrado (processo filho morto); o próximo uso cria outro"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_simulation(starting_balance, fitted, years, paths, seed, workers=None, parallel_threshold=None):
+    """
+    Faixas de percentis do saldo ao fim de cada ano, somando todos os blocos de
+    caminhos. Com ``workers`` igual a 1 os blocos rodam em série, sem o pool.
+    """
+    np = analytics.np
+    if workers is None:
+        workers = pool_size()
+    if parallel_threshold is None:
+        parallel_threshold = getattr(settings, 'FINANCES_FORECAST_PARALLEL_THRESHOLD', 20000)
+
+    sizes = [CHUNK_PATHS] * (paths // CHUNK_PATHS) + ([paths % CHUNK_PATHS] if paths % CHUNK_PATHS else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    arguments = [(starting_balance, fitted, years, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+
+    chunks = None
+    if workers > 1 and len(sizes) > 1 and paths >= parallel_threshold:
+        pool = get_pool()
+        try:
+            chunks = list(pool.map(simulate_chunk, *zip(*arguments)))
+        except BrokenProcessPool:
+            _discard_pool(pool)
+    if chunks is None:
+        chunks = [simulate_chunk(*chunk_arguments) for chunk_arguments in arguments]
+
+    bands = np.percentile(np.concatenate(chunks), PERCENTILES, axis=0)
+    return [
+        {'year': year + 1, **{f'p{p}': round(float(bands[i, year]), 2) for i, p in enumerate(PERCENTILES)}}
+        for year in range(years)
+    ]
+
+
+def forecast(wallet, years=DEFAULT_YEARS, paths=DEFAULT_PATHS, history=DEFAULT_HISTORY, seed=None):
+    """
+    Projeção da carteira (precisa de ``id``, ``version`` e ``balance``), do
+    cache quando os dados e os parâmetros são os mesmos. Devolve
+    ``(resultado, veio_do_cache)``.
+    """
+    from .models import ArchivedTransaction, Transaction
+
+    analytics.require_numpy()
+    if seed is None:
+        seed = wallet.id
+    # Os ids das carteiras se repetem entre shards: o banco e o dono entram na chave
+    key = f'{KEY_PREFIX}:{wallet._state.db}:{wallet.user_id}:{wallet.id}:{wallet.version}:{years}:{paths}:{history}:{seed}'
+    result = cache.get(key)
+    if result is not None:
+        return result, True
+
+    fitted = fit(analytics.load_columns(
+        Transaction.objects.filter(wallet=wallet), archived=ArchivedTransaction.objects.filter(wallet=wallet)
+    ), history)
+    result = {
+        'wallet': wallet.id,
+        'years': years,
+        'paths': paths,
+        'seed': seed,
+        'starting_balance': float(wallet.balance),
+        'fitted': {
+            'monthly_contribution_mean': round(fitted.contribution_mean, 2),
+            'monthly_contribution_std': round(fitted.contribution_std, 2),
+            'monthly_yield_mean': round(fitted.yield_mean, 6),
+            'monthly_yield_std': round(fitted.yield_std, 6),
+            'history_months': fitted.history_months,
+        },
+        'bands': run_simulation(wallet.balance, fitted, years, paths, seed),
+    }
+    cache.set(key, result, getattr(settings, 'FINANCES_FORECAST_CACHE_TIMEOUT', 3600))
+    return result, False
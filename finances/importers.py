@@ -0,0 +1,224 @@
+"""
+Importação em massa de transações a partir de extratos CSV ou OFX.
+
+O arquivo é lido linha a linha (sem carregá-lo inteiro em memória), as
+linhas são validadas e acumuladas em lotes, e cada lote é gravado com um
+``bulk_create`` dentro do seu próprio bloco atômico, junto com a
+atualização dos totais via ``finances.ledger``. Erros de validação não
+interrompem a importação: são registrados por linha no relatório.
+"""
+import codecs
+import csv
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from . import ledger, sharding
+from .models import Transaction
+
+
+DEFAULT_BATCH_SIZE = 5000
+IMPORT_FORMATS = ('csv', 'ofx')
+
+# Valores aceitos na coluna de tipo do CSV
+TYPE_ALIASES = {
+    'deposit': 'deposit', 'income': 'deposit', 'receita': 'deposit', 'deposito': 'deposit', 'depósito': 'deposit',
+    'withdrawal': 'withdrawal', 'expense': 'withdrawal', 'despesa': 'withdrawal', 'saque': 'withdrawal',
+    'dividend': 'dividend', 'rendimento': 'dividend', 'rendimentos': 'dividend', 'dividendo': 'dividend',
+}
+
+# TRNTYPE do OFX que representam rendimentos; os demais seguem o sinal do valor
+OFX_DIVIDEND_TYPES = {'DIV', 'INT'}
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+
+MAX_AMOUNT = Decimal('99999999.99')  # limite de Transaction.amount (10 dígitos, 2 decimais)
+
+
+class ImportReport:
+    """Resultado de uma importação: linhas lidas, transações criadas e erros por linha"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+    def as_dict(self, max_errors=100):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'error_count': len(self.errors),
+            'errors': [{'line': line, 'error': message} for line, message in self.errors[:max_errors]],
+        }
+
+
+def detect_format(filename):
+    """Formato pelo nome do arquivo (.csv ou .ofx)"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def parse_amount(value):
+    """Converte '1234.56', '1234,56' ou '1.234,56' em Decimal"""
+    value = (value or '').strip().replace(' ', '')
+    if ',' in value:
+        value = value.replace('.', '').replace(',', '.')
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'Valor inválido: "{value}"')
+    if not amount.is_finite():
+        raise ValueError(f'Valor inválido: "{value}"')
+    return amount
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f'Data inválida: "{value}"')
+
+
+def parse_csv(lines):
+    """
+    Lê um CSV com cabeçalho a partir de um iterável de linhas em bytes.
+
+    Colunas: ``date``, ``amount``, ``transaction_type`` (ou ``type``; opcional,
+    quando ausente o sinal do valor decide entre depósito e saque) e
+    ``description`` (opcional). Gera ``(número da linha, dados ou erro)``.
+    """
+    reader = csv.DictReader(codecs.iterdecode(lines, 'utf-8-sig', errors='replace'))
+    for row in reader:
+        line = reader.line_num
+        try:
+            amount = parse_amount(row.get('amount'))
+            raw_type = (row.get('transaction_type') or row.get('type') or '').strip().lower()
+            if raw_type:
+                if raw_type not in TYPE_ALIASES:
+                    raise ValueError(f'Tipo de transação inválido: "{raw_type}"')
+                transaction_type = TYPE_ALIASES[raw_type]
+            else:
+                transaction_type = 'withdrawal' if amount < 0 else 'deposit'
+            yield line, {
+                'date': parse_date(row.get('date')),
+                'amount': abs(amount),
+                'transaction_type': transaction_type,
+                'description': (row.get('description') or '').strip(),
+            }
+        except ValueError as error:
+            yield line, error
+
+
+OFX_TAG = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)')
+
+
+def parse_ofx(lines):
+    """
+    Lê os lançamentos (``<STMTTRN>``) de um extrato OFX, SGML (1.x) ou XML (2.x),
+    a partir de um iterável de linhas em bytes. Gera ``(número da linha, dados ou erro)``.
+    """
+    encoding = 'cp1252'
+    current = None
+    start_line = 0
+    for line_number, raw in enumerate(lines, start=1):
+        if line_number == 1 and raw.lstrip().startswith(b'<?xml'):
+            encoding = 'utf-8'
+        text = raw.decode(encoding, errors='replace')
+        if current is None and 'ENCODING:UTF-8' in text.upper().replace(' ', ''):
+            encoding = 'utf-8'
+
+        for closing, tag, value in OFX_TAG.findall(text):
+            if tag == 'STMTTRN':
+                if not closing:
+                    current, start_line = {}, line_number
+                elif current is not None:
+                    yield start_line, _ofx_transaction(current)
+                    current = None
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+
+def _ofx_transaction(fields):
+    try:
+        amount = parse_amount(fields.get('TRNAMT'))
+        posted = fields.get('DTPOSTED', '')[:8]
+        try:
+            date = datetime.strptime(posted, '%Y%m%d').date()
+        except ValueError:
+            raise ValueError(f'Data inválida: "{posted}"')
+        if fields.get('TRNTYPE', '').upper() in OFX_DIVIDEND_TYPES:
+            transaction_type = 'dividend'
+        else:
+            transaction_type = 'withdrawal' if amount < 0 else 'deposit'
+        description = fields.get('MEMO') or fields.get('NAME') or ''
+        return {
+            'date': date,
+            'amount': abs(amount),
+            'transaction_type': transaction_type,
+            'description': description,
+        }
+    except ValueError as error:
+        return error
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+
+def _validate(data):
+    if data['amount'] > MAX_AMOUNT:
+        raise ValueError(f'O valor excede o máximo permitido ({MAX_AMOUNT}).')
+    amount = data['amount'].quantize(ledger.CENTS)
+    if amount <= 0:
+        raise ValueError('O valor deve ser maior que zero.')
+    return {**data, 'amount': amount}
+
+
+def _flush(batch, report):
+    # No shard da carteira, também quando chamado fora de uma requisição
+    with sharding.writing(batch[0]._state.db):
+        Transaction.objects.bulk_create(batch)
+        ledger.apply(added=[item.ledger_entry() for item in batch])
+    report.created += len(batch)
+
+
+def import_transactions(wallet, lines, import_format, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Importa as transações das ``lines`` (iterável de linhas em bytes) para a
+    carteira, gravando em lotes de ``batch_size``. ``progress(report)`` é
+    chamado após cada lote gravado. Retorna um ``ImportReport``.
+    """
+    if import_format not in PARSERS:
+        raise ValueError(f'Formato de importação desconhecido: {import_format}')
+
+    report = ImportReport()
+    batch = []
+    for line, parsed in PARSERS[import_format](lines):
+        report.rows += 1
+        try:
+            if isinstance(parsed, Exception):
+                raise parsed
+            batch.append(Transaction(wallet=wallet, **_validate(parsed)))
+        except ValueError as error:
+            report.add_error(line, str(error))
+            continue
+
+        if len(batch) >= batch_size:
+            _flush(batch, report)
+            batch = []
+            if progress:
+                progress(report)
+
+    if batch:
+        _flush(batch, report)
+        if progress:
+            progress(report)
+    return report
@@ -0,0 +1,361 @@
+"""
+Manutenção incremental dos totais armazenados em cada carteira.
+
+Toda escrita em ``Transaction`` (criação, edição, exclusão individual ou em
+lote) é traduzida em lançamentos ``LedgerEntry`` e aplicada aqui com
+``UPDATE ... SET campo = campo + delta``, de modo que ler o saldo de uma
+carteira não depende do tamanho do histórico de transações.
+
+Além dos totais atuais, cada carteira tem checkpoints com os totais
+acumulados no fim de cada mês encerrado (``WalletBalanceCheckpoint``): o
+saldo em uma data é o do último checkpoint anterior mais a soma das poucas
+transações entre os dois (``totals_as_of``). Os checkpoints que faltam são
+criados na primeira escrita da carteira em um mês novo, a partir dos resumos
+mensais, e um lançamento com data antiga corrige todos os checkpoints a
+partir do mês dele.
+"""
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError
+from django.db.models import Case, Count, F, Q, Sum, When
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from . import sharding
+
+
+LedgerEntry = namedtuple('LedgerEntry', ['wallet_id', 'transaction_type', 'date', 'amount', 'count'])
+
+# Campo da carteira que acumula cada tipo de transação
+TYPE_FIELDS = {
+    'deposit': 'total_deposits',
+    'withdrawal': 'total_withdrawals',
+    'dividend': 'total_dividends',
+}
+
+# Efeito de cada tipo de transação no saldo
+BALANCE_SIGNS = {
+    'deposit': 1,
+    'withdrawal': -1,
+    'dividend': 1,
+}
+
+# Campos de Wallet mantidos exclusivamente por este módulo
+STORED_FIELDS = ['balance', *TYPE_FIELDS.values(), 'transaction_count']
+
+CENTS = Decimal('0.01')
+
+
+def entries_from_queryset(queryset):
+    """
+    Agrupa as transações do queryset por (carteira, tipo, data) no banco e
+    devolve um lançamento por grupo.
+    """
+    rows = (
+        queryset.order_by()
+        .values('wallet_id', 'transaction_type', 'date')
+        .annotate(total=Sum('amount'), n=Count('id'))
+    )
+    return [
+        LedgerEntry(row['wallet_id'], row['transaction_type'], row['date'],
+                    Decimal(row['total'] or 0).quantize(CENTS), row['n'])
+        for row in rows
+    ]
+
+
+def wallet_deltas(added=(), removed=()):
+    """
+    Consolida os lançamentos em deltas por carteira:
+    ``{wallet_id: {'deposit': Decimal, ..., 'count': int}}``.
+    """
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for sign, entries in ((1, added), (-1, removed)):
+        for entry in entries:
+            wallet_delta = deltas[entry.wallet_id]
+            wallet_delta[entry.transaction_type] += sign * entry.amount
+            wallet_delta['count'] += sign * entry.count
+    return deltas
+
+
+def monthly_deltas(added=(), removed=()):
+    """
+    Consolida os lançamentos em deltas por resumo mensal:
+    ``{(wallet_id, year, month, transaction_type): [amount, count]}``.
+    """
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for sign, entries in ((1, added), (-1, removed)):
+        for entry in entries:
+            delta = deltas[(entry.wallet_id, entry.date.year, entry.date.month, entry.transaction_type)]
+            delta[0] += sign * entry.amount
+            delta[1] += sign * entry.count
+    return deltas
+
+
+def apply_monthly(added=(), removed=()):
+    """Aplica os lançamentos aos resumos mensais (``WalletMonthlySummary``)"""
+    from .models import WalletMonthlySummary
+
+    for (wallet_id, year, month, transaction_type), (amount, count) in monthly_deltas(added, removed).items():
+        if not amount and not count:
+            continue
+        summary = WalletMonthlySummary.objects.filter(
+            wallet_id=wallet_id, year=year, month=month, transaction_type=transaction_type
+        )
+        updated = summary.update(
+            total_amount=F('total_amount') + amount,
+            transaction_count=F('transaction_count') + count,
+        )
+        if not updated:
+            try:
+                with sharding.atomic():
+                    WalletMonthlySummary.objects.create(
+                        wallet_id=wallet_id, year=year, month=month, transaction_type=transaction_type,
+                        total_amount=amount, transaction_count=count,
+                    )
+            except IntegrityError:
+                # Outra escrita concorrente criou a linha primeiro
+                summary.update(
+                    total_amount=F('total_amount') + amount,
+                    transaction_count=F('transaction_count') + count,
+                )
+        elif count < 0:
+            # Meses sem transações restantes não precisam ocupar espaço
+            summary.filter(transaction_count=0).delete()
+
+
+def month_end(day):
+    """Último dia do mês de ``day`` (data dos checkpoints)"""
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def last_closed_month_end(today=None):
+    """Fim do último mês encerrado: até ele existem checkpoints"""
+    today = today or timezone.now().date()
+    return today.replace(day=1) - timedelta(days=1)
+
+
+def zero_totals():
+    """Totais zerados no formato dos campos armazenados em ``Wallet``"""
+    return {'balance': Decimal('0'), 'transaction_count': 0, **{field: Decimal('0') for field in TYPE_FIELDS.values()}}
+
+
+def add_entry(totals, transaction_type, amount, count):
+    """Soma ``amount`` e ``count`` de um tipo de transação aos totais"""
+    totals[TYPE_FIELDS[transaction_type]] += amount
+    totals['balance'] += BALANCE_SIGNS[transaction_type] * amount
+    totals['transaction_count'] += count
+
+
+def checkpoint_deltas(added=(), removed=()):
+    """
+    Consolida os lançamentos em deltas por carteira e fim de mês:
+    ``{wallet_id: {month_end: totais}}``.
+    """
+    deltas = defaultdict(lambda: defaultdict(zero_totals))
+    for sign, entries in ((1, added), (-1, removed)):
+        for entry in entries:
+            add_entry(deltas[entry.wallet_id][month_end(entry.date)], entry.transaction_type,
+                      sign * entry.amount, sign * entry.count)
+    return deltas
+
+
+def checkpoint_rows(summaries, through, existing=()):
+    """
+    Totais acumulados da carteira em cada fim de mês até ``through``, desde o
+    primeiro mês de ``summaries`` (tuplas ``(ano, mês, tipo, valor, quantidade)``
+    dos resumos mensais), inclusive os meses sem transações. Devolve pares
+    ``(data, totais)``, sem as datas de ``existing``.
+    """
+    months = defaultdict(list)
+    for year, month, transaction_type, amount, count in summaries:
+        months[(year, month)].append((transaction_type, amount, count))
+    if not months:
+        return []
+
+    totals = zero_totals()
+    day = month_end(date(*min(months), 1))
+    rows = []
+    while day <= through:
+        for transaction_type, amount, count in months.get((day.year, day.month), ()):
+            add_entry(totals, transaction_type, amount, count)
+        if day not in existing:
+            rows.append((day, dict(totals)))
+        day = month_end(day + timedelta(days=1))
+    return rows
+
+
+def fill_checkpoints(wallet_id, through):
+    """
+    Cria os checkpoints da carteira que faltam até ``through`` (fim de mês),
+    um por mês desde o primeiro mês com transações, inclusive os meses sem
+    transações, acumulando os resumos mensais.
+    """
+    from .models import WalletBalanceCheckpoint, WalletMonthlySummary
+
+    summaries = list(
+        WalletMonthlySummary.objects.filter(wallet_id=wallet_id)
+        .filter(Q(year__lt=through.year) | Q(year=through.year, month__lte=through.month))
+        .values_list('year', 'month', 'transaction_type', 'total_amount', 'transaction_count')
+    )
+    if not summaries:
+        return
+    existing = set(WalletBalanceCheckpoint.objects.filter(wallet_id=wallet_id).values_list('date', flat=True))
+    checkpoints = [
+        WalletBalanceCheckpoint(wallet_id=wallet_id, date=day, **totals)
+        for day, totals in checkpoint_rows(summaries, through, existing)
+    ]
+    # Outra escrita concorrente pode ter criado os mesmos checkpoints
+    WalletBalanceCheckpoint.objects.bulk_create(checkpoints, ignore_conflicts=True)
+
+
+def months_between(start, end):
+    """Quantidade de meses de ``start`` a ``end``, inclusive"""
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def apply_checkpoints(added=(), removed=()):
+    """
+    Aplica os lançamentos aos checkpoints. Deve rodar depois de
+    ``apply_monthly``: os checkpoints que faltam são criados a partir dos
+    resumos mensais, que já incluem estes lançamentos.
+
+    Cada checkpoint existente recebe a soma dos lançamentos dos meses até
+    ele, em um único UPDATE (um CASE por faixa de datas entre os meses
+    lançados). Se o UPDATE não alcança um checkpoint por mês até o último
+    mês encerrado, os que faltam são criados.
+    """
+    from .models import WalletBalanceCheckpoint
+
+    through = last_closed_month_end()
+    for wallet_id, months in checkpoint_deltas(added, removed).items():
+        ends = sorted(end for end in months if end <= through)
+        if not ends:
+            # Só o mês corrente (ou datas futuras): nenhum checkpoint muda, mas
+            # a primeira escrita depois da virada do mês cria o do mês encerrado
+            if not WalletBalanceCheckpoint.objects.filter(wallet_id=wallet_id, date=through).exists():
+                fill_checkpoints(wallet_id, through)
+            continue
+        cumulative = []
+        totals = zero_totals()
+        for end in ends:
+            for field, delta in months[end].items():
+                totals[field] += delta
+            cumulative.append(dict(totals))
+        updates = {}
+        for field in STORED_FIELDS:
+            if not any(step[field] for step in cumulative):
+                continue
+            cases = [
+                When(date__lt=next_end, then=F(field) + step[field])
+                for next_end, step in zip(ends[1:], cumulative)
+            ]
+            last_step = F(field) + cumulative[-1][field]
+            updates[field] = Case(*cases, default=last_step) if cases else last_step
+
+        if not updates:
+            continue
+
+        checkpoints = WalletBalanceCheckpoint.objects.filter(wallet_id=wallet_id, date__gte=ends[0])
+        if checkpoints.update(**updates) < months_between(ends[0], through):
+            fill_checkpoints(wallet_id, through)
+
+
+def totals_as_of(wallet_id, day):
+    """
+    Totais acumulados da carteira até ``day`` (inclusive), no formato de
+    ``live_totals``: o último checkpoint até ``day`` mais as transações
+    (atuais e arquivadas) posteriores a ele. Devolve ``(totais, data do
+    checkpoint usado ou None)``.
+    """
+    from .models import WalletBalanceCheckpoint
+
+    checkpoint = (
+        WalletBalanceCheckpoint.objects.filter(wallet_id=wallet_id, date__lte=day)
+        .order_by('-date').values('date', *STORED_FIELDS).first()
+    )
+    after = checkpoint['date'] if checkpoint else None
+    totals = live_totals([wallet_id], after=after, through=day)[wallet_id]
+    if checkpoint:
+        for field in STORED_FIELDS:
+            totals[field] += checkpoint[field]
+    return totals, after
+
+
+def monthly_rows(queryset):
+    """
+    Agrega as transações do queryset por (carteira, ano, mês, tipo) no banco,
+    no formato usado para (re)construir ``WalletMonthlySummary``.
+    """
+    return (
+        queryset.order_by()
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('wallet_id', 'year', 'month', 'transaction_type')
+        .annotate(total_amount=Sum('amount'), transaction_count=Count('id'))
+    )
+
+
+def apply(added=(), removed=()):
+    """
+    Aplica lançamentos adicionados/removidos aos totais das carteiras e aos
+    resumos mensais, e incrementa a versão de mudança de cada carteira tocada
+    (mesmo quando os valores se anulam, como ao editar só a descrição).
+
+    Deve ser chamada dentro da mesma transação de banco que grava as
+    transações, para que os totais nunca fiquem fora de sincronia. Também
+    invalida o cache do dashboard dos donos das carteiras afetadas.
+    """
+    from . import dashboard_cache
+    from .models import Wallet
+
+    deltas = wallet_deltas(added, removed)
+    changed_at = timezone.now()
+    for wallet_id, delta in deltas.items():
+        updates = {'version': F('version') + 1, 'updated_at': changed_at}
+        balance = Decimal('0')
+        for transaction_type, field in TYPE_FIELDS.items():
+            amount = delta.get(transaction_type)
+            if amount:
+                updates[field] = F(field) + amount
+                balance += BALANCE_SIGNS[transaction_type] * amount
+        if balance:
+            updates['balance'] = F('balance') + balance
+        if delta.get('count'):
+            updates['transaction_count'] = F('transaction_count') + int(delta['count'])
+        Wallet.objects.filter(pk=wallet_id).update(**updates)
+
+    apply_monthly(added, removed)
+    apply_checkpoints(added, removed)
+
+    if deltas:
+        dashboard_cache.invalidate_users(
+            Wallet.objects.filter(pk__in=list(deltas)).values_list('user_id', flat=True)
+        )
+
+
+def live_totals(wallet_ids, models=None, after=None, through=None):
+    """
+    Recalcula os totais das carteiras informadas direto das transações
+    (por padrão, as atuais e as arquivadas), no mesmo formato dos campos
+    armazenados em ``Wallet``; ``after``/``through`` limitam as datas
+    (exclusivo/inclusivo).
+    """
+    from .models import ArchivedTransaction, Transaction
+
+    totals = {wallet_id: zero_totals() for wallet_id in wallet_ids}
+    dates = {}
+    if after is not None:
+        dates['date__gt'] = after
+    if through is not None:
+        dates['date__lte'] = through
+    for model in models or (Transaction, ArchivedTransaction):
+        rows = (
+            model.objects.filter(wallet_id__in=list(totals), **dates).order_by()
+            .values('wallet_id', 'transaction_type')
+            .annotate(total=Sum('amount'), n=Count('id'))
+        )
+        for row in rows:
+            add_entry(totals[row['wallet_id']], row['transaction_type'],
+                      Decimal(row['total'] or 0).quantize(CENTS), row['n'])
+    return totals
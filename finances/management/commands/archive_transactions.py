@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from finances import archive, sharding
+from finances.models import Transaction, Wallet
+
+
+class Command(BaseCommand):
+    help = (
+        "Arquiva as transações anteriores ao horizonte (FINANCES_ARCHIVE_AFTER_DAYS ou --before), "
+        "acumulando os totais no saldo de abertura de cada carteira"
+    )
+
+    def add_arguments(self, parser):
+        horizon = parser.add_mutually_exclusive_group()
+        horizon.add_argument('--before', help='Arquiva as transações anteriores a esta data (AAAA-MM-DD)')
+        horizon.add_argument('--days', type=int, help='Arquiva as transações com mais de N dias')
+        parser.add_argument('--user', help='Arquiva apenas as carteiras deste usuário')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Transações movidas por transação de banco (padrão: 1000)')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta as transações a arquivar')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size deve ser maior que zero')
+        if options['before']:
+            try:
+                before = parse_date(options['before'])
+            except ValueError:
+                before = None
+            if before is None:
+                raise CommandError('--before: use o formato AAAA-MM-DD')
+        else:
+            if options['days'] is not None and options['days'] < 0:
+                raise CommandError('--days não pode ser negativo')
+            before = archive.default_cutoff(days=options['days'])
+
+        shards = sharding.get_shards()
+        wallets = Wallet.objects.order_by('pk')
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{options["user"]}" não encontrado')
+            shards = [sharding.shard_for_user(user.pk)]
+            wallets = wallets.filter(user=user)
+
+        archived = touched = 0
+        for alias in shards:
+            with sharding.shard_scope(alias):
+                for wallet in wallets.only('pk', 'user_id').iterator():
+                    if options['dry_run']:
+                        count = Transaction.objects.filter(wallet_id=wallet.pk, date__lt=before).count()
+                    else:
+                        count = archive.archive_wallet(wallet, before, options['batch_size'])
+                    if count:
+                        touched += 1
+                        archived += count
+                        self.stdout.write(f'Carteira {wallet.pk} ({alias}): {count} transações')
+
+        verb = 'a arquivar' if options['dry_run'] else 'arquivadas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{archived} transações anteriores a {before.isoformat()} {verb} em {touched} carteiras'
+        ))
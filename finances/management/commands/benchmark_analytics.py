@@ -0,0 +1,111 @@
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from finances import analytics, ledger, sharding
+from finances.models import Transaction, Wallet
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede finances.analytics em carteiras sintéticas (padrão: 1 milhão de transações): "
+        "leitura das colunas, cálculo vetorizado e um laço Python equivalente para comparação"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Transações sintéticas (padrão: 1000000)')
+        parser.add_argument('--wallets', type=int, default=4, help='Carteiras sintéticas (padrão: 4)')
+        parser.add_argument('--in-memory', action='store_true',
+                            help='Gera as colunas direto em memória, sem gravar no banco')
+
+    def handle(self, *args, **options):
+        if not analytics.is_available():
+            raise CommandError('O NumPy não está instalado (pip install numpy)')
+        rows, wallets = options['rows'], options['wallets']
+        if rows <= 0 or wallets <= 0:
+            raise CommandError('--rows e --wallets devem ser maiores que zero')
+
+        if options['in_memory']:
+            columns = self._synthetic_columns(rows, wallets)
+            load_seconds = None
+        else:
+            # Os dados sintéticos são gravados em uma transação desfeita ao final
+            with transaction.atomic():
+                user = self._seed(rows, wallets)
+                started = time.perf_counter()
+                columns = analytics.load_columns(Transaction.objects.filter(wallet__user=user))
+                load_seconds = time.perf_counter() - started
+                transaction.set_rollback(True)
+
+        started = time.perf_counter()
+        analytics.portfolio_analytics(columns)
+        vector_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        self._python_loop(columns)
+        loop_seconds = time.perf_counter() - started
+
+        self.stdout.write(f'{len(columns.dates):,} transações em {wallets} carteiras')
+        if load_seconds is not None:
+            self.stdout.write(f'  leitura (1 consulta)  {load_seconds * 1000:10.1f} ms  '
+                              f'{len(columns.dates) / load_seconds:14,.0f} linhas/s')
+        self.stdout.write(f'  NumPy                 {vector_seconds * 1000:10.1f} ms')
+        self.stdout.write(f'  laço Python           {loop_seconds * 1000:10.1f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Ganho do cálculo: {loop_seconds / vector_seconds:.1f}x'))
+
+    def _seed(self, rows, wallets):
+        user = User.objects.create_user(f'benchmark-{time.time_ns()}')
+        if sharding.is_enabled():
+            # Dados sintéticos no banco da transação desfeita ao final
+            sharding.assign(user.pk, DEFAULT_DB_ALIAS)
+        wallet_ids = [Wallet.objects.create(user=user, name=f'Benchmark {i}').id for i in range(wallets)]
+        types = list(ledger.TYPE_FIELDS)
+        start = date(2015, 1, 1)
+        batch = []
+        for index in range(rows):
+            batch.append(Transaction(
+                wallet_id=wallet_ids[index % wallets], transaction_type=types[(index * 7) % 10 % 3],
+                amount=Decimal(index % 5000) / 10 + 1, date=start + timedelta(days=index * 3650 // rows),
+            ))
+            if len(batch) == 10000:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+        Transaction.objects.bulk_create(batch)
+        return user
+
+    def _synthetic_columns(self, rows, wallets):
+        np = analytics.np
+        generator = np.random.default_rng(42)
+        dates = np.datetime64('2015-01-01') + np.sort(generator.integers(0, 3650, rows)).astype('timedelta64[D]')
+        return analytics.Columns(
+            wallet_ids=generator.integers(1, wallets + 1, rows),
+            dates=dates,
+            types=generator.choice([analytics.DEPOSIT, analytics.WITHDRAWAL, analytics.DIVIDEND],
+                                   rows, p=[0.5, 0.3, 0.2]).astype(np.int8),
+            amounts=np.round(generator.uniform(1, 500, rows), 2),
+        )
+
+    @staticmethod
+    def _python_loop(columns):
+        """Os mesmos totais mensais, saldo, drawdown e aportes com laços sobre as linhas"""
+        monthly = defaultdict(lambda: [0.0, 0.0, 0.0])
+        per_wallet = defaultdict(lambda: [0.0, 0.0])
+        balance = peak = max_drawdown = 0.0
+        signs = {analytics.DEPOSIT: 1, analytics.WITHDRAWAL: -1, analytics.DIVIDEND: 1}
+        for wallet_id, day, code, amount in zip(columns.wallet_ids.tolist(), columns.dates.tolist(),
+                                                columns.types.tolist(), columns.amounts.tolist()):
+            monthly[(day.year, day.month)][code] += amount
+            balance += signs[code] * amount
+            peak = max(peak, balance)
+            if peak > 0:
+                max_drawdown = max(max_drawdown, (peak - balance) / peak)
+            if code == analytics.DIVIDEND:
+                per_wallet[wallet_id][1] += amount
+            else:
+                per_wallet[wallet_id][0] += signs[code] * amount
+        return monthly, per_wallet, max_drawdown
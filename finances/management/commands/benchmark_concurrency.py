@@ -0,0 +1,150 @@
+import json
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from finances import sharding
+from finances.management.commands.benchmark_endpoints import get_benchmark_user, percentile
+from finances.models import Transaction, Wallet
+
+
+BENCHMARK_DESCRIPTION = 'benchmark_concurrency'
+
+PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size')
+
+
+class Command(BaseCommand):
+    help = (
+        "Dispara leituras e escritas misturadas em várias threads (cada uma com a sua conexão) e "
+        "reporta vazão, latência p50/p95/p99 e erros \"database is locked\", em JSON. Rode com e sem "
+        "FINANCES_DB_PROFILE=production para comparar os perfis do banco"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Usuário usado nas requisições (padrão: o que tem mais transações)')
+        parser.add_argument('--threads', type=int, default=8, help='Clientes simultâneos (padrão: 8)')
+        parser.add_argument('--requests', type=int, default=100, help='Requisições por thread (padrão: 100)')
+        parser.add_argument('--write-ratio', type=float, default=0.2,
+                            help='Fração das requisições que criam transações (padrão: 0.2)')
+        parser.add_argument('--seed', type=int, help='Semente da escolha das requisições')
+        parser.add_argument('--output', '-o', help='Arquivo JSON de saída (padrão: saída padrão)')
+
+    def handle(self, *args, **options):
+        if options['threads'] <= 0 or options['requests'] <= 0:
+            raise CommandError('--threads e --requests devem ser maiores que zero')
+        if not 0 <= options['write_ratio'] <= 1:
+            raise CommandError('--write-ratio deve estar entre 0 e 1')
+        user = get_benchmark_user(options['user'])
+        with sharding.user_scope(user.pk):
+            wallets = list(Wallet.objects.filter(user=user).values_list('id', flat=True))
+        if not wallets:
+            raise CommandError(f'O usuário "{user.username}" não possui carteiras; rode seed_finances antes')
+
+        results = {'read': [], 'write': []}
+        errors = []
+        lock = threading.Lock()
+        rng = random.Random(options['seed'])
+        plans = [
+            [(rng.random() < options['write_ratio'], rng.choice(wallets)) for _ in range(options['requests'])]
+            for _ in range(options['threads'])
+        ]
+
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            threads = [
+                threading.Thread(target=self._worker, args=(user, plan, results, errors, lock))
+                for plan in plans
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+        # Desfaz as escritas pelo caminho normal, que também corrige totais e resumos
+        with sharding.user_scope(user.pk):
+            Transaction.objects.filter(wallet__user=user, description=BENCHMARK_DESCRIPTION).delete()
+
+        total = sum(len(timings) for timings in results.values()) + len(errors)
+        report = {
+            'meta': {
+                'profile': getattr(settings, 'FINANCES_DB_PROFILE', 'development'),
+                'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+                'pragmas': self._pragmas(),
+                'user': user.username,
+                'threads': options['threads'],
+                'requests_per_thread': options['requests'],
+                'write_ratio': options['write_ratio'],
+            },
+            'elapsed_s': round(elapsed, 3),
+            'requests_per_second': round(total / elapsed, 1),
+            'errors': len(errors),
+            'locked_errors': sum('locked' in error for error in errors),
+            'error_samples': sorted(set(errors))[:5],
+        }
+        for kind, timings in results.items():
+            timings.sort()
+            report[kind] = {
+                'count': len(timings),
+                'p50_ms': round(percentile(timings, 50), 3) if timings else None,
+                'p95_ms': round(percentile(timings, 95), 3) if timings else None,
+                'p99_ms': round(percentile(timings, 99), 3) if timings else None,
+            }
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Relatório gravado em {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def _worker(self, user, plan, results, errors, lock):
+        client = Client(raise_request_exception=False)
+        client.force_login(user)
+        reads = [reverse('wallet-list'), reverse('transaction-list'), reverse('dashboard')]
+        try:
+            for index, (write, wallet_id) in enumerate(plan):
+                started = time.perf_counter()
+                try:
+                    if write:
+                        response = client.post(reverse('transaction-list'), {
+                            'wallet': wallet_id, 'transaction_type': 'deposit', 'amount': '1.00',
+                            'date': '2025-01-01', 'description': BENCHMARK_DESCRIPTION,
+                        }, content_type='application/json')
+                    else:
+                        response = client.get(reads[index % len(reads)])
+                    error = None
+                    if response.status_code >= 400:
+                        error = str(response.exc_info[1]) if response.exc_info else f'HTTP {response.status_code}'
+                except Exception as exc:  # noqa: BLE001 - o relatório conta qualquer falha
+                    error = str(exc)
+                duration = (time.perf_counter() - started) * 1000
+                with lock:
+                    if error:
+                        errors.append(error)
+                    else:
+                        results['write' if write else 'read'].append(duration)
+        finally:
+            # Cada thread abre a própria conexão; fechada aqui para não vazar
+            connection.close()
+
+    @staticmethod
+    def _pragmas():
+        if connection.vendor != 'sqlite':
+            return {}
+        pragmas = {}
+        with connection.cursor() as cursor:
+            for name in PRAGMAS:
+                cursor.execute(f'PRAGMA {name}')
+                # Bancos em memória não devolvem alguns pragmas (ex.: mmap_size)
+                row = cursor.fetchone()
+                pragmas[name] = row[0] if row else None
+        return pragmas
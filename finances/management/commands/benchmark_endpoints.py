@@ -0,0 +1,213 @@
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Sum
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from finances import analytics, dashboard_cache, sharding
+from finances.models import Transaction, Wallet
+
+
+def percentile(values, p):
+    """Percentil pelo método do posto mais próximo (valores já ordenados)"""
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
+
+
+def get_benchmark_user(username=None):
+    """Usuário ``username`` ou, sem ele, o que tem mais transações em todos os shards"""
+    if username:
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Usuário "{username}" não encontrado')
+    # Soma os totais armazenados das carteiras de cada shard
+    counts = Counter()
+    for alias in sharding.get_shards():
+        counts.update(dict(
+            Wallet.objects.using(alias).order_by().values('user_id')
+            .annotate(n=Sum('transaction_count')).values_list('user_id', 'n')
+        ))
+    busiest = [user_id for user_id, _ in counts.most_common(1)]
+    user = User.objects.filter(pk__in=busiest).first() or User.objects.order_by('pk').first()
+    if user is None:
+        raise CommandError('Nenhum usuário cadastrado; rode seed_finances antes')
+    return user
+
+
+class Command(BaseCommand):
+    help = (
+        "Percorre dashboard, detalhe de carteira, todas as transações e os endpoints da API pelo "
+        "cliente de teste e reporta latência p50/p95/p99, número de consultas SQL e pico de memória "
+        "por endpoint, em JSON (para comparar entre commits)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Usuário usado nas requisições (padrão: o que tem mais transações)')
+        parser.add_argument('--iterations', type=int, default=20, help='Requisições medidas por endpoint (padrão: 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Requisições de aquecimento por endpoint (padrão: 2)')
+        parser.add_argument('--cold-cache', action='store_true',
+                            help='Invalida o cache do dashboard antes de cada requisição')
+        parser.add_argument('--only', help='Mede apenas os endpoints cujo nome contém este texto')
+        parser.add_argument('--output', '-o', help='Arquivo JSON de saída (padrão: saída padrão)')
+
+    def handle(self, *args, **options):
+        if options['iterations'] <= 0:
+            raise CommandError('--iterations deve ser maior que zero')
+        user = get_benchmark_user(options['user'])
+        with sharding.user_scope(user.pk):
+            self._run(user, options)
+
+    def _run(self, user, options):
+        wallet = Wallet.objects.filter(user=user).order_by('-transaction_count').first()
+        if wallet is None:
+            raise CommandError(f'O usuário "{user.username}" não possui carteiras; rode seed_finances antes')
+
+        results = {}
+        # Escritas feitas pelos endpoints (POST) e a sessão do login são desfeitas ao final,
+        # no banco principal e no shard do usuário
+        with transaction.atomic(), sharding.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            client = Client()
+            client.force_login(user)
+            for endpoint in self._endpoints(wallet):
+                name = endpoint[0]
+                if options['only'] and options['only'] not in name:
+                    continue
+                self.stderr.write(f'{name}...')
+                results[name] = self._measure(client, user, endpoint, options)
+            transaction.set_rollback(True)
+            transaction.set_rollback(True, using=sharding.current_shard())
+
+        report = {
+            'meta': {
+                'commit': self._git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'user': user.username,
+                'wallets': Wallet.objects.filter(user=user).count(),
+                'transactions': Transaction.objects.filter(wallet__user=user).count(),
+                'iterations': options['iterations'],
+                'cold_cache': options['cold_cache'],
+            },
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Relatório gravado em {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def _endpoints(self, wallet):
+        """``(nome, método, url, dados)`` de cada endpoint medido"""
+        transaction_id = wallet.transactions.order_by('-date', '-id').values_list('id', flat=True).first()
+        new_transaction = {'wallet': wallet.pk, 'transaction_type': 'deposit', 'amount': '10.00',
+                           'date': '2025-01-01', 'description': 'benchmark'}
+        endpoints = [
+            ('dashboard', 'get', reverse('dashboard'), None),
+            ('wallet_detail', 'get', reverse('wallet_detail', args=[wallet.pk]), None),
+            ('all_transactions', 'get', reverse('all_transactions'), None),
+            ('api wallets', 'get', reverse('wallet-list'), None),
+            ('api wallet detail', 'get', reverse('wallet-detail', args=[wallet.pk]), None),
+            ('api wallets summary', 'get', reverse('wallet-summary'), None),
+            ('api wallet transactions', 'get', reverse('wallet-transactions', args=[wallet.pk]), None),
+            ('api wallet series', 'get', reverse('wallet-series', args=[wallet.pk]) + '?granularity=week', None),
+            ('api wallets series', 'get', reverse('wallet-all-series'), None),
+            ('api transactions', 'get', reverse('transaction-list'), None),
+            ('api transactions by_type', 'get', reverse('transaction-by-type') + '?type=dividend', None),
+            ('api monthly_summary', 'get', reverse('transaction-monthly-summary'), None),
+            ('api yearly_summary', 'get', reverse('transaction-yearly-summary'), None),
+            ('api export csv', 'get', reverse('transaction-export') + f'?wallet={wallet.pk}', None),
+            ('api transactions create', 'post', reverse('transaction-list'), new_transaction),
+            ('api transactions batch', 'post', reverse('transaction-batch'),
+             {'operations': [{'op': 'create', 'data': new_transaction}] * 10}),
+            ('async wallets', 'get', reverse('async_wallet_list'), None),
+            ('async transactions', 'get', reverse('async_transaction_list'), None),
+            ('async monthly_summary', 'get', reverse('async_monthly_summary'), None),
+            ('async dashboard', 'get', reverse('async_dashboard'), None),
+        ]
+        if transaction_id is not None:
+            endpoints.append(('api transaction detail', 'get', reverse('transaction-detail', args=[transaction_id]), None))
+        if analytics.is_available():
+            endpoints += [
+                ('api wallet analytics', 'get', reverse('wallet-analytics', args=[wallet.pk]), None),
+                ('api wallet forecast', 'get', reverse('wallet-forecast', args=[wallet.pk]) + '?paths=1000', None),
+            ]
+        return endpoints
+
+    def _request(self, client, method, url, data):
+        if method == 'post':
+            response = client.post(url, data, content_type='application/json')
+        else:
+            response = client.get(url)
+        if response.streaming:
+            # A exportação só termina quando o fluxo é consumido
+            b''.join(response.streaming_content)
+        return response
+
+    def _measure(self, client, user, endpoint, options):
+        name, method, url, data = endpoint
+        for _ in range(options['warmup']):
+            self._request(client, method, url, data)
+
+        # Consultas no banco principal e no shard do usuário (o mesmo sem particionamento)
+        aliases = dict.fromkeys([DEFAULT_DB_ALIAS, sharding.current_shard()])
+        timings, queries = [], []
+        status_code = None
+        for _ in range(options['iterations']):
+            if options['cold_cache']:
+                dashboard_cache.invalidate_user(user.pk)
+            with ExitStack() as stack:
+                contexts = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in aliases]
+                started = time.perf_counter()
+                response = self._request(client, method, url, data)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(sum(len(context.captured_queries) for context in contexts))
+            status_code = response.status_code
+
+        # Pico de memória em uma requisição à parte: o tracemalloc distorce a latência
+        if options['cold_cache']:
+            dashboard_cache.invalidate_user(user.pk)
+        tracemalloc.start()
+        try:
+            self._request(client, method, url, data)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'method': method.upper(),
+            'url': url,
+            'status': status_code,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    @staticmethod
+    def _git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, timeout=5
+            ).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
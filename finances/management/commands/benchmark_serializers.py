@@ -0,0 +1,73 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.renderers import JSONRenderer
+
+from finances import ledger, sharding
+from finances.fast_serializers import TransactionReadSerializer
+from finances.models import Transaction, Wallet
+from finances.renderers import FastJSONRenderer, orjson
+from finances.serializers import TransactionSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara linhas/segundo da listagem de transações: TransactionSerializer + JSONRenderer "
+        "contra values() + TransactionReadSerializer + FastJSONRenderer"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Transações geradas para o teste (padrão: 20000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Repetições de cada caminho; vale a melhor (padrão: 3)')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        # Os dados de teste são criados em uma transação desfeita ao final
+        with transaction.atomic():
+            wallet = self._seed(rows)
+            queryset = Transaction.objects.filter(wallet=wallet).order_by('-date', '-created_at', '-id')
+
+            def drf_path():
+                page = list(queryset.select_related('wallet'))
+                return JSONRenderer().render(TransactionSerializer(page, many=True).data)
+
+            def fast_path():
+                page = list(TransactionReadSerializer.values(queryset))
+                return FastJSONRenderer().render(TransactionReadSerializer(page).data)
+
+            results = [('ModelSerializer', self._best(drf_path, repeat)), ('values()', self._best(fast_path, repeat))]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{rows} transações, melhor de {repeat} (orjson: {"sim" if orjson else "não"})')
+        for name, seconds in results:
+            self.stdout.write(f'  {name:<16} {seconds * 1000:9.1f} ms  {rows / seconds:12,.0f} linhas/s')
+        self.stdout.write(self.style.SUCCESS(f'Ganho: {results[0][1] / results[1][1]:.1f}x'))
+
+    def _seed(self, rows):
+        user = User.objects.create_user(f'benchmark-{time.time_ns()}')
+        if sharding.is_enabled():
+            # Dados sintéticos no banco da transação desfeita ao final
+            sharding.assign(user.pk, DEFAULT_DB_ALIAS)
+        wallet = Wallet.objects.create(user=user, name='Benchmark')
+        types = list(ledger.TYPE_FIELDS)
+        start = date(2020, 1, 1)
+        batch = [
+            Transaction(wallet=wallet, transaction_type=types[index % 3], amount=Decimal(index % 1000) + Decimal('0.25'),
+                        date=start + timedelta(days=index % 1500), description=f'Transação {index}')
+            for index in range(rows)
+        ]
+        Transaction.objects.bulk_create(batch, batch_size=5000)
+        return wallet
+
+    @staticmethod
+    def _best(function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
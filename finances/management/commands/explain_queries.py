@@ -0,0 +1,115 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from finances import dashboard_cache, sharding
+from finances.models import Wallet
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa EXPLAIN QUERY PLAN (SQLite) para cada consulta emitida pelas views e "
+        "ViewSets de finances e aponta varreduras completas de tabela e ordenações em B-tree temporária"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Usuário usado nas requisições (padrão: o que tem mais transações)')
+        parser.add_argument('--strict', action='store_true',
+                            help='Termina com erro se alguma consulta for sinalizada')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN só está disponível no SQLite')
+
+        user = self._get_user(options['user'])
+        with sharding.user_scope(user.pk) as alias:
+            wallet = Wallet.objects.filter(user=user).order_by('-transaction_count').first()
+            if wallet is None:
+                raise CommandError(f'O usuário "{user.username}" não possui carteiras')
+
+            flagged = 0
+            # Tudo roda em uma transação desfeita ao final: a sessão criada pelo
+            # login e qualquer outra escrita não ficam no banco (nem no shard)
+            with transaction.atomic(), sharding.atomic():
+                for name, url in self._endpoints(wallet):
+                    flagged += self._explain_endpoint(name, url, user, connections[alias])
+                transaction.set_rollback(True)
+                transaction.set_rollback(True, using=alias)
+
+        if flagged:
+            message = f'{flagged} consulta(s) com varredura completa ou ordenação temporária'
+            if options['strict']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('Nenhuma consulta sinalizada'))
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{username}" não encontrado')
+        user = User.objects.annotate(n=Count('wallets__transactions')).order_by('-n').first()
+        if user is None:
+            raise CommandError('Nenhum usuário cadastrado')
+        return user
+
+    def _endpoints(self, wallet):
+        return [
+            ('dashboard', reverse('dashboard')),
+            ('wallet_detail', reverse('wallet_detail', args=[wallet.pk])),
+            ('all_transactions', reverse('all_transactions')),
+            ('api wallets', reverse('wallet-list')),
+            ('api wallets summary', reverse('wallet-summary')),
+            ('api wallet transactions', reverse('wallet-transactions', args=[wallet.pk])),
+            ('api transactions', reverse('transaction-list')),
+            ('api transactions by_type', reverse('transaction-by-type') + '?type=dividend'),
+            ('api monthly_summary', reverse('transaction-monthly-summary')),
+            ('api yearly_summary', reverse('transaction-yearly-summary')),
+        ]
+
+    def _explain_endpoint(self, name, url, user, database):
+        client = Client()
+        client.force_login(user)
+        # O dashboard em cache não emitiria consultas
+        dashboard_cache.invalidate_user(user.pk)
+
+        with override_settings(ALLOWED_HOSTS=['testserver']), CaptureQueriesContext(database) as context:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{name}: {url} respondeu {response.status_code}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{name} ({url})'))
+        flagged = 0
+        seen = set()
+        for query in context.captured_queries:
+            sql = query['sql']
+            if 'finances_' not in sql or not sql.lstrip().upper().startswith('SELECT') or sql in seen:
+                continue
+            seen.add(sql)
+            with database.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            issues = [step for step in plan if self._is_issue(step)]
+            flagged += bool(issues)
+
+            self.stdout.write(f'  {sql[:160]}{"..." if len(sql) > 160 else ""}')
+            for step in plan:
+                line = f'    {step}'
+                self.stdout.write(self.style.ERROR(line) if step in issues else line)
+        return flagged
+
+    @staticmethod
+    def _is_issue(step):
+        """Varredura completa (SCAN sem índice) ou ordenação/agrupamento em B-tree temporária"""
+        if 'USE TEMP B-TREE' in step:
+            return True
+        if not step.startswith('SCAN ') or 'USING' in step:
+            return False
+        # Percorrer o resultado de uma subconsulta já materializada não é varrer uma tabela
+        return not step[len('SCAN '):].lstrip('(').startswith(('subquery', 'CONSTANT ROW'))
@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from finances import sharding
+from finances.exports import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, iter_export
+from finances.models import ArchivedTransaction, Transaction, Wallet
+
+
+def wallet_shard(wallet_id, shard=None):
+    """Shard da carteira ``wallet_id``; ``shard`` desfaz a ambiguidade entre shards"""
+    shards = sharding.wallet_shards(wallet_id)
+    if shard is not None:
+        shards = [alias for alias in shards if alias == shard]
+    if not shards:
+        raise CommandError(f'Carteira {wallet_id} não encontrada')
+    if len(shards) > 1:
+        raise CommandError(f'Carteira {wallet_id} existe nos shards {", ".join(shards)}; use --shard')
+    return shards[0]
+
+
+class Command(BaseCommand):
+    help = "Exporta as transações de um usuário ou de uma carteira em CSV ou NDJSON, em fluxo"
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--user', help='Nome de usuário cujas transações serão exportadas')
+        target.add_argument('--wallet', type=int, help='ID da carteira a exportar')
+        parser.add_argument('--shard', help='Shard da carteira, se o id existir em mais de um')
+        parser.add_argument('--format', dest='export_format', choices=list(EXPORT_FORMATS), default='csv',
+                            help='Formato de saída (padrão: csv)')
+        parser.add_argument('--include-archived', action='store_true',
+                            help='Inclui as transações arquivadas (ver finances.archive)')
+        parser.add_argument('--output', '-o', help='Arquivo de saída (padrão: saída padrão)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help=f'Linhas lidas do banco por lote (padrão: {DEFAULT_CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário "{options["user"]}" não encontrado')
+            alias = sharding.shard_for_user(user.pk)
+            lookup = {'wallet_id__in': Wallet.objects.filter(user=user).values('pk')}
+        else:
+            alias = wallet_shard(options['wallet'], options['shard'])
+            lookup = {'wallet_id': options['wallet']}
+        queryset = Transaction.objects.using(alias).filter(**lookup)
+        archived = ArchivedTransaction.objects.using(alias).filter(**lookup) if options['include_archived'] else None
+
+        chunks = iter_export(queryset, options['export_format'], chunk_size=options['chunk_size'], archived=archived)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            self.stderr.write(self.style.SUCCESS(f'Exportação gravada em {options["output"]}'))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
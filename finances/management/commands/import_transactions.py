@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finances.importers import DEFAULT_BATCH_SIZE, IMPORT_FORMATS, detect_format, import_transactions
+from finances.management.commands.export_transactions import wallet_shard
+from finances.models import Wallet
+
+
+class Command(BaseCommand):
+    help = "Importa transações de um extrato CSV ou OFX para uma carteira, em lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo CSV ou OFX')
+        parser.add_argument('--wallet', type=int, required=True, help='ID da carteira de destino')
+        parser.add_argument('--shard', help='Shard da carteira, se o id existir em mais de um')
+        parser.add_argument('--format', dest='import_format', choices=IMPORT_FORMATS,
+                            help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Transações gravadas por lote (padrão: {DEFAULT_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        alias = wallet_shard(options['wallet'], options['shard'])
+        wallet = Wallet.objects.using(alias).get(pk=options['wallet'])
+
+        import_format = options['import_format'] or detect_format(options['path'])
+        if import_format is None:
+            raise CommandError('Não foi possível detectar o formato; use --format csv ou --format ofx')
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size deve ser maior que zero')
+
+        def progress(report):
+            self.stderr.write(f'{report.rows} linhas lidas, {report.created} transações criadas, '
+                              f'{len(report.errors)} erros')
+
+        try:
+            with open(options['path'], 'rb') as lines:
+                report = import_transactions(wallet, lines, import_format,
+                                             batch_size=options['batch_size'], progress=progress)
+        except OSError as error:
+            raise CommandError(f'Não foi possível ler o arquivo: {error}')
+
+        for line, message in report.errors:
+            self.stderr.write(self.style.ERROR(f'Linha {line}: {message}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.created} de {report.rows} transações importadas para "{wallet.name}"'
+        ))
@@ -0,0 +1,64 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from finances import sharding
+
+
+class Command(BaseCommand):
+    help = (
+        "Move os dados financeiros dos usuários que não estão no shard indicado pelo hash (por "
+        "exemplo, depois de acrescentar um shard em FINANCES_DB_SHARDS), um usuário por vez e "
+        "as transações em lotes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Move apenas este usuário')
+        parser.add_argument('--to', help='Shard de destino (só com --user; padrão: o do hash)')
+        parser.add_argument('--limit', type=int, help='Máximo de usuários movidos nesta execução')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Linhas copiadas por lote (padrão: 1000)')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas lista os usuários a mover')
+
+    def handle(self, *args, **options):
+        shards = sharding.get_shards()
+        if not sharding.is_enabled():
+            raise CommandError('Apenas um shard configurado; defina FINANCES_DB_SHARDS')
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size deve ser maior que zero')
+        if options['to'] and not options['user']:
+            raise CommandError('--to só pode ser usado com --user')
+        if options['to'] and options['to'] not in shards:
+            raise CommandError(f'"{options["to"]}" não está em FINANCES_SHARDS ({", ".join(shards)})')
+
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f'Usuário "{options["user"]}" não encontrado')
+
+        moved = skipped = 0
+        for user_id, username in users.values_list('pk', 'username').iterator():
+            if options['limit'] is not None and moved >= options['limit']:
+                break
+            source = sharding.shard_for_user(user_id)
+            target = options['to'] or sharding.placement(user_id)
+            if source == target:
+                continue
+            if options['dry_run']:
+                self.stdout.write(f'{username}: {source} -> {target}')
+                moved += 1
+                continue
+            try:
+                copied = sharding.move_user(user_id, source, target, options['batch_size'])
+            except sharding.ConcurrentWriteError as error:
+                self.stderr.write(self.style.WARNING(f'{username}: {error}; tente de novo'))
+                skipped += 1
+                continue
+            moved += 1
+            self.stdout.write(
+                f'{username}: {source} -> {target} ({copied["wallets"]} carteiras, '
+                f'{copied["transactions"]} transações)'
+            )
+
+        verb = 'a mover' if options['dry_run'] else 'movidos'
+        self.stdout.write(self.style.SUCCESS(f'{moved} usuários {verb}, {skipped} adiados por escritas concorrentes'))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finances import ledger, sharding
+from finances.models import ArchivedTransaction, Transaction, Wallet, WalletBalanceCheckpoint, WalletMonthlySummary
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói os resumos mensais (WalletMonthlySummary) e, a partir deles, os checkpoints de "
+        "saldo de fim de mês (WalletBalanceCheckpoint) de todas as carteiras, em lotes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Quantidade de carteiras processadas por lote (padrão: 500)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size deve ser maior que zero')
+
+        wallets = rows = checkpoints = 0
+        through = ledger.last_closed_month_end()
+        for alias in sharding.get_shards():
+            with sharding.shard_scope(alias):
+                last_pk = 0
+                while True:
+                    with sharding.atomic():
+                        wallet_ids = list(
+                            Wallet.objects.select_for_update()
+                            .filter(pk__gt=last_pk).order_by('pk')
+                            .values_list('pk', flat=True)[:chunk_size]
+                        )
+                        if not wallet_ids:
+                            break
+                        last_pk = wallet_ids[-1]
+
+                        # Um mês pode ter transações arquivadas e atuais (lançadas depois com data antiga)
+                        summaries = {}
+                        for model in (Transaction, ArchivedTransaction):
+                            for row in ledger.monthly_rows(model.objects.filter(wallet_id__in=wallet_ids)):
+                                key = (row['wallet_id'], row['year'], row['month'], row['transaction_type'])
+                                if key in summaries:
+                                    summaries[key].total_amount += row['total_amount']
+                                    summaries[key].transaction_count += row['transaction_count']
+                                else:
+                                    summaries[key] = WalletMonthlySummary(**row)
+
+                        WalletMonthlySummary.objects.filter(wallet_id__in=wallet_ids).delete()
+                        summaries = WalletMonthlySummary.objects.bulk_create(summaries.values())
+
+                        WalletBalanceCheckpoint.objects.filter(wallet_id__in=wallet_ids).delete()
+                        for wallet_id in wallet_ids:
+                            ledger.fill_checkpoints(wallet_id, through)
+                        checkpoints += WalletBalanceCheckpoint.objects.filter(wallet_id__in=wallet_ids).count()
+                    wallets += len(wallet_ids)
+                    rows += len(summaries)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{wallets} carteiras processadas, {rows} resumos mensais e {checkpoints} checkpoints gerados'
+        ))
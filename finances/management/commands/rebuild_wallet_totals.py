@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Max
+from django.utils import timezone
+
+from finances import archive, ledger, sharding
+from finances.models import ArchivedTransaction, Wallet, WalletOpeningBalance
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula (ou apenas verifica) os totais armazenados e os saldos de abertura das "
+        "transações arquivadas de todas as carteiras, em lotes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Apenas compara os totais armazenados com os recalculados, sem gravar')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Quantidade de carteiras processadas por lote (padrão: 500)')
+
+    def handle(self, *args, **options):
+        verify = options['verify']
+        chunk_size = options['chunk_size']
+        if chunk_size <= 0:
+            raise CommandError('--chunk-size deve ser maior que zero')
+
+        checked = mismatched = 0
+        for alias in sharding.get_shards():
+            with sharding.shard_scope(alias):
+                last_pk = 0
+                while True:
+                    with sharding.atomic():
+                        wallets = list(
+                            Wallet.objects.select_for_update()
+                            .filter(pk__gt=last_pk).order_by('pk')
+                            .only('pk', *ledger.STORED_FIELDS)[:chunk_size]
+                        )
+                        if not wallets:
+                            break
+                        last_pk = wallets[-1].pk
+                        totals = ledger.live_totals([w.pk for w in wallets])
+
+                        stale = []
+                        for wallet in wallets:
+                            expected = totals[wallet.pk]
+                            if any(getattr(wallet, field) != expected[field] for field in ledger.STORED_FIELDS):
+                                self.stdout.write(f'Carteira {wallet.pk}: totais divergentes')
+                                for field in ledger.STORED_FIELDS:
+                                    setattr(wallet, field, expected[field])
+                                stale.append(wallet)
+                        if stale and not verify:
+                            Wallet.objects.bulk_update(stale, ledger.STORED_FIELDS)
+                            # Totais corrigidos invalidam o ETag das respostas já entregues
+                            Wallet.objects.filter(pk__in=[wallet.pk for wallet in stale]).update(
+                                version=F('version') + 1, updated_at=timezone.now()
+                            )
+                        # Uma carteira com totais e saldo de abertura divergentes conta uma vez
+                        divergent = {wallet.pk for wallet in stale}
+                        divergent.update(self._check_openings([w.pk for w in wallets], verify))
+                        mismatched += len(divergent)
+                    checked += len(wallets)
+
+        if verify and mismatched:
+            raise CommandError(f'{mismatched} de {checked} carteiras com totais divergentes')
+        if verify:
+            self.stdout.write(self.style.SUCCESS(f'{checked} carteiras verificadas, nenhuma divergência'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{checked} carteiras processadas, {mismatched} corrigidas'))
+
+    def _check_openings(self, wallet_ids, verify):
+        """
+        Compara os saldos de abertura com a soma das transações arquivadas e
+        devolve os ids das carteiras divergentes
+        """
+        expected = ledger.live_totals(wallet_ids, models=[ArchivedTransaction])
+        stored = archive.opening_totals(wallet_ids)
+        stale = [wallet_id for wallet_id in wallet_ids if stored[wallet_id] != expected[wallet_id]]
+        for wallet_id in stale:
+            self.stdout.write(f'Carteira {wallet_id}: saldo de abertura divergente')
+        if stale and not verify:
+            last_dates = dict(
+                ArchivedTransaction.objects.filter(wallet_id__in=stale).order_by()
+                .values_list('wallet_id').annotate(last=Max('date'))
+            )
+            for wallet_id in stale:
+                if wallet_id not in last_dates:
+                    WalletOpeningBalance.objects.filter(wallet_id=wallet_id).delete()
+                    continue
+                opening, created = WalletOpeningBalance.objects.get_or_create(
+                    wallet_id=wallet_id,
+                    defaults={'archived_before': last_dates[wallet_id] + timedelta(days=1), **expected[wallet_id]},
+                )
+                if not created:
+                    WalletOpeningBalance.objects.filter(pk=wallet_id).update(**expected[wallet_id])
+        return stale
@@ -0,0 +1,130 @@
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from finances import ledger, sharding
+from finances.models import Transaction, Wallet
+
+
+WALLET_NAMES = ['Conta Corrente', 'Reserva de Emergência', 'Corretora', 'Previdência', 'Poupança', 'Cripto']
+WITHDRAWAL_DESCRIPTIONS = ['Mercado', 'Aluguel', 'Restaurante', 'Farmácia', 'Combustível', 'Streaming', 'Viagem']
+
+# Proporção de cada tipo entre as transações geradas
+TYPE_WEIGHTS = {'deposit': 0.25, 'withdrawal': 0.6, 'dividend': 0.15}
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera usuários, carteiras e transações sintéticos em lote, com distribuição realista de "
+        "datas, tipos e valores, mantendo totais e resumos mensais via finances.ledger"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Usuários a criar (padrão: 10)')
+        parser.add_argument('--wallets', type=int, default=3, help='Carteiras por usuário (padrão: 3)')
+        parser.add_argument('--transactions', type=int, default=1000,
+                            help='Transações por carteira (padrão: 1000)')
+        parser.add_argument('--years', type=int, default=5, help='Anos de histórico até hoje (padrão: 5)')
+        parser.add_argument('--prefix', default='seed', help='Prefixo dos nomes de usuário (padrão: seed)')
+        parser.add_argument('--password', default='senha-segura-123', help='Senha dos usuários criados')
+        parser.add_argument('--seed', type=int, help='Semente do gerador, para repetir os mesmos dados')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Transações gravadas por bulk_create (padrão: 5000)')
+
+    def handle(self, *args, **options):
+        for name in ('users', 'wallets', 'transactions', 'years', 'batch_size'):
+            if options[name] <= 0:
+                raise CommandError(f'--{name.replace("_", "-")} deve ser maior que zero')
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        users = self._create_users(options['prefix'], options['users'], options['password'])
+        # Com vários shards, as carteiras de cada usuário são gravadas no shard dele
+        users_by_shard = defaultdict(list)
+        for user in users:
+            users_by_shard[sharding.shard_for_user(user.pk)].append(user)
+        wallets = []
+        for alias, shard_users in users_by_shard.items():
+            with sharding.shard_scope(alias):
+                wallets += Wallet.objects.bulk_create([
+                    Wallet(user=user, name=WALLET_NAMES[index % len(WALLET_NAMES)])
+                    for user in shard_users for index in range(options['wallets'])
+                ])
+
+        today = now().date()
+        first_day = today - timedelta(days=365 * options['years'])
+        created = 0
+        batches = defaultdict(list)
+        for wallet in wallets:
+            batch = batches[wallet._state.db]
+            for data in self._wallet_transactions(rng, first_day, today, options['transactions']):
+                batch.append(Transaction(wallet=wallet, **data))
+                if len(batch) >= options['batch_size']:
+                    created += self._flush(batch)
+                    batch.clear()
+        for batch in batches.values():
+            if batch:
+                created += self._flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(users)} usuários, {len(wallets)} carteiras e {created} transações criados '
+            f'em {time.perf_counter() - started:.1f}s'
+        ))
+
+    def _create_users(self, prefix, count, password):
+        # O hash da senha é caro: calculado uma vez e reaproveitado
+        password = make_password(password)
+        suffix = time.strftime('%Y%m%d%H%M%S')
+        usernames = [f'{prefix}-{suffix}-{index}' for index in range(count)]
+        if User.objects.filter(username__in=usernames).exists():
+            raise CommandError('Usuários com esses nomes já existem; use outro --prefix')
+        User.objects.bulk_create([
+            User(username=username, email=f'{username}@example.com', password=password)
+            for username in usernames
+        ])
+        users = list(User.objects.filter(username__in=usernames).order_by('id'))
+        sharding.assign_new_users([user.pk for user in users])
+        return users
+
+    def _wallet_transactions(self, rng, first_day, today, count):
+        """
+        Transações de uma carteira: depósitos concentrados no início do mês
+        (salário), rendimentos no fim do mês e saques espalhados, com valores
+        log-normais e mais atividade nos meses recentes.
+        """
+        span = (today - first_day).days
+        types = rng.choices(list(TYPE_WEIGHTS), weights=list(TYPE_WEIGHTS.values()), k=count)
+        for transaction_type in types:
+            # sqrt concentra as datas perto de hoje: o histórico cresce com o tempo
+            day = first_day + timedelta(days=int(span * rng.random() ** 0.5))
+            if transaction_type == 'deposit':
+                day = day.replace(day=min(rng.choice([1, 5, 5, 5, 10, 15]), 28))
+                amount = rng.lognormvariate(8, 0.5)
+                description = 'Salário' if day.day == 5 else 'Transferência'
+            elif transaction_type == 'dividend':
+                day = day.replace(day=rng.randint(15, 28))
+                amount = rng.lognormvariate(4, 1)
+                description = 'Dividendos'
+            else:
+                amount = rng.lognormvariate(4.5, 1)
+                description = rng.choice(WITHDRAWAL_DESCRIPTIONS)
+            yield {
+                'transaction_type': transaction_type,
+                'amount': min(Decimal(str(round(amount, 2))), Decimal('99999999.99')).max(Decimal('0.01')),
+                'date': min(day, today),
+                'description': description,
+            }
+
+    @staticmethod
+    def _flush(batch):
+        with sharding.writing(batch[0]._state.db):
+            Transaction.objects.bulk_create(batch)
+            ledger.apply(added=[item.ledger_entry() for item in batch])
+        return len(batch)
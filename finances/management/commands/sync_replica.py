@@ -0,0 +1,77 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from finances.routers import get_replicas
+
+
+def copy_database(source, target, pages=-1):
+    """
+    Copia o banco SQLite ``source`` sobre ``target`` pela API de backup: uma
+    cópia consistente mesmo com escritas em andamento no principal. Leitores
+    da réplica esperam (busy_timeout) apenas enquanto a cópia é gravada.
+    """
+    source_connection = sqlite3.connect(source)
+    target_connection = sqlite3.connect(target, timeout=30)
+    try:
+        source_connection.backup(target_connection, pages=pages)
+    finally:
+        target_connection.close()
+        source_connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Substituto local da replicação: copia o banco SQLite principal para as réplicas de leitura "
+        "(FINANCES_READ_REPLICAS) pela API de backup do SQLite, uma vez ou a cada --interval segundos"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append',
+                            help='Alias da réplica a atualizar (repetível; padrão: todas)')
+        parser.add_argument('--interval', type=float,
+                            help='Repete a cópia a cada N segundos até ser interrompido')
+        parser.add_argument('--pages', type=int, default=-1,
+                            help='Páginas copiadas por passo do backup (padrão: todas de uma vez)')
+
+    def handle(self, *args, **options):
+        replicas = options['database'] or get_replicas()
+        if not replicas:
+            raise CommandError('Nenhuma réplica configurada; defina FINANCES_DB_REPLICAS')
+        source = self._sqlite_path(DEFAULT_DB_ALIAS)
+        targets = []
+        for alias in replicas:
+            if alias not in get_replicas():
+                raise CommandError(f'"{alias}" não está em FINANCES_READ_REPLICAS')
+            targets.append((alias, self._sqlite_path(alias)))
+
+        pin_seconds = getattr(settings, 'FINANCES_REPLICA_PIN_SECONDS', 15)
+        while True:
+            round_started = time.perf_counter()
+            for alias, target in targets:
+                started = time.perf_counter()
+                # Conexões abertas do processo atual com a réplica veriam a cópia pela metade
+                connections[alias].close()
+                copy_database(source, target, options['pages'])
+                self.stdout.write(f'{alias}: copiado em {time.perf_counter() - started:.2f}s')
+            if not options['interval']:
+                break
+            lag = options['interval'] + time.perf_counter() - round_started
+            if lag >= pin_seconds:
+                self.stderr.write(self.style.WARNING(
+                    f'Atraso da réplica ({lag:.1f}s) passa de FINANCES_REPLICA_PIN_SECONDS ({pin_seconds}s): '
+                    'as leituras logo após uma escrita podem não vê-la; reduza --interval ou aumente o prazo'
+                ))
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def _sqlite_path(alias):
+        database = settings.DATABASES[alias]
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError(f'"{alias}" não é SQLite; use a replicação do próprio banco')
+        if connections[alias].is_in_memory_db():
+            raise CommandError(f'"{alias}" é um banco em memória')
+        return str(database['NAME'])
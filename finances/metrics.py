@@ -0,0 +1,262 @@
+"""
+Instrumentação por requisição: consultas SQL, tempo de banco, da view e da
+renderização.
+
+``RequestMetricsMiddleware`` mede cada requisição e:
+
+- devolve os tempos no cabeçalho ``Server-Timing`` (visível no DevTools);
+- registra uma linha JSON no logger ``finances.metrics`` (INFO, ou WARNING
+  acima de ``FINANCES_METRICS_SLOW_MS``);
+- acumula histogramas por rota (nome da URL), expostos em formato
+  Prometheus por ``metrics_view`` (somente staff).
+
+As consultas são contadas por um ``execute_wrapper`` instalado em cada
+conexão ao ser criada (o sinal é conectado em ``FinancesConfig.ready``), que só registra quando há uma requisição em
+andamento no contexto atual (``contextvars``, que acompanha também o ORM
+assíncrono). Os histogramas ficam na memória de cada processo; com vários
+workers, cada um expõe os próprios números.
+
+Configurações opcionais:
+
+- ``FINANCES_METRICS_SLOW_MS``: requisições mais lentas são registradas como WARNING (padrão 500)
+"""
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+
+logger = logging.getLogger('finances.metrics')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_current = ContextVar('finances_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Medições de uma requisição em andamento"""
+
+    __slots__ = ('started', 'queries', 'db_time', 'view_started', 'view_time', 'render_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_started = None
+        self.view_time = None
+        self.render_started = None
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_wrapper, dispatch_uid='finances.metrics.install_query_wrapper')
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Histogramas e contadores por rota, protegidos por um lock (servidores com threads)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = defaultdict(int)
+        self.duration = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self.db_queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.db_seconds = defaultdict(float)
+        self.view_seconds = defaultdict(float)
+        self.render_seconds = defaultdict(float)
+
+    def observe(self, route, method, status, data):
+        with self.lock:
+            self.requests[(route, method, status)] += 1
+            self.duration[(route, method)].observe(data['total_ms'] / 1000)
+            self.db_queries[route].observe(data['db_queries'])
+            self.db_seconds[route] += data['db_ms'] / 1000
+            self.view_seconds[route] += (data['view_ms'] or 0) / 1000
+            self.render_seconds[route] += (data['render_ms'] or 0) / 1000
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus"""
+        lines = []
+        with self.lock:
+            lines += _header('finances_requests_total', 'counter', 'Requisições por rota, método e status')
+            for (route, method, status), value in sorted(self.requests.items()):
+                lines.append(f'finances_requests_total{_labels(route=route, method=method, status=status)} {value}')
+            lines += _histogram('finances_request_duration_seconds', 'Duração total da requisição',
+                                self.duration, ('route', 'method'))
+            lines += _histogram('finances_request_db_queries', 'Consultas SQL por requisição',
+                                self.db_queries, ('route',))
+            for name, values, help_text in (
+                ('finances_request_db_seconds_total', self.db_seconds, 'Tempo acumulado em consultas SQL'),
+                ('finances_request_view_seconds_total', self.view_seconds, 'Tempo acumulado nas views'),
+                ('finances_request_render_seconds_total', self.render_seconds, 'Tempo acumulado renderizando respostas'),
+            ):
+                lines += _header(name, 'counter', help_text)
+                for route, value in sorted(values.items()):
+                    lines.append(f'{name}{_labels(route=route)} {value:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+def _header(name, kind, help_text):
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+
+
+def _labels(**labels):
+    escaped = (
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _histogram(name, help_text, histograms, label_names):
+    lines = _header(name, 'histogram', help_text)
+    for key, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(**labels)} {histogram.total:.6f}')
+        lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+    return lines
+
+
+registry = Registry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Deve ser o primeiro da lista ``MIDDLEWARE`` para que o tempo total inclua
+    os demais middlewares. Funciona em WSGI e ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'FINANCES_METRICS_SLOW_MS', 500)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Chamado entre o fim da view e a renderização (templates e Response do DRF)
+        metrics = _current.get()
+        if metrics is not None and metrics.view_started is not None:
+            metrics.render_started = time.perf_counter()
+            metrics.view_time = metrics.render_started - metrics.view_started
+        return response
+
+    def _finish(self, request, response, metrics):
+        finished = time.perf_counter()
+        if metrics.render_started is not None:
+            render_time = finished - metrics.render_started
+        else:
+            render_time = None
+            if metrics.view_started is not None:
+                metrics.view_time = finished - metrics.view_started
+
+        match = getattr(request, 'resolver_match', None)
+        route = (match.view_name or match.route) if match else 'unmatched'
+        data = {
+            'route': route,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'db_queries': metrics.queries,
+            'db_ms': round(metrics.db_time * 1000, 3),
+            'view_ms': None if metrics.view_time is None else round(metrics.view_time * 1000, 3),
+            'render_ms': None if render_time is None else round(render_time * 1000, 3),
+            'total_ms': round((finished - metrics.started) * 1000, 3),
+        }
+
+        timings = [f'db;dur={data["db_ms"]};desc="{metrics.queries} queries"']
+        if data['view_ms'] is not None:
+            timings.append(f'view;dur={data["view_ms"]}')
+        if data['render_ms'] is not None:
+            timings.append(f'render;dur={data["render_ms"]}')
+        timings.append(f'total;dur={data["total_ms"]}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        registry.observe(route, request.method, response.status_code, data)
+        level = logging.WARNING if data['total_ms'] >= self.slow_ms else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps(data))
+        return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """
+    GET /finances/metrics/ - histogramas por rota no formato do Prometheus
+    (somente staff; aceita sessão ou token)
+    """
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
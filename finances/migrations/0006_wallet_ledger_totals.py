@@ -0,0 +1,66 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+
+def backfill_wallet_totals(apps, schema_editor):
+    """Preenche os totais das carteiras existentes a partir das transações"""
+    Wallet = apps.get_model('finances', 'Wallet')
+    Transaction = apps.get_model('finances', 'Transaction')
+    fields = {'deposit': 'total_deposits', 'withdrawal': 'total_withdrawals', 'dividend': 'total_dividends'}
+    using = schema_editor.connection.alias
+
+    totals = {}
+    rows = (
+        Transaction.objects.using(using).order_by()
+        .values('wallet_id', 'transaction_type')
+        .annotate(total=models.Sum('amount'), n=models.Count('id'))
+    )
+    for row in rows:
+        wallet_totals = totals.setdefault(row['wallet_id'], {'transaction_count': 0})
+        wallet_totals[fields[row['transaction_type']]] = row['total'] or 0
+        wallet_totals['transaction_count'] += row['n']
+
+    for wallet_id, values in totals.items():
+        deposits = values.get('total_deposits', 0)
+        withdrawals = values.get('total_withdrawals', 0)
+        dividends = values.get('total_dividends', 0)
+        Wallet.objects.using(using).filter(pk=wallet_id).update(
+            balance=deposits - withdrawals + dividends, **values
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0005_auto_20251003_1722'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='total_deposits',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='total_dividends',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='total_withdrawals',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='transaction_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_wallet_totals, migrations.RunPython.noop),
+    ]
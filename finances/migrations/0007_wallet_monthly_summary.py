@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_monthly_summaries(apps, schema_editor):
+    """Gera os resumos mensais a partir das transações existentes"""
+    Transaction = apps.get_model('finances', 'Transaction')
+    WalletMonthlySummary = apps.get_model('finances', 'WalletMonthlySummary')
+    using = schema_editor.connection.alias
+
+    rows = (
+        Transaction.objects.using(using).order_by()
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('wallet_id', 'year', 'month', 'transaction_type')
+        .annotate(total_amount=models.Sum('amount'), transaction_count=models.Count('id'))
+    )
+    WalletMonthlySummary.objects.using(using).bulk_create(
+        (WalletMonthlySummary(**row) for row in rows.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0006_wallet_ledger_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletMonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('transaction_type', models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('dividend', 'Dividend')], max_length=15)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to='finances.wallet')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('wallet', 'year', 'month', 'transaction_type'), name='unique_wallet_month_type')],
+            },
+        ),
+        migrations.RunPython(backfill_monthly_summaries, migrations.RunPython.noop),
+    ]
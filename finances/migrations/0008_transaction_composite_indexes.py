@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0007_wallet_monthly_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='wallet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='finances.wallet'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', '-date', '-created_at'], name='transaction_wallet_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'transaction_type', 'date'], name='transaction_wallet_type_idx'),
+        ),
+    ]
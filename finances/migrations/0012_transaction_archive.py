@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0011_user_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletOpeningBalance',
+            fields=[
+                ('wallet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='opening_balance', serialize=False, to='finances.wallet')),
+                ('archived_before', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_deposits', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_withdrawals', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_dividends', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('transaction_type', models.CharField(choices=[('deposit', 'Deposit'), ('withdrawal', 'Withdrawal'), ('dividend', 'Dividend')], max_length=15)),
+                ('date', models.DateField()),
+                ('description', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('wallet', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='finances.wallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['wallet', 'date', 'created_at', 'id'], name='archived_wallet_key_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:08
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_balance_checkpoints(apps, schema_editor):
+    """Gera os checkpoints de fim de mês das carteiras existentes a partir dos resumos mensais"""
+    from finances import ledger
+
+    WalletMonthlySummary = apps.get_model('finances', 'WalletMonthlySummary')
+    WalletBalanceCheckpoint = apps.get_model('finances', 'WalletBalanceCheckpoint')
+    using = schema_editor.connection.alias
+
+    summaries = defaultdict(list)
+    rows = (
+        WalletMonthlySummary.objects.using(using).order_by()
+        .values_list('wallet_id', 'year', 'month', 'transaction_type', 'total_amount', 'transaction_count')
+    )
+    for wallet_id, *summary in rows.iterator():
+        summaries[wallet_id].append(summary)
+
+    through = ledger.last_closed_month_end()
+    WalletBalanceCheckpoint.objects.using(using).bulk_create(
+        (
+            WalletBalanceCheckpoint(wallet_id=wallet_id, date=day, **totals)
+            for wallet_id, wallet_summaries in summaries.items()
+            for day, totals in ledger.checkpoint_rows(wallet_summaries, through)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0012_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletBalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_deposits', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_withdrawals', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_dividends', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to='finances.wallet')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('wallet', 'date'), name='unique_wallet_checkpoint_date')],
+            },
+        ),
+        migrations.RunPython(backfill_balance_checkpoints, migrations.RunPython.noop),
+    ]
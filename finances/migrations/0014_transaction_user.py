@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_transaction_users(apps, schema_editor):
+    """Copia o dono da carteira para as transações existentes, em um único UPDATE"""
+    Transaction = apps.get_model('finances', 'Transaction')
+    Wallet = apps.get_model('finances', 'Wallet')
+    using = schema_editor.connection.alias
+
+    Transaction.objects.using(using).update(
+        user_id=models.Subquery(Wallet.objects.filter(pk=models.OuterRef('wallet_id')).values('user_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finances', '0013_wallet_balance_checkpoints'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_transaction_users, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='transaction',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, db_index=False, editable=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'date', 'created_at', 'id'], name='transaction_user_key_idx'),
+        ),
+    ]
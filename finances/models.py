@@ -1,27 +1,136 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, router
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from . import ledger, sharding
+
+
+class WalletQuerySet(models.QuerySet):
+
+    def with_balances(self):
+        """
+        Anota saldo e totais por tipo de cada carteira a partir dos totais
+        armazenados (mantidos exatos por ``finances.ledger``), sem agregar as
+        transações; ``rebuild_wallet_totals --verify`` confere esses totais
+        com as transações (``ledger.live_totals``).
+        """
+        return self.annotate(
+            deposits=models.F('total_deposits'),
+            withdrawals=models.F('total_withdrawals'),
+            dividends=models.F('total_dividends'),
+            total_balance=models.F('balance'),
+        )
 
 
 class Wallet(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="wallets")
+    # Sem constraint: com vários shards (finances.sharding), o usuário fica em outro banco
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="wallets", db_constraint=False)
     name = models.CharField(max_length=100, default="My Wallet")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Totais desnormalizados, mantidos por finances.ledger a cada escrita em Transaction
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    total_deposits = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    total_withdrawals = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    total_dividends = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    transaction_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # Versão de mudança: incrementada (e updated_at renovado) a cada escrita na
+    # carteira ou em suas transações; base do ETag/Last-Modified da API
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = WalletQuerySet.as_manager()
+
     def __str__(self):
         return f"Wallet of {self.user.username}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Dono carregado, para propagar uma troca de usuário a Transaction.user
+        instance._loaded_user_id = instance.__dict__.get('user_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Os totais só mudam via finances.ledger; um save() comum (ex.: renomear)
+        # não pode sobrescrevê-los com os valores possivelmente antigos da instância
+        adding = self._state.adding
+        if not adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ledger.STORED_FIELDS and field.name != 'version'
+            ]
+        super().save(*args, **kwargs)
+        if not adding:
+            Wallet.objects.using(self._state.db).filter(pk=self.pk).update(version=models.F('version') + 1)
+        loaded_user_id = getattr(self, '_loaded_user_id', None)
+        if loaded_user_id is not None and loaded_user_id != self.user_id:
+            Transaction.objects.using(self._state.db).filter(wallet_id=self.pk).update(user_id=self.user_id)
+        self._loaded_user_id = self.user_id
     
     def get_total_balance(self):
-        # Calcular baseado nas transações diretas da carteira
-        deposits = self.transactions.filter(transaction_type="deposit").aggregate(models.Sum("amount"))["amount__sum"] or 0
-        withdrawals = self.transactions.filter(transaction_type="withdrawal").aggregate(models.Sum("amount"))["amount__sum"] or 0
-        dividends = self.transactions.filter(transaction_type="dividend").aggregate(models.Sum("amount"))["amount__sum"] or 0
-        return float(deposits - withdrawals + dividends)
+        # Saldo armazenado: leitura O(1), independente do número de transações
+        return float(self.balance)
+
+    def totals_as_of(self, day):
+        """
+        Totais acumulados até ``day`` (inclusive), no formato de
+        ``ledger.live_totals``: um checkpoint de fim de mês mais as
+        transações posteriores a ele. Devolve ``(totais, data do checkpoint)``.
+        """
+        with sharding.shard_scope(self._state.db or sharding.current_shard()):
+            return ledger.totals_as_of(self.pk, day)
+
+    def balance_as_of(self, day):
+        """Saldo no fim do dia ``day``"""
+        return self.totals_as_of(day)[0]['balance']
+
+
+
+
+class TransactionQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        self._set_users(objs)
+        return super().bulk_create(objs, *args, **kwargs)
 
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if 'wallet' in fields or 'wallet_id' in fields:
+            # Uma transação movida de carteira leva junto o dono da nova carteira
+            self._set_users(objs, force=True)
+            fields = [*fields, 'user']
+        return super().bulk_update(objs, fields, *args, **kwargs)
 
+    def _set_users(self, objs, force=False):
+        """Preenche ``user_id`` a partir da carteira, em uma consulta para as carteiras fora do cache"""
+        wallet_field = Transaction._meta.get_field('wallet')
+        missing = [obj for obj in objs if force or obj.user_id is None]
+        uncached = {obj.wallet_id for obj in missing if not wallet_field.is_cached(obj)}
+        owners = dict(
+            Wallet.objects.using(self.db).filter(pk__in=uncached).values_list('pk', 'user_id')
+        ) if uncached else {}
+        for obj in missing:
+            obj.user_id = obj.wallet.user_id if wallet_field.is_cached(obj) else owners.get(obj.wallet_id)
+
+    def delete(self):
+        # Exclusões em lote (ex.: ações do admin) também precisam atualizar os totais
+        with sharding.writing(self.db):
+            removed = ledger.entries_from_queryset(self)
+            result = super().delete()
+            ledger.apply(removed=removed)
+        return result
 
 
 class Transaction(models.Model):
-    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="transactions")
+    # Sem índice próprio: os índices compostos abaixo começam por wallet e o substituem
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="transactions", db_index=False)
+    # Dono da carteira, desnormalizado para as listagens de todas as transações do
+    # usuário; mantido por save(), bulk_create()/bulk_update() e Wallet.save()
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name="+", db_constraint=False,
+                             db_index=False, editable=False)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     transaction_type = models.CharField(
         max_length=15,
@@ -35,5 +144,181 @@ class Transaction(models.Model):
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = TransactionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Listagens por carteira ordenadas por ('-date', '-created_at', '-id'), percorrido
+            # de trás para frente; também serve a paginação por cursor sobre essa chave
+            models.Index(fields=['wallet', 'date', 'created_at', 'id'], name='transaction_wallet_key_idx'),
+            # A mesma chave para as listagens de todas as carteiras do usuário
+            models.Index(fields=['user', 'date', 'created_at', 'id'], name='transaction_user_key_idx'),
+            # Agregações por (carteira, tipo, período)
+            models.Index(fields=['wallet', 'transaction_type', 'date'], name='transaction_wallet_type_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} - {self.amount} ({self.wallet})"
+
+    def ledger_entry(self):
+        """Lançamento que esta transação representa nos totais da carteira"""
+        amount = self._meta.get_field('amount').to_python(self.amount)
+        date = self._meta.get_field('date').to_python(self.date)
+        return ledger.LedgerEntry(self.wallet_id, self.transaction_type, date, amount.quantize(ledger.CENTS), 1)
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(Transaction, instance=self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'wallet' in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'user']
+        with sharding.writing(using):
+            # A carteira já vem em cache nos caminhos usuais (formulários, serializers, create())
+            self.user_id = self.wallet.user_id
+            removed = []
+            if self.pk is not None:
+                # Estado anterior, para desfazer o efeito antigo (valor, tipo ou carteira)
+                previous = Transaction.objects.using(using).select_for_update().filter(pk=self.pk).first()
+                if previous is not None:
+                    removed = [previous.ledger_entry()]
+            super().save(*args, **kwargs)
+            ledger.apply(added=[self.ledger_entry()], removed=removed)
+
+    def delete(self, *args, **kwargs):
+        with sharding.writing(kwargs.get('using') or router.db_for_write(Transaction, instance=self)):
+            entry = self.ledger_entry()
+            result = super().delete(*args, **kwargs)
+            ledger.apply(removed=[entry])
+        return result
+
+
+
+class WalletMonthlySummaryQuerySet(models.QuerySet):
+
+    def totals(self):
+        """
+        Soma os resumos do queryset por tipo em uma única consulta:
+        ``{'deposit': Decimal, 'withdrawal': Decimal, 'dividend': Decimal, 'transaction_count': int}``.
+        """
+        return self._totals_result(self.order_by().aggregate(**self._totals_aggregates()))
+
+    async def atotals(self):
+        """Versão assíncrona de ``totals()``"""
+        return self._totals_result(await self.order_by().aaggregate(**self._totals_aggregates()))
+
+    @staticmethod
+    def _totals_aggregates():
+        aggregates = {
+            transaction_type: Coalesce(
+                models.Sum('total_amount', filter=models.Q(transaction_type=transaction_type)),
+                models.Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            )
+            for transaction_type in ledger.TYPE_FIELDS
+        }
+        aggregates['transactions'] = Coalesce(models.Sum('transaction_count'), 0)
+        return aggregates
+
+    @staticmethod
+    def _totals_result(totals):
+        totals['transaction_count'] = totals.pop('transactions')
+        return totals
+
+
+class WalletMonthlySummary(models.Model):
+    """Soma e quantidade de transações por (carteira, ano, mês, tipo), mantidas por finances.ledger"""
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="monthly_summaries")
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    transaction_type = models.CharField(max_length=15, choices=Transaction._meta.get_field('transaction_type').choices)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    objects = WalletMonthlySummaryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['wallet', 'year', 'month', 'transaction_type'],
+                name='unique_wallet_month_type',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.wallet} {self.month:02d}/{self.year} {self.transaction_type}: {self.total_amount}"
+
+
+class WalletBalanceCheckpoint(models.Model):
+    """
+    Totais acumulados da carteira no fim de um mês encerrado (mesmos campos
+    dos totais de ``Wallet``), mantidos por finances.ledger
+    """
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="balance_checkpoints")
+    # Último dia do mês
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_deposits = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_withdrawals = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_dividends = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['wallet', 'date'], name='unique_wallet_checkpoint_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.wallet} em {self.date}: {self.balance}"
+
+
+class ArchivedTransaction(models.Model):
+    """
+    Transação antiga movida para fora de ``Transaction`` por finances.archive
+    (somente leitura). O id é próprio do arquivo; o original não é mantido.
+    """
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name="archived_transactions", db_index=False)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    transaction_type = models.CharField(max_length=15, choices=Transaction._meta.get_field('transaction_type').choices)
+    date = models.DateField()
+    description = models.TextField(blank=True, null=True)
+    # Data de criação da transação original, copiada no arquivamento
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Mesma chave da listagem por cursor das transações
+            models.Index(fields=['wallet', 'date', 'created_at', 'id'], name='archived_wallet_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} - {self.amount} ({self.date}, arquivada)"
+
+
+class WalletOpeningBalance(models.Model):
+    """
+    Totais das transações arquivadas da carteira (mesmos campos dos totais
+    de ``Wallet``): o saldo de abertura das transações que continuam em
+    ``Transaction``. Mantido por finances.archive.
+    """
+    wallet = models.OneToOneField(Wallet, on_delete=models.CASCADE, primary_key=True, related_name="opening_balance")
+    # Transações anteriores a esta data foram arquivadas
+    archived_before = models.DateField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_deposits = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_withdrawals = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_dividends = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.wallet} antes de {self.archived_before}: {self.balance}"
+
+
+class UserShard(models.Model):
+    """Diretório de shards: em qual banco estão os dados financeiros de cada usuário (ver finances.sharding)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="finances_shard")
+    alias = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return f"{self.transaction_type} - {self.amount} ({self.wallet})"
\ No newline at end of file
+        return f"{self.user_id} -> {self.alias}"
@@ -0,0 +1,155 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class TransactionCursorPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) das transações, da mais recente para a mais antiga.
+
+    A posição é a chave ``(date, created_at, id)`` da última (ou primeira) linha
+    da página, então cada página é um ``WHERE chave < cursor ORDER BY chave
+    LIMIT n`` servido pelo índice (wallet, date, created_at, id), ou
+    (user, date, created_at, id) nas listagens de todas as carteiras: o custo
+    não cresce com a profundidade e inserções concorrentes não deslocam as páginas.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-date', '-created_at', '-id')
+    invalid_cursor_message = 'Cursor inválido'
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 20
+        value = self._query_params(request).get(self.page_size_query_param)
+        if value:
+            try:
+                page_size = int(value)
+            except ValueError:
+                pass
+        return max(1, min(page_size, self.max_page_size))
+
+    @staticmethod
+    def _query_params(request):
+        # Aceita tanto o Request do DRF quanto o HttpRequest das views assíncronas
+        return getattr(request, 'query_params', request.GET)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._finish_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """Versão assíncrona de ``paginate_queryset`` (ORM assíncrono)"""
+        return self._finish_page([row async for row in self._page_queryset(queryset, request)])
+
+    def _page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self._key_filter(self.cursor, newer=self._backwards))
+            if self._backwards:
+                queryset = queryset.reverse()
+        return queryset[:self.page_size + 1]
+
+    @property
+    def _backwards(self):
+        return self.cursor is not None and self.cursor['direction'] == 'previous'
+
+    def _finish_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self._backwards:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        self.first_key = self._row_key(rows[0]) if rows else None
+        self.last_key = self._row_key(rows[-1]) if rows else None
+        return rows
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or self.last_key is None:
+            return None
+        return self.encode_cursor('next', self.last_key)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_key is None:
+            # Página vazia após um cursor: volta para o início da listagem
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor('previous', self.first_key)
+
+    def encode_cursor(self, direction, key):
+        payload = json.dumps({
+            'd': direction[0],
+            'k': [key[0].isoformat(), key[1].isoformat(), key[2]],
+        }, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = self._query_params(request).get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            direction = {'n': 'next', 'p': 'previous'}[payload['d']]
+            date, created_at, pk = payload['k']
+            key = (parse_date(date), parse_datetime(created_at), int(pk))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if key[0] is None or key[1] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return {'direction': direction, 'key': key}
+
+    @staticmethod
+    def _row_key(row):
+        if isinstance(row, dict):
+            return row['date'], row['created_at'], row['id']
+        return row.date, row.created_at, row.pk
+
+    @staticmethod
+    def _key_filter(cursor, newer):
+        """Linhas estritamente depois (mais antigas) ou antes (mais novas) da chave do cursor"""
+        date, created_at, pk = cursor['key']
+        op = 'gt' if newer else 'lt'
+        # A condição redundante sobre date delimita o intervalo do índice
+        return Q(**{f'date__{op}e': date}) & (
+            Q(**{f'date__{op}': date})
+            | Q(date=date, **{f'created_at__{op}': created_at})
+            | Q(date=date, created_at=created_at, **{f'id__{op}': pk})
+        )
@@ -0,0 +1,303 @@
+"""
+Perfil sob demanda de uma requisição, para usuários staff.
+
+Com ``?_profile=1`` (ou o cabeçalho ``X-Profile: 1``), a requisição roda sob
+``cProfile``; com ``memory`` no lugar de ``1``, também sob ``tracemalloc``.
+O resultado vai para ``FINANCES_PROFILE_DIR``:
+
+- ``<id>.prof``: estatísticas do cProfile (``snakeviz``, ``python -m pstats``...)
+- ``<id>.json``: resumo com as funções mais caras, as consultas SQL emitidas
+  e, se pedido, as linhas que mais alocaram memória
+
+O id volta no cabeçalho ``X-Profile-Id`` e os perfis recentes ficam listados
+em ``/finances/profiles/`` (somente staff). Pedidos de quem não é staff são
+ignorados. Token de API também vale, além da sessão.
+
+Em ASGI o cProfile mede a thread do loop de eventos inteira: outras
+requisições em andamento ao mesmo tempo aparecem no perfil.
+
+O ``tracemalloc`` é global no processo: só uma requisição por vez rastreia a
+memória. Se ele já estiver em uso (outro perfil ou outra ferramenta), a
+requisição é perfilada só na CPU e o resumo registra ``memory.skipped``.
+
+Configurações opcionais:
+
+- ``FINANCES_PROFILE_DIR``: diretório dos perfis (padrão ``BASE_DIR / 'profiles'``)
+- ``FINANCES_PROFILE_KEEP``: perfis mantidos no diretório; os mais antigos são apagados (padrão 50)
+- ``FINANCES_PROFILE_TOP``: funções listadas no resumo (padrão 25)
+"""
+import cProfile
+import json
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from .authentication import CachedTokenAuthentication
+
+
+QUERY_PARAM = '_profile'
+HEADER = 'X-Profile'
+MAX_QUERIES = 500
+MEMORY_TOP = 15
+
+PROFILE_ID = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+
+_current = ContextVar('finances_profile_queries', default=None)
+# Dono do tracemalloc no processo: um perfil de memória por vez
+_memory_lock = threading.Lock()
+
+
+def get_directory():
+    return Path(getattr(settings, 'FINANCES_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def _record_query(execute, sql, params, many, context):
+    queries = _current.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.append((sql, time.perf_counter() - started))
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_wrapper, dispatch_uid='finances.profiling.install_query_wrapper')
+
+
+def requested_mode(request):
+    """``'cpu'``, ``'memory'`` ou None, conforme o parâmetro ou cabeçalho"""
+    value = request.GET.get(QUERY_PARAM) or request.headers.get(HEADER)
+    if not value or value in ('0', 'false'):
+        return None
+    return 'memory' if value == 'memory' else 'cpu'
+
+
+def is_staff(request):
+    user = request.user
+    if not user.is_authenticated:
+        # Token de API: autenticado aqui porque o DRF só o faz dentro da view
+        try:
+            result = CachedTokenAuthentication().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            return False
+        user = result[0] if result else user
+    return user.is_active and user.is_staff
+
+
+class Profile:
+    """Perfil de uma requisição em andamento"""
+
+    def __init__(self, request, memory):
+        self.id = f'{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}'
+        self.request = request
+        self.memory = memory
+        self.tracing = False
+        self.queries = []
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.token = _current.set(self.queries)
+        # Sem esperar pela trava: a requisição segue perfilada só na CPU
+        if self.memory and _memory_lock.acquire(blocking=False):
+            if tracemalloc.is_tracing():
+                _memory_lock.release()
+            else:
+                tracemalloc.start()
+                self.tracing = True
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+        self.snapshot = None
+        if self.tracing:
+            try:
+                self.peak = tracemalloc.get_traced_memory()[1]
+                self.snapshot = tracemalloc.take_snapshot()
+            finally:
+                tracemalloc.stop()
+                self.tracing = False
+                _memory_lock.release()
+        _current.reset(self.token)
+
+    def save(self, response):
+        directory = get_directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        self.profiler.dump_stats(directory / f'{self.id}.prof')
+        summary = self.summary(response)
+        with open(directory / f'{self.id}.json', 'w', encoding='utf-8') as file:
+            json.dump(summary, file, ensure_ascii=False, indent=2)
+        prune(directory, getattr(settings, 'FINANCES_PROFILE_KEEP', 50))
+        response.headers['X-Profile-Id'] = self.id
+        return response
+
+    def summary(self, response):
+        match = getattr(self.request, 'resolver_match', None)
+        user = self.request.user
+        summary = {
+            'id': self.id,
+            'created_at': timezone.now().isoformat(),
+            'method': self.request.method,
+            'path': self.request.get_full_path(),
+            'route': match.view_name if match else None,
+            'user': user.get_username() if user.is_authenticated else None,
+            'status': response.status_code,
+            'duration_ms': round(self.duration * 1000, 3),
+            'query_count': len(self.queries),
+            'db_ms': round(sum(duration for _, duration in self.queries) * 1000, 3),
+            'top_cumulative': top_functions(self.profiler, 'cumulative'),
+            'top_internal': top_functions(self.profiler, 'tottime'),
+            'queries': [
+                {'sql': sql, 'duration_ms': round(duration * 1000, 3)}
+                for sql, duration in self.queries[:MAX_QUERIES]
+            ],
+        }
+        if self.memory and self.snapshot is None:
+            summary['memory'] = {'skipped': True}
+        elif self.snapshot is not None:
+            summary['memory'] = {
+                'peak_kb': round(self.peak / 1024, 1),
+                'top_allocations': [
+                    {'location': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                    for stat in self.snapshot.statistics('lineno')[:MEMORY_TOP]
+                ],
+            }
+        return summary
+
+
+def top_functions(profiler, sort):
+    """As funções mais caras pelo critério do pstats (``cumulative`` ou ``tottime``)"""
+    stats = pstats.Stats(profiler).stats
+    index = 3 if sort == 'cumulative' else 2
+    rows = sorted(stats.items(), key=lambda item: item[1][index], reverse=True)
+    return [
+        {
+            'function': pstats.func_std_string(function),
+            'calls': calls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        }
+        for function, (_, calls, tottime, cumtime, _) in rows[:getattr(settings, 'FINANCES_PROFILE_TOP', 25)]
+    ]
+
+
+def prune(directory, keep):
+    """Apaga os perfis mais antigos além dos ``keep`` mais recentes"""
+    summaries = sorted(directory.glob('*.json'), reverse=True)
+    for path in summaries[keep:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.prof').unlink(missing_ok=True)
+
+
+def recent_profiles(limit=None):
+    """Resumos dos perfis mais recentes primeiro (o id começa pela data)"""
+    directory = get_directory()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob('*.json'), reverse=True)[:limit]:
+        try:
+            with open(path, encoding='utf-8') as file:
+                profiles.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+class RequestProfilingMiddleware:
+    """Precisa vir depois de ``AuthenticationMiddleware`` (usa ``request.user``)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = requested_mode(request)
+        if mode is None or not is_staff(request):
+            return self.get_response(request)
+        profile = Profile(request, memory=mode == 'memory')
+        profile.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+        return profile.save(response)
+
+    async def __acall__(self, request):
+        mode = requested_mode(request)
+        if mode is None or not await sync_to_async(is_staff)(request):
+            return await self.get_response(request)
+        profile = Profile(request, memory=mode == 'memory')
+        profile.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile.stop()
+        return await sync_to_async(profile.save)(response)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_list(request):
+    """
+    GET /finances/profiles/ - perfis recentes, sem as consultas SQL
+    (o detalhe completo fica em /finances/profiles/<id>/)
+    """
+    profiles = recent_profiles()
+    for profile in profiles:
+        profile.pop('queries', None)
+        profile['top_cumulative'] = profile['top_cumulative'][:10]
+        profile.pop('top_internal', None)
+    return Response(profiles)
+
+
+def _profile_path(profile_id, suffix):
+    if not PROFILE_ID.match(profile_id):
+        raise Http404
+    path = get_directory() / f'{profile_id}{suffix}'
+    if not path.is_file():
+        raise Http404
+    return path
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_detail(request, profile_id):
+    """GET /finances/profiles/<id>/ - resumo completo de um perfil"""
+    with open(_profile_path(profile_id, '.json'), encoding='utf-8') as file:
+        return Response(json.load(file))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_download(request, profile_id):
+    """GET /finances/profiles/<id>/download/ - arquivo .prof do cProfile"""
+    path = _profile_path(profile_id, '.prof')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
@@ -0,0 +1,39 @@
+"""
+Renderer JSON das listagens da API.
+
+Usa o ``orjson`` quando instalado (opcional, ver requirements.txt); caso
+contrário cai no ``json`` da biblioteca padrão com o mesmo formato compacto
+do ``JSONRenderer`` do DRF. Os dados chegam já convertidos para tipos
+nativos (ver ``finances.fast_serializers``), então nenhum dos dois precisa
+do encoder do DRF para ``Decimal``/``date`` no caminho comum.
+"""
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+
+def _default(value):
+    """Tipos que o orjson não serializa sozinho (Decimal, lazy strings, ...)"""
+    return JSONEncoder().default(value)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` sem indentação com orjson ou json compacto"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # Saída indentada (?indent / Accept com indent) fica com o renderer padrão
+            return super().render(data, accepted_media_type, renderer_context)
+        if orjson is not None:
+            return orjson.dumps(data, default=_default)
+        return json.dumps(
+            data, cls=JSONEncoder, ensure_ascii=False, allow_nan=False, separators=(',', ':')
+        ).encode()
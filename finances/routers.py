@@ -0,0 +1,162 @@
+"""
+Roteamento de bancos: dados financeiros por shard de usuário e leituras nas
+réplicas.
+
+``ShardRouter`` (primeiro em ``DATABASE_ROUTERS``) manda os modelos
+particionados para o shard do usuário (ver ``finances.sharding``) e não
+decide nada quando há um único shard.
+
+``PrimaryReplicaRouter`` manda as leituras feitas durante uma requisição para
+uma das réplicas de ``FINANCES_READ_REPLICAS`` e toda escrita para
+``default``. Depois da primeira escrita, o resto da requisição lê do
+principal, para o usuário ver o que acabou de gravar; um cookie mantém a
+fixação por ``FINANCES_REPLICA_PIN_SECONDS`` nas requisições seguintes (o
+redirect depois de um POST), cobrindo o atraso da réplica. A leitura da
+própria escrita só é garantida se esse prazo passar do atraso máximo da
+réplica (com ``sync_replica``, o ``--interval`` mais o tempo de uma cópia).
+
+Fora de requisições (comandos, shell, testes) e dentro de ``atomic()``, as
+leituras vão sempre para o principal. O escopo de cada requisição é aberto
+por ``ReplicaPinningMiddleware`` via ``contextvars``, que também acompanha
+as views assíncronas.
+
+Configurações opcionais:
+
+- ``FINANCES_READ_REPLICAS``: aliases de ``DATABASES`` usados para leitura (padrão: nenhum)
+- ``FINANCES_REPLICA_PIN_SECONDS``: validade do cookie de fixação (padrão 15)
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import sharding
+
+
+PIN_COOKIE = 'finances_primary'
+
+_scope = ContextVar('finances_replica_scope', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'FINANCES_READ_REPLICAS', [])
+
+
+class RequestScope:
+    """Estado de roteamento de uma requisição: ``pinned`` depois de uma escrita"""
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """Abre um escopo em que as leituras podem ir para as réplicas"""
+    scope = RequestScope(pinned)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+class ShardRouter:
+
+    def _shard(self, model, instance=None):
+        if not sharding.is_enabled() or not sharding.is_sharded(model):
+            return None
+        if instance is not None:
+            if sharding.is_sharded(type(instance)):
+                if instance._state.db:
+                    return instance._state.db
+                if hasattr(instance, 'user_id'):
+                    return sharding.shard_for_user(instance.user_id)
+                wallet = instance._state.fields_cache.get('wallet')
+                if wallet is not None and wallet._state.db:
+                    return wallet._state.db
+            elif instance._meta.label_lower == 'auth.user':
+                # Gerenciadores relacionados a partir do usuário (user.wallets)
+                return sharding.shard_for_user(instance.pk)
+        return sharding.current_shard()
+
+    def db_for_read(self, model, instance=None, **hints):
+        return self._shard(model, instance)
+
+    def db_for_write(self, model, instance=None, **hints):
+        return self._shard(model, instance)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Carteiras apontam para usuários de outro banco (Wallet.user sem constraint)
+        if sharding.is_enabled() and {obj1._meta.label_lower, obj2._meta.label_lower} == {'finances.wallet', 'auth.user'}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Todos os shards recebem o esquema completo (tabelas fora dos shards ficam vazias)
+        return None
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        scope = _scope.get()
+        if not replicas or scope is None or scope.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None:
+            scope.pinned = scope.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas são cópias do principal: objetos de qualquer um se relacionam
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # O esquema chega às réplicas pela cópia (sync_replica), não por migrações
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """Abre o escopo de roteamento de cada requisição e mantém o cookie de fixação"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_scope(pinned=PIN_COOKIE in request.COOKIES) as scope:
+            response = self.get_response(request)
+        return self._finish(response, scope)
+
+    async def __acall__(self, request):
+        with request_scope(pinned=PIN_COOKIE in request.COOKIES) as scope:
+            response = await self.get_response(request)
+        return self._finish(response, scope)
+
+    @staticmethod
+    def _finish(response, scope):
+        if scope.wrote and get_replicas():
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'FINANCES_REPLICA_PIN_SECONDS', 15),
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -2,14 +2,43 @@ from rest_framework import serializers
 from .models import Wallet, Transaction
 
 class WalletSerializer(serializers.ModelSerializer):
-    total_balance = serializers.ReadOnlyField()
+    total_balance = serializers.SerializerMethodField()
     
     class Meta:
         model = Wallet
         fields = ['id', 'name', 'user', 'created_at', 'total_balance']
         read_only_fields = ['id', 'user', 'created_at']
 
+    def get_total_balance(self, obj):
+        # Usa a anotação de Wallet.objects.with_balances() quando disponível
+        total_balance = getattr(obj, 'total_balance', None)
+        if total_balance is None:
+            return obj.get_total_balance()
+        return float(total_balance)
+
+class UserWalletField(serializers.PrimaryKeyRelatedField):
+    """
+    Carteira do usuário da requisição. Se o contexto trouxer ``wallets``
+    (dicionário id -> Wallet já carregado), a validação não faz consultas.
+    """
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        if request is None:
+            return Wallet.objects.all()
+        return Wallet.objects.filter(user=request.user)
+
+    def to_internal_value(self, data):
+        wallets = self.context.get('wallets')
+        if wallets is None:
+            return super().to_internal_value(data)
+        try:
+            return wallets[int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail('does_not_exist', pk_value=data)
+
 class TransactionSerializer(serializers.ModelSerializer):
+    wallet = UserWalletField()
     wallet_name = serializers.CharField(source='wallet.name', read_only=True)
     
     class Meta:
@@ -18,3 +47,16 @@ class TransactionSerializer(serializers.ModelSerializer):
                  'wallet', 'wallet_name', 'created_at']
         read_only_fields = ['id', 'created_at']
 
+
+class BatchOperationSerializer(serializers.Serializer):
+    """Uma operação do endpoint de lote: create (data), update (id, data) ou delete (id)"""
+    op = serializers.ChoiceField(choices=['create', 'update', 'delete'])
+    id = serializers.IntegerField(required=False)
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] in ('update', 'delete') and 'id' not in attrs:
+            raise serializers.ValidationError({'id': 'Obrigatório para update e delete.'})
+        if attrs['op'] in ('create', 'update') and 'data' not in attrs:
+            raise serializers.ValidationError({'data': 'Obrigatório para create e update.'})
+        return attrs
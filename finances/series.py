@@ -0,0 +1,131 @@
+"""
+Séries temporais de fluxo de caixa e saldo por dia, semana ou mês.
+
+Os períodos são agrupados no banco com ``Trunc*`` em uma única consulta
+``GROUP BY`` e as lacunas (períodos sem transações) são preenchidas aqui.
+O saldo inicial não exige varrer o histórico anterior ao intervalo: parte do
+saldo armazenado nas carteiras (``Wallet.balance``, mantido por
+``finances.ledger``) e desconta o que foi lançado a partir de ``start``. Para
+isso as transações posteriores a ``end`` entram na mesma consulta, em um
+grupo à parte (período nulo). Com transações arquivadas (``finances.archive``),
+as do arquivo a partir de ``start`` entram por uma segunda consulta igual.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Case, Count, DateField, DecimalField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+
+from . import ledger
+
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# Limite de períodos por série (10 anos de dados diários)
+MAX_BUCKETS = 3700
+
+Bucket = namedtuple('Bucket', ['period', 'totals', 'net', 'transaction_count', 'balance'])
+Series = namedtuple('Series', ['opening_balance', 'closing_balance', 'buckets'])
+
+
+def bucket_start(day, granularity):
+    """Início do período (dia, segunda-feira da semana ou dia 1 do mês) que contém ``day``"""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(period, granularity):
+    if granularity == 'week':
+        return period + timedelta(days=7)
+    if granularity == 'month':
+        return (period.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return period + timedelta(days=1)
+
+
+def periods(start, end, granularity):
+    period = bucket_start(start, granularity)
+    while period <= end:
+        yield period
+        period = next_bucket(period, granularity)
+
+
+def count_buckets(start, end, granularity):
+    if granularity == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    step = 7 if granularity == 'week' else 1
+    return (bucket_start(end, granularity) - bucket_start(start, granularity)).days // step + 1
+
+
+def bucket_rows(transactions, start, end, granularity):
+    """
+    Uma linha por período do intervalo com transações, mais uma com período
+    None somando tudo o que é posterior a ``end``.
+    """
+    amount = DecimalField(max_digits=14, decimal_places=2)
+    sums = {
+        transaction_type: Coalesce(
+            Sum('amount', filter=Q(transaction_type=transaction_type)), Value(Decimal('0')), output_field=amount
+        )
+        for transaction_type in ledger.TYPE_FIELDS
+    }
+    period = Case(
+        When(date__gt=end, then=Value(None, output_field=DateField())),
+        default=GRANULARITIES[granularity]('date', output_field=DateField()),
+        output_field=DateField(),
+    )
+    return (
+        transactions.filter(date__gte=start).order_by()
+        .annotate(period=period)
+        .values('period')
+        .annotate(transaction_count=Count('id'), **sums)
+    )
+
+
+def build_series(transactions, current_balance, start, end, granularity, archived=None):
+    """
+    Série de ``start`` a ``end`` das ``transactions`` (já filtradas pela(s)
+    carteira(s)), cujo saldo atual somado é ``current_balance``. ``archived``
+    são as transações arquivadas das mesmas carteiras, se houver.
+    """
+    rows = {}
+    net_from_start = Decimal('0')
+    for queryset in (transactions, archived):
+        if queryset is None:
+            continue
+        for row in bucket_rows(queryset, start, end, granularity):
+            net = sum(ledger.BALANCE_SIGNS[t] * row[t] for t in ledger.TYPE_FIELDS)
+            net_from_start += net
+            period = row['period']
+            if period is None:
+                continue
+            if period in rows:
+                merged, merged_net = rows[period]
+                row = {
+                    'transaction_count': merged['transaction_count'] + row['transaction_count'],
+                    **{t: merged[t] + row[t] for t in ledger.TYPE_FIELDS},
+                }
+                net += merged_net
+            rows[period] = (row, net)
+
+    opening_balance = Decimal(current_balance) - net_from_start
+    balance = opening_balance
+    buckets = []
+    for period in periods(start, end, granularity):
+        row, net = rows.get(period, (None, Decimal('0')))
+        balance += net
+        buckets.append(Bucket(
+            period=period,
+            totals={t: row[t] if row else Decimal('0') for t in ledger.TYPE_FIELDS},
+            net=net,
+            transaction_count=row['transaction_count'] if row else 0,
+            balance=balance,
+        ))
+    return Series(opening_balance, balance, buckets)
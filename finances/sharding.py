@@ -0,0 +1,278 @@
+"""
+Particionamento dos dados financeiros por usuário entre vários bancos.
+
+``Wallet``, ``Transaction``, ``WalletMonthlySummary``, ``WalletBalanceCheckpoint`` e o arquivo
+(``ArchivedTransaction``, ``WalletOpeningBalance``) de cada usuário ficam
+inteiros em um único shard (alias de ``DATABASES`` listado em
+``FINANCES_SHARDS``); usuários, sessões e tokens continuam em ``default``.
+
+- Posição: um usuário novo vai para o shard escolhido por rendezvous hashing
+  do ``user_id`` (estável entre processos; ao acrescentar um shard, só ~1/N
+  dos usuários passa a ter outro destino).
+- Diretório: ``UserShard`` (em ``default``) registra onde os dados de cada
+  usuário estão de fato, para que ``rebalance_shards`` mova usuários sem
+  perder o acesso aos dados durante a cópia. Usuários sem registro estão em
+  ``default`` (dados anteriores ao particionamento). As consultas ao
+  diretório podem ficar em um cache compartilhado entre os processos (veja
+  ``FINANCES_SHARD_CACHE_ALIAS``); sem ele, o diretório é lido uma vez por
+  requisição.
+- Escopo: ``ShardScopeMiddleware`` associa a requisição ao contexto atual e
+  ``finances.routers.ShardRouter`` manda as consultas desses modelos para o
+  shard do usuário autenticado (sessão ou token), sem mudanças nas views.
+  Fora de requisições, use ``user_scope(user_id)`` ou ``shard_scope(alias)``.
+
+Com um único shard (o padrão), nada muda: tudo fica em ``default``.
+``atomic()`` abre a transação no shard do escopo atual, em vez de sempre em
+``default``.
+
+Configurações opcionais:
+
+- ``FINANCES_SHARDS``: aliases dos shards, começando por ``default`` (padrão ``['default']``)
+- ``FINANCES_SHARD_CACHE_ALIAS``: cache do diretório (padrão ``None``, sem cache). Precisa ser
+  compartilhado por todos os processos (Redis, Memcached, arquivo ou banco): ``rebalance_shards``
+  roda em outro processo e só invalida a posição do usuário movido nesse cache. Um cache local do
+  processo (``LocMemCache``) manteria os servidores mandando o usuário para o shard antigo.
+- ``FINANCES_SHARD_CACHE_TIMEOUT``: validade do cache do diretório em segundos (padrão 3600)
+"""
+import hashlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+KEY_PREFIX = 'finances:shard'
+
+# Modelos cujos dados são particionados por usuário
+SHARDED_MODELS = {
+    'finances.wallet', 'finances.transaction', 'finances.walletmonthlysummary', 'finances.walletbalancecheckpoint',
+    'finances.archivedtransaction', 'finances.walletopeningbalance',
+}
+
+_scope = ContextVar('finances_shard_scope', default=None)
+
+
+def get_shards():
+    return getattr(settings, 'FINANCES_SHARDS', [DEFAULT_DB_ALIAS])
+
+
+def is_enabled():
+    return len(get_shards()) > 1
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def placement(user_id, shards=None):
+    """Shard de destino do usuário pelo rendezvous hashing (maior peso entre os shards)"""
+    shards = shards or get_shards()
+    return max(shards, key=lambda alias: hashlib.blake2b(f'{alias}:{user_id}'.encode(), digest_size=8).digest())
+
+
+def _cache_key(user_id):
+    return f'{KEY_PREFIX}:{user_id}'
+
+
+def get_cache():
+    """Cache compartilhado do diretório, ou ``None`` se não configurado"""
+    alias = getattr(settings, 'FINANCES_SHARD_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def shard_for_user(user_id):
+    """Shard onde estão os dados do usuário (diretório, com cache se configurado)"""
+    if not is_enabled() or user_id is None:
+        return DEFAULT_DB_ALIAS
+    directory_cache = get_cache()
+    key = _cache_key(user_id)
+    alias = directory_cache.get(key) if directory_cache is not None else None
+    if alias is None:
+        from .models import UserShard
+
+        alias = (
+            UserShard.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id)
+            .values_list('alias', flat=True).first()
+        ) or DEFAULT_DB_ALIAS
+        if directory_cache is not None:
+            directory_cache.set(key, alias, getattr(settings, 'FINANCES_SHARD_CACHE_TIMEOUT', 3600))
+    return alias
+
+
+def assign(user_id, alias):
+    """Registra ``alias`` como o shard do usuário (criação ou fim de uma mudança)"""
+    from .models import UserShard
+
+    UserShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(user_id=user_id, defaults={'alias': alias})
+    directory_cache = get_cache()
+    if directory_cache is not None:
+        directory_cache.delete(_cache_key(user_id))
+
+
+def current_shard():
+    """Shard do escopo atual: alias fixo, usuário da requisição ou ``default``"""
+    scope = _scope.get()
+    if scope is None:
+        return DEFAULT_DB_ALIAS
+    if isinstance(scope, str):
+        return scope
+    # Requisição: o usuário só é conhecido depois da autenticação (o DRF a faz na view)
+    alias = getattr(scope, '_finances_shard', None)
+    if alias is None:
+        user = getattr(scope, 'user', None)
+        if user is None or not user.is_authenticated:
+            return DEFAULT_DB_ALIAS
+        alias = scope._finances_shard = shard_for_user(user.pk)
+    return alias
+
+
+@contextmanager
+def shard_scope(alias):
+    """Consultas aos modelos particionados vão para ``alias`` dentro do bloco"""
+    token = _scope.set(alias)
+    try:
+        yield alias
+    finally:
+        _scope.reset(token)
+
+
+def user_scope(user_id):
+    """Consultas aos modelos particionados vão para o shard do usuário dentro do bloco"""
+    return shard_scope(shard_for_user(user_id))
+
+
+def wallet_shards(wallet_id):
+    """Shards com uma carteira de id ``wallet_id`` (os ids se repetem entre shards)"""
+    from .models import Wallet
+
+    return [alias for alias in get_shards() if Wallet.objects.using(alias).filter(pk=wallet_id).exists()]
+
+
+def atomic(**kwargs):
+    """``transaction.atomic`` no shard do escopo atual"""
+    return transaction.atomic(using=current_shard(), **kwargs)
+
+
+@contextmanager
+def writing(using):
+    """
+    Escopo e transação no banco ``using``: o ``ledger.apply`` feito dentro do
+    bloco grava no mesmo shard (e na mesma transação) que as transações.
+    """
+    with shard_scope(using), transaction.atomic(using=using):
+        yield
+
+
+def assign_new_users(user_ids):
+    """Registra o shard de usuários criados sem sinais (``bulk_create``)"""
+    from .models import UserShard
+
+    if is_enabled():
+        UserShard.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            [UserShard(user_id=user_id, alias=placement(user_id)) for user_id in user_ids]
+        )
+
+
+class ConcurrentWriteError(Exception):
+    """O usuário gravou durante a cópia; a mudança foi desfeita e pode ser repetida"""
+
+
+def _insert_raw(model, rows, target, returning=False):
+    """
+    Insere ``rows`` em ``target`` sem os ids de origem. Inserção "raw" (como
+    a do loaddata): preserva ``created_at``/``updated_at`` em vez de aplicar
+    ``auto_now_add``.
+    """
+    # Chaves primárias automáticas são geradas no destino; a de WalletOpeningBalance é a carteira
+    fields = [field for field in model._meta.concrete_fields if not (field.primary_key and field.auto_created)]
+    return model._base_manager._insert(
+        rows, fields=fields, returning_fields=[model._meta.pk] if returning else None, raw=True, using=target,
+    )
+
+
+def move_user(user_id, source, target, batch_size=1000):
+    """
+    Copia carteiras, transações, resumos mensais, checkpoints e arquivo do usuário de ``source``
+    para ``target`` (transações em lotes de ``batch_size``), troca o shard no
+    diretório e apaga os dados da origem. Os ids das carteiras e transações
+    mudam: cada shard tem as próprias sequências.
+
+    Escritas do usuário durante a cópia são detectadas pela ``version`` das
+    carteiras: a cópia é desfeita e ``ConcurrentWriteError`` é levantada.
+    A verificação final, a troca no diretório e a exclusão na origem rodam em
+    uma transação da origem (com ``transaction_mode`` IMMEDIATE, o perfil de
+    produção, nenhuma escrita entra nesse intervalo).
+    """
+    from . import dashboard_cache
+    from .models import (
+        ArchivedTransaction, Transaction, Wallet, WalletBalanceCheckpoint, WalletMonthlySummary, WalletOpeningBalance,
+    )
+
+    wallets = list(Wallet.objects.using(source).filter(user_id=user_id).order_by('pk'))
+    versions = {wallet.pk: wallet.version for wallet in wallets}
+    copied = {'wallets': len(wallets), 'transactions': 0, 'monthly_summaries': 0, 'balance_checkpoints': 0,
+              'archived_transactions': 0, 'opening_balances': 0}
+    models = (
+        (Transaction, 'transactions'), (WalletMonthlySummary, 'monthly_summaries'),
+        (WalletBalanceCheckpoint, 'balance_checkpoints'),
+        (ArchivedTransaction, 'archived_transactions'), (WalletOpeningBalance, 'opening_balances'),
+    )
+
+    with transaction.atomic(using=target):
+        id_map = {wallet.pk: _insert_raw(Wallet, [wallet], target, returning=True)[0][0] for wallet in wallets}
+
+        for model, key in models:
+            last_pk = 0
+            while True:
+                rows = list(
+                    model._base_manager.using(source)
+                    .filter(wallet_id__in=list(id_map), pk__gt=last_pk).order_by('pk')[:batch_size]
+                )
+                if not rows:
+                    break
+                last_pk = rows[-1].pk
+                for row in rows:
+                    row.wallet_id = id_map[row.wallet_id]
+                _insert_raw(model, rows, target)
+                copied[key] += len(rows)
+
+    with transaction.atomic(using=source):
+        current = dict(Wallet.objects.using(source).filter(user_id=user_id).values_list('pk', 'version'))
+        if current != versions:
+            Wallet.objects.using(target).filter(pk__in=list(id_map.values())).delete()
+            raise ConcurrentWriteError(f'Usuário {user_id} gravou durante a cópia')
+        assign(user_id, target)
+        Wallet.objects.using(source).filter(user_id=user_id).delete()
+
+    dashboard_cache.invalidate_user(user_id)
+    return copied
+
+
+class ShardScopeMiddleware:
+    """Associa a requisição ao contexto, para o roteador achar o usuário autenticado"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _scope.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _scope.reset(token)
+
+    async def __acall__(self, request):
+        token = _scope.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _scope.reset(token)
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import authentication, dashboard_cache, sharding
+from .models import Wallet
+
+
+# Escritas em Transaction invalidam o cache via finances.ledger.apply, que é
+# chamado por save(), delete() e exclusões em lote. Não conectamos sinais de
+# exclusão em Transaction para não desativar o "fast delete" em cascata.
+
+@receiver(post_save, sender=Wallet)
+@receiver(post_delete, sender=Wallet)
+def invalidate_dashboard_on_wallet_change(sender, instance, **kwargs):
+    dashboard_cache.invalidate_user(instance.user_id)
+
+
+# Tokens revogados (regenerate_token, delete_token, admin) e usuários
+# alterados ou desativados não podem continuar autenticando pelo cache
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    authentication.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    authentication.invalidate_user(instance.pk)
+
+
+# Com vários shards, o usuário novo ganha o shard do hash e, ao ser excluído,
+# leva as carteiras do shard dele (a cascata do ORM só enxerga o banco do usuário)
+@receiver(post_save, sender=User)
+def assign_user_shard(sender, instance, created, **kwargs):
+    if created and sharding.is_enabled():
+        sharding.assign(instance.pk, sharding.placement(instance.pk))
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_wallets(sender, instance, **kwargs):
+    alias = sharding.shard_for_user(instance.pk)
+    if alias != kwargs.get('using'):
+        with sharding.shard_scope(alias):
+            Wallet.objects.filter(user_id=instance.pk).delete()
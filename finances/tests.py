@@ -1,3 +1,1619 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import os
+import sqlite3
+import tempfile
+import tracemalloc
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection, transaction as db_transaction
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from unittest import mock, skipUnless
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+
+from . import analytics, archive, dashboard_cache, ledger, metrics, profiling, routers, sharding
+from .api_views import TransactionViewSet
+from .fast_serializers import TransactionReadSerializer
+from .importers import import_transactions
+from .management.commands.sync_replica import copy_database
+from .models import (
+    ArchivedTransaction, Wallet, Transaction, WalletBalanceCheckpoint, WalletMonthlySummary, WalletOpeningBalance,
+)
+from .serializers import TransactionSerializer, WalletSerializer
+
+
+class WalletLedgerTests(TestCase):
+    """Totais armazenados na carteira acompanham toda escrita em Transaction"""
+    # Os comandos percorrem todos os shards (com FINANCES_DB_SHARDS)
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = User.objects.create_user('ana', 'ana@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.other = Wallet.objects.create(user=self.user, name='Reserva')
+
+    def add(self, wallet, transaction_type, amount, day=date(2025, 1, 10)):
+        return Transaction.objects.create(
+            wallet=wallet, transaction_type=transaction_type, amount=amount, date=day
+        )
+
+    def assertTotals(self, wallet, balance, deposits=0, withdrawals=0, dividends=0, count=0):
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal(str(balance)))
+        self.assertEqual(wallet.total_deposits, Decimal(str(deposits)))
+        self.assertEqual(wallet.total_withdrawals, Decimal(str(withdrawals)))
+        self.assertEqual(wallet.total_dividends, Decimal(str(dividends)))
+        self.assertEqual(wallet.transaction_count, count)
+
+    def test_transaction_user_follows_wallet_owner(self):
+        owner = User.objects.create_user('bia', 'bia@example.com', 'senha-segura-123')
+        created = self.add(self.wallet, 'deposit', '10')
+        with sharding.user_scope(self.user.pk):
+            bulk, = Transaction.objects.bulk_create([
+                Transaction(wallet_id=self.other.pk, transaction_type='deposit', amount=Decimal('5'), date=date(2025, 1, 1))
+            ])
+        self.assertEqual(bulk.user_id, self.user.pk)
+
+        # Carteira passada para outro usuário (ex.: pelo admin)
+        wallet = Wallet.objects.get(pk=self.wallet.pk)
+        wallet.user = owner
+        wallet.save()
+        with sharding.user_scope(self.user.pk):
+            owners = dict(Transaction.objects.values_list('pk', 'user_id'))
+        self.assertEqual(owners, {created.pk: owner.pk, bulk.pk: self.user.pk})
+
+    def test_create_updates_totals(self):
+        self.add(self.wallet, 'deposit', Decimal('100.00'))
+        self.add(self.wallet, 'withdrawal', 30.5)
+        self.add(self.wallet, 'dividend', '2.25')
+        self.assertTotals(self.wallet, '71.75', '100', '30.5', '2.25', 3)
+        self.assertEqual(self.wallet.get_total_balance(), 71.75)
+
+    def test_edit_amount_type_and_wallet(self):
+        transaction = self.add(self.wallet, 'deposit', Decimal('50'))
+
+        transaction.amount = Decimal('80')
+        transaction.transaction_type = 'withdrawal'
+        transaction.save()
+        self.assertTotals(self.wallet, '-80', withdrawals='80', count=1)
+
+        transaction.wallet = self.other
+        transaction.save()
+        self.assertTotals(self.wallet, 0)
+        self.assertTotals(self.other, '-80', withdrawals='80', count=1)
+
+    def test_delete_and_queryset_delete(self):
+        first = self.add(self.wallet, 'deposit', Decimal('10'))
+        self.add(self.wallet, 'deposit', Decimal('20'))
+        self.add(self.other, 'dividend', Decimal('5'))
+
+        first.delete()
+        self.assertTotals(self.wallet, '20', deposits='20', count=1)
+
+        Transaction.objects.filter(wallet__user=self.user).delete()
+        self.assertTotals(self.wallet, 0)
+        self.assertTotals(self.other, 0)
+
+    def test_wallet_save_keeps_stored_totals(self):
+        stale = Wallet.objects.get(pk=self.wallet.pk)
+        self.add(self.wallet, 'deposit', Decimal('15'))
+        stale.name = 'Renomeada'
+        stale.save()
+        self.assertTotals(self.wallet, '15', deposits='15', count=1)
+
+    def test_rebuild_command_verifies_and_repairs(self):
+        self.add(self.wallet, 'deposit', Decimal('40'))
+        Wallet.objects.filter(pk=self.wallet.pk).update(balance=999)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_wallet_totals', verify=True, stdout=StringIO())
+        self.assertTotals(self.wallet, '999', deposits='40', count=1)
+
+        call_command('rebuild_wallet_totals', chunk_size=1, stdout=StringIO())
+        self.assertTotals(self.wallet, '40', deposits='40', count=1)
+        call_command('rebuild_wallet_totals', verify=True, stdout=StringIO())
+
+
+class WalletBalanceQueryTests(TestCase):
+    """Listagens de carteiras fazem o mesmo número de consultas para qualquer quantidade de carteiras"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bia', 'bia@example.com', 'senha-segura-123')
+        self.client.force_login(self.user)
+
+    def create_wallets(self, count):
+        for index in range(count):
+            wallet = Wallet.objects.create(user=self.user, name=f'Carteira {Wallet.objects.count()}')
+            Transaction.objects.create(wallet=wallet, transaction_type='deposit', amount=Decimal('100'), date=date(2025, 1, 1))
+            Transaction.objects.create(wallet=wallet, transaction_type='withdrawal', amount=Decimal('25'), date=date(2025, 1, 2))
+            Transaction.objects.create(wallet=wallet, transaction_type='dividend', amount=Decimal('5'), date=date(2025, 1, 3))
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def assertConstantQueries(self, url):
+        self.create_wallets(1)
+        few, _ = self.count_queries(url)
+        self.create_wallets(4)
+        many, response = self.count_queries(url)
+        self.assertEqual(few, many)
+        return response
+
+    def test_dashboard(self):
+        response = self.assertConstantQueries(reverse('dashboard'))
+        self.assertEqual(response.context['total'], Decimal('400'))
+
+    def test_api_wallet_list(self):
+        response = self.assertConstantQueries('/finances/api/wallets/')
+        self.assertEqual([w['total_balance'] for w in response.json()['results']], [80.0] * 5)
+
+    def test_api_wallet_summary(self):
+        response = self.assertConstantQueries('/finances/api/wallets/summary/')
+        data = response.json()
+        self.assertEqual(data['total_wallets'], 5)
+        self.assertEqual(data['total_balance'], 400.0)
+
+    def test_wallet_lookup_does_not_aggregate_transactions(self):
+        self.create_wallets(1)
+        wallet = Wallet.objects.get()
+        for url in (f'/finances/api/wallets/{wallet.pk}/', f'/finances/api/wallets/{wallet.pk}/transactions/'):
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertFalse([q for q in context.captured_queries if 'GROUP BY' in q['sql']], url)
+        self.assertEqual(self.client.get(f'/finances/api/wallets/{wallet.pk}/').json()['total_balance'], 80.0)
+
+    def test_with_balances_matches_live_totals(self):
+        self.create_wallets(2)
+        wallets = list(Wallet.objects.with_balances())
+        live = ledger.live_totals([wallet.pk for wallet in wallets])
+        for wallet in wallets:
+            self.assertEqual(wallet.total_balance, live[wallet.pk]['balance'])
+            self.assertEqual(wallet.deposits, live[wallet.pk]['total_deposits'])
+        # Os totais vêm das colunas armazenadas, sem agregar as transações
+        with CaptureQueriesContext(connection) as context:
+            list(Wallet.objects.with_balances())
+        self.assertNotIn('finances_transaction', context.captured_queries[0]['sql'])
+
+
+class DashboardCacheTests(TestCase):
+    """Indicadores do dashboard servidos do cache até a próxima escrita do usuário"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('caio', 'caio@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.client.force_login(self.user)
+
+    def finance_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        queries = [q['sql'] for q in context.captured_queries if 'finances_' in q['sql']]
+        return queries, response
+
+    def test_second_load_hits_cache_without_finance_queries(self):
+        first, _ = self.finance_queries()
+        second, response = self.finance_queries()
+        self.assertTrue(first)
+        self.assertEqual(second, [])
+        self.assertEqual(dashboard_cache.stats(), {'hits': 1, 'misses': 1})
+        self.assertEqual(response.context['wallets'][0]['name'], 'Principal')
+
+    def test_view_write_invalidates(self):
+        self.finance_queries()
+        self.client.post(reverse('add_transaction', args=[self.wallet.id]),
+                         {'transaction_type': 'income', 'amount': '10'})
+        queries, response = self.finance_queries()
+        self.assertTrue(queries)
+        self.assertEqual(response.context['total'], 10.0)
+
+    def test_api_write_invalidates(self):
+        self.finance_queries()
+        self.client.post('/finances/api/transactions/', {
+            'wallet': self.wallet.id, 'transaction_type': 'dividend',
+            'amount': '3.50', 'date': '2025-01-05',
+        })
+        _, response = self.finance_queries()
+        self.assertEqual(response.context['rendimento_total'], 3.5)
+
+    def test_wallet_rename_and_admin_delete_invalidate(self):
+        Transaction.objects.create(wallet=self.wallet, transaction_type='deposit',
+                                   amount=Decimal('5'), date=date(2025, 1, 1))
+        self.finance_queries()
+        self.wallet.name = 'Renomeada'
+        self.wallet.save()
+        _, response = self.finance_queries()
+        self.assertEqual(response.context['wallets'][0]['name'], 'Renomeada')
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'senha-segura-123')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:finances_transaction_changelist'), {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': list(Transaction.objects.values_list('pk', flat=True)),
+        })
+        self.client.force_login(self.user)
+        _, response = self.finance_queries()
+        self.assertEqual(response.context['total'], 0.0)
+
+
+class MonthlySummaryTests(TestCase):
+    """Resumos mensais pré-agregados acompanham as escritas e alimentam os endpoints"""
+    # Os comandos percorrem todos os shards (com FINANCES_DB_SHARDS)
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('duda', 'duda@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.client.force_login(self.user)
+
+    def add(self, transaction_type, amount, day):
+        return Transaction.objects.create(wallet=self.wallet, transaction_type=transaction_type,
+                                          amount=Decimal(amount), date=day)
+
+    def summaries(self):
+        return set(WalletMonthlySummary.objects.values_list(
+            'year', 'month', 'transaction_type', 'total_amount', 'transaction_count'
+        ))
+
+    def test_incremental_maintenance(self):
+        transaction = self.add('deposit', '100', date(2025, 3, 5))
+        self.add('deposit', '50', date(2025, 3, 20))
+        self.assertEqual(self.summaries(), {(2025, 3, 'deposit', Decimal('150'), 2)})
+
+        transaction.date = date(2025, 4, 1)
+        transaction.transaction_type = 'dividend'
+        transaction.save()
+        self.assertEqual(self.summaries(), {
+            (2025, 3, 'deposit', Decimal('50'), 1),
+            (2025, 4, 'dividend', Decimal('100'), 1),
+        })
+
+        transaction.delete()
+        self.assertEqual(self.summaries(), {(2025, 3, 'deposit', Decimal('50'), 1)})
+
+    def test_rebuild_command(self):
+        self.add('deposit', '10', date(2025, 1, 1))
+        self.add('withdrawal', '4', date(2025, 2, 1))
+        expected = self.summaries()
+        WalletMonthlySummary.objects.all().delete()
+
+        call_command('rebuild_monthly_summaries', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.summaries(), expected)
+
+    def test_monthly_and_yearly_endpoints(self):
+        self.add('deposit', '100', date(2025, 3, 5))
+        self.add('withdrawal', '30', date(2025, 3, 6))
+        self.add('dividend', '5', date(2025, 7, 1))
+
+        data = self.client.get('/finances/api/transactions/monthly_summary/?year=2025&month=3').json()
+        self.assertEqual((data['deposits'], data['withdrawals'], data['net_income']), (100, 30, 70))
+        self.assertEqual(data['total_transactions'], 2)
+
+        data = self.client.get('/finances/api/transactions/yearly_summary/?year=2025').json()
+        self.assertEqual(data['net_income'], 75)
+        self.assertEqual([m['month'] for m in data['months']], [3, 7])
+
+        response = self.client.get('/finances/api/transactions/monthly_summary/?month=13')
+        self.assertEqual(response.status_code, 400)
+
+    def test_dashboard_dividend_figures(self):
+        today = now().date()
+        last_month = today.replace(day=1) - timedelta(days=1)
+        self.add('dividend', '7', today)
+        self.add('dividend', '3', last_month)
+        self.add('dividend', '1', date(today.year - 1, 6, 1))
+
+        context = self.client.get(reverse('dashboard')).context
+        self.assertEqual(context['rendimento_total'], 11.0)
+        self.assertEqual(context['rendimento_mes_atual'], 7.0)
+        self.assertEqual(context['rendimento_mes_anterior'], 3.0)
+        self.assertEqual(context['rendimento_ano'], 7.0 + (3.0 if last_month.year == today.year else 0))
+
+
+class ExplainQueriesCommandTests(TestCase):
+
+    def test_reports_index_usage_for_wallet_listing(self):
+        cache.clear()
+        user = User.objects.create_user('edu', 'edu@example.com', 'senha-segura-123')
+        wallet = Wallet.objects.create(user=user, name='Principal')
+        Transaction.objects.create(wallet=wallet, transaction_type='deposit', amount=Decimal('1'), date=date(2025, 1, 1))
+
+        out = StringIO()
+        call_command('explain_queries', user='edu', stdout=out)
+        output = out.getvalue()
+        self.assertIn('wallet_detail', output)
+        self.assertIn('USING INDEX transaction_wallet_key_idx', output)
+
+    def test_user_wide_listings_use_user_index_without_sort(self):
+        cache.clear()
+        user = User.objects.create_user('edu', 'edu@example.com', 'senha-segura-123')
+        for name in ('Principal', 'Reserva'):
+            wallet = Wallet.objects.create(user=user, name=name)
+            Transaction.objects.create(wallet=wallet, transaction_type='deposit', amount=Decimal('1'), date=date(2025, 1, 1))
+
+        out = StringIO()
+        call_command('explain_queries', user='edu', stdout=out)
+        sections, heading = {}, None
+        for line in out.getvalue().splitlines():
+            if not line.startswith(' '):
+                heading = line.split(' (')[0]
+            sections[heading] = sections.get(heading, '') + line + '\n'
+        for name in ('all_transactions', 'api transactions', 'api transactions by_type'):
+            section = sections[name]
+            self.assertIn('transaction_user_key_idx', section, name)
+            self.assertNotIn('TEMP B-TREE FOR ORDER BY', section, name)
+
+
+class CursorPaginationTests(TestCase):
+    """Paginação por cursor percorre todas as transações sem repetir nem pular linhas"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('fabi', 'fabi@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.client.force_login(self.user)
+        for index in range(25):
+            Transaction.objects.create(wallet=self.wallet, transaction_type='deposit',
+                                       amount=Decimal(index + 1), date=date(2025, 1, 1 + index % 5))
+        # Empates em (date, created_at) são desempatados pelo id
+        Transaction.objects.filter(date=date(2025, 1, 3)).update(created_at=now())
+
+    def walk(self, url):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(row['id'] for row in data['results'])
+            url = data['next']
+        return ids
+
+    def expected_ids(self, **filters):
+        return list(Transaction.objects.filter(**filters)
+                    .order_by('-date', '-created_at', '-id').values_list('id', flat=True))
+
+    def test_walks_all_endpoints_in_order(self):
+        self.assertEqual(self.walk('/finances/api/transactions/?page_size=7'), self.expected_ids())
+        self.assertEqual(self.walk(f'/finances/api/wallets/{self.wallet.id}/transactions/?page_size=4'),
+                         self.expected_ids())
+        Transaction.objects.filter(amount__lte=10).update(transaction_type='dividend')
+        self.assertEqual(self.walk('/finances/api/transactions/by_type/?type=dividend&page_size=3'),
+                         self.expected_ids(transaction_type='dividend'))
+
+    def test_previous_cursor_and_concurrent_insert(self):
+        first = self.client.get('/finances/api/transactions/?page_size=10').json()
+        second = self.client.get(first['next']).json()
+
+        # Uma transação nova (mais recente) não desloca as páginas seguintes
+        Transaction.objects.create(wallet=self.wallet, transaction_type='deposit',
+                                   amount=Decimal('1'), date=date(2025, 2, 1))
+        third = self.client.get(second['next']).json()
+        self.assertEqual([r['id'] for r in third['results']], self.expected_ids()[21:26])
+        self.assertIsNone(third['next'])
+
+        back = self.client.get(second['previous']).json()
+        self.assertEqual([r['id'] for r in back['results']], [r['id'] for r in first['results']])
+        self.assertIsNotNone(back['previous'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/finances/api/transactions/?cursor=invalido')
+        self.assertEqual(response.status_code, 404)
+
+
+class TransactionPagesTests(TestCase):
+    """Páginas de transações carregam só uma página e calculam totais no banco"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('gabi', 'gabi@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.other = Wallet.objects.create(user=self.user, name='Reserva')
+        self.client.force_login(self.user)
+        for index in range(60):
+            Transaction.objects.create(wallet=self.wallet, transaction_type='deposit',
+                                       amount=Decimal('10'), date=date(2025, 1, 1) + timedelta(days=index))
+        Transaction.objects.create(wallet=self.other, transaction_type='withdrawal',
+                                   amount=Decimal('15'), date=date(2025, 1, 5))
+        Transaction.objects.create(wallet=self.other, transaction_type='dividend',
+                                   amount=Decimal('2.5'), date=date(2025, 3, 1))
+
+    def test_all_transactions_is_paginated_with_db_totals(self):
+        response = self.client.get(reverse('all_transactions'))
+        self.assertEqual(len(response.context['page_obj']), 50)
+        self.assertEqual(response.context['transaction_count'], 62)
+        self.assertEqual(response.context['wallet'].get_total_balance(), '587.50')
+
+        response = self.client.get(reverse('all_transactions') + '?page=2')
+        self.assertEqual(len(response.context['page_obj']), 12)
+
+    def test_filters_by_date_range_and_type(self):
+        url = reverse('all_transactions') + '?start=2025-01-01&end=2025-01-10&type=deposit'
+        response = self.client.get(url)
+        self.assertEqual(response.context['transaction_count'], 10)
+        self.assertEqual(response.context['totals']['net'], Decimal('100'))
+
+        response = self.client.get(reverse('wallet_detail', args=[self.other.id]) + '?type=dividend&start=invalida')
+        self.assertEqual(response.context['transaction_count'], 1)
+        self.assertEqual(response.context['totals']['dividends'], Decimal('2.5'))
+
+    def test_wallet_detail_query_count_does_not_grow(self):
+        url = reverse('wallet_detail', args=[self.wallet.id])
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+        for index in range(40):
+            Transaction.objects.create(wallet=self.wallet, transaction_type='deposit',
+                                       amount=Decimal('1'), date=date(2024, 1, 1))
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url)
+        self.assertEqual(len(first.captured_queries), len(second.captured_queries))
+        self.assertEqual(len(response.context['page_obj']), 50)
+
+
+class ExportTests(TestCase):
+    """Exportação em fluxo (CSV/NDJSON) pela API e pelo comando"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('hugo', 'hugo@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.other = Wallet.objects.create(user=self.user, name='Reserva')
+        self.client.force_login(self.user)
+        Transaction.objects.create(wallet=self.wallet, transaction_type='deposit', amount=Decimal('10.50'),
+                                   date=date(2025, 1, 2), description='Salário, janeiro')
+        Transaction.objects.create(wallet=self.other, transaction_type='dividend', amount=Decimal('1'),
+                                   date=date(2025, 1, 1))
+
+    def test_api_csv_stream(self):
+        response = self.client.get('/finances/api/transactions/export/')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,date,transaction_type,amount,description,wallet,wallet_name,created_at')
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"Salário, janeiro"', lines[1])
+
+    def test_api_ndjson_for_one_wallet(self):
+        response = self.client.get(f'/finances/api/transactions/export/?file_format=ndjson&wallet={self.wallet.id}')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['amount'], '10.50')
+        self.assertEqual(records[0]['wallet_name'], 'Principal')
+
+        response = self.client.get('/finances/api/transactions/export/?file_format=xml')
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_transactions', user='hugo', export_format='ndjson', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+    def test_archived_rows_stream_first_without_sorting(self):
+        archive.archive_wallet(self.other, date(2025, 1, 2))
+        Transaction.objects.create(wallet=self.wallet, transaction_type='withdrawal', amount=Decimal('2'),
+                                   date=date(2025, 1, 1))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/finances/api/transactions/export/?file_format=ndjson&archived=1')
+            records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        # Arquivadas primeiro; em cada leitura, por carteira e em ordem cronológica
+        self.assertEqual([(r['wallet_name'], r['transaction_type']) for r in records],
+                         [('Reserva', 'dividend'), ('Principal', 'withdrawal'), ('Principal', 'deposit')])
+
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if 'ORDER BY' in query['sql']:
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', [row[-1] for row in cursor.fetchall()])
+
+
+OFX_SAMPLE = b"""OFXHEADER:100
+DATA:OFXSGML
+VERSION:102
+CHARSET:1252
+
+<OFX>
+<BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20250110120000[-3:BRT]
+<TRNAMT>-45.90
+<FITID>1
+<MEMO>Mercado
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>DIV
+<DTPOSTED>20250115
+<TRNAMT>12.34
+<FITID>2
+<NAME>Dividendos ABC
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>sem-data
+<TRNAMT>10
+</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1>
+</OFX>
+"""
+
+
+class ImportTests(TestCase):
+    """Importação em massa de extratos CSV e OFX"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('iris', 'iris@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+
+    def test_csv_in_batches_with_row_errors(self):
+        lines = ['date,amount,type,description']
+        lines += [f'2025-01-{1 + index % 28:02d},10.00,receita,linha {index}' for index in range(2500)]
+        lines += ['05/02/2025,"1.234,56",,sem tipo', '2025-02-06,-3,,saque', 'xx,1,deposit,', '2025-02-07,0,deposit,']
+        progress = []
+
+        report = import_transactions(self.wallet, ('\n'.join(lines) + '\n').encode().splitlines(True), 'csv',
+                                     batch_size=1000, progress=lambda r: progress.append(r.created))
+
+        self.assertEqual(report.created, 2502)
+        self.assertEqual([line for line, _ in report.errors], [2504, 2505])
+        self.assertEqual(progress, [1000, 2000, 2502])
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.transaction_count, 2502)
+        self.assertEqual(self.wallet.balance, Decimal('25000') + Decimal('1234.56') - Decimal('3'))
+        self.assertEqual(WalletMonthlySummary.objects.get(month=2, transaction_type='withdrawal').total_amount,
+                         Decimal('3'))
+
+    def test_ofx(self):
+        report = import_transactions(self.wallet, OFX_SAMPLE.splitlines(True), 'ofx')
+        self.assertEqual(report.created, 2)
+        self.assertEqual(len(report.errors), 1)
+        self.assertEqual(
+            set(Transaction.objects.values_list('transaction_type', 'amount', 'date', 'description')),
+            {('withdrawal', Decimal('45.90'), date(2025, 1, 10), 'Mercado'),
+             ('dividend', Decimal('12.34'), date(2025, 1, 15), 'Dividendos ABC')},
+        )
+
+    def test_api_upload(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('extrato.ofx', OFX_SAMPLE)
+        response = self.client.post(f'/finances/api/wallets/{self.wallet.id}/import_transactions/', {'file': upload})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(response.json()['error_count'], 1)
+
+        upload = SimpleUploadedFile('extrato.txt', b'qualquer coisa')
+        response = self.client.post(f'/finances/api/wallets/{self.wallet.id}/import_transactions/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchOperationsTests(TestCase):
+    """Endpoint de lote: todas as operações são aplicadas juntas ou nenhuma"""
+    # Os comandos percorrem todos os shards (com FINANCES_DB_SHARDS)
+    databases = '__all__'
+
+    url = '/finances/api/transactions/batch/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('joao', 'joao@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.kept = Transaction.objects.create(wallet=self.wallet, transaction_type='deposit',
+                                               amount=Decimal('100'), date=date(2025, 1, 5))
+        self.removed = Transaction.objects.create(wallet=self.wallet, transaction_type='withdrawal',
+                                                  amount=Decimal('30'), date=date(2025, 1, 6))
+        self.client.force_login(self.user)
+
+    def post(self, operations):
+        return self.client.post(self.url, {'operations': operations}, content_type='application/json')
+
+    def test_mixed_operations(self):
+        creates = [
+            {'op': 'create', 'data': {'wallet': self.wallet.id, 'transaction_type': 'dividend',
+                                      'amount': '5.50', 'date': f'2025-02-{day:02d}'}}
+            for day in range(1, 21)
+        ]
+        operations = creates + [
+            {'op': 'update', 'id': self.kept.id, 'data': {'amount': '150.00', 'date': '2025-03-01'}},
+            {'op': 'delete', 'id': self.removed.id},
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.post(operations)
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(context.captured_queries), 30)
+
+        results = response.json()['results']
+        self.assertEqual([result['status'] for result in results], ['created'] * 20 + ['updated', 'deleted'])
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.transaction_count, 21)
+        self.assertEqual(self.wallet.balance, Decimal('260'))
+        self.assertEqual(self.wallet.total_withdrawals, Decimal('0'))
+        self.assertEqual(WalletMonthlySummary.objects.get(month=3).total_amount, Decimal('150'))
+        self.assertFalse(WalletMonthlySummary.objects.filter(month=1).exists())
+
+    def test_invalid_item_writes_nothing(self):
+        stranger = User.objects.create_user('lia', 'lia@example.com', 'senha-segura-123')
+        foreign = Wallet.objects.create(user=stranger, name='Alheia')
+        response = self.post([
+            {'op': 'delete', 'id': self.removed.id},
+            {'op': 'create', 'data': {'wallet': foreign.id, 'transaction_type': 'deposit',
+                                      'amount': '10', 'date': '2025-01-01'}},
+            {'op': 'update', 'id': self.kept.id, 'data': {'date': 'ontem'}},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['valid', 'error', 'error'])
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('70'))
+
+        response = self.post([{'op': 'delete'}])
+        self.assertEqual(response.status_code, 400)
+
+    def after_validation(self, change):
+        """Roda ``change`` entre a validação e a aplicação do lote (escrita concorrente)"""
+        validate = TransactionViewSet._validate_batch
+
+        def validate_then_change(viewset, *args):
+            result = validate(viewset, *args)
+            change()
+            return result
+        return mock.patch.object(TransactionViewSet, '_validate_batch', validate_then_change)
+
+    def test_targets_reread_under_lock(self):
+        def change():
+            self.kept.amount, self.kept.description = Decimal('400'), 'editada'
+            self.kept.save()
+            self.removed.transaction_type = 'deposit'
+            self.removed.save()
+
+        with self.after_validation(change):
+            response = self.post([
+                {'op': 'update', 'id': self.kept.id, 'data': {'date': '2025-02-01'}},
+                {'op': 'delete', 'id': self.removed.id},
+            ])
+        self.assertEqual(response.status_code, 200)
+        self.kept.refresh_from_db()
+        self.assertEqual((self.kept.amount, self.kept.description), (Decimal('400'), 'editada'))
+        self.wallet.refresh_from_db()
+        self.assertEqual((self.wallet.balance, self.wallet.transaction_count), (Decimal('400'), 1))
+        call_command('rebuild_wallet_totals', verify=True, stdout=StringIO())
+        self.assertFalse(WalletMonthlySummary.objects.filter(month=1).exists())
+        self.assertEqual(WalletMonthlySummary.objects.get(month=2).total_amount, Decimal('400'))
+
+    def test_target_deleted_after_validation(self):
+        with self.after_validation(self.removed.delete):
+            response = self.post([
+                {'op': 'update', 'id': self.kept.id, 'data': {'amount': '1'}},
+                {'op': 'delete', 'id': self.removed.id},
+            ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['valid', 'error'])
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('100'))
+
+
+class ReadSerializerTests(TestCase):
+    """As listagens lidas de values() têm a mesma saída dos serializers do DRF"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('caio', 'caio@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Corretora')
+        for index, transaction_type in enumerate(['deposit', 'withdrawal', 'dividend']):
+            Transaction.objects.create(wallet=self.wallet, transaction_type=transaction_type,
+                                       amount=Decimal('10.5') * (index + 1), date=date(2025, 1, index + 1),
+                                       description='Ação' if index else None)
+        self.client.force_login(self.user)
+
+    def test_same_output_as_model_serializers(self):
+        queryset = Transaction.objects.order_by('-date', '-created_at', '-id')
+        self.assertEqual(TransactionReadSerializer(TransactionReadSerializer.values(queryset)).data,
+                         TransactionSerializer(queryset.select_related('wallet'), many=True).data)
+
+        response = self.client.get('/finances/api/transactions/')
+        self.assertEqual(response.json()['results'],
+                         json.loads(json.dumps(TransactionSerializer(queryset, many=True).data)))
+
+        response = self.client.get('/finances/api/wallets/')
+        expected = WalletSerializer(Wallet.objects.with_balances(), many=True).data
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected)))
+        self.assertEqual(response.json()['results'][0]['total_balance'], 21.0)
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        url = f'/finances/api/wallets/{self.wallet.id}/transactions/'
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        Transaction.objects.bulk_create([
+            Transaction(wallet=self.wallet, transaction_type='deposit', amount=1, date=date(2025, 2, 1))
+            for _ in range(30)
+        ])
+        with CaptureQueriesContext(connection) as more:
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), 20)
+        self.assertEqual(len(more.captured_queries), len(context.captured_queries))
+
+
+class ConditionalGetTests(TestCase):
+    """ETag/Last-Modified a partir da versão das carteiras, com 304 sem consultar transações"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('rui', 'rui@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.deposit = Transaction.objects.create(wallet=self.wallet, transaction_type='deposit',
+                                                  amount=Decimal('50'), date=date(2025, 1, 1))
+        self.client.force_login(self.user)
+
+    def assertNotModified(self, url, etag):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse([query for query in context.captured_queries if 'finances_transaction' in query['sql']])
+        self.assertFalse([query for query in context.captured_queries if 'finances_walletmonthlysummary' in query['sql']])
+
+    def test_endpoints(self):
+        urls = ['/finances/api/wallets/', f'/finances/api/wallets/{self.wallet.id}/transactions/',
+                '/finances/api/transactions/monthly_summary/?year=2025&month=1']
+        etags = {}
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            etags[url] = response['ETag']
+            self.assertNotModified(url, etags[url])
+        self.assertIn('Last-Modified', self.client.get(urls[1]))
+
+        # Editar só a descrição não altera os totais, mas muda a listagem
+        self.deposit.description = 'Salário'
+        self.deposit.save()
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etags[url])
+
+    def test_wallet_rename_and_delete_change_user_etag(self):
+        url = '/finances/api/wallets/'
+        first = self.client.get(url)['ETag']
+        self.wallet.name = 'Renomeada'
+        self.wallet.save()
+        renamed = self.client.get(url)['ETag']
+        self.assertNotEqual(renamed, first)
+
+        self.wallet.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=renamed).status_code, 200)
+        self.assertEqual(self.client.get('/finances/api/wallets/999/transactions/').status_code, 404)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Consultas token -> usuário em cache, invalidadas na revogação e na desativação"""
+
+    url = '/finances/api/wallets/summary/'
+    # SessionAuthentication vem primeiro e não define WWW-Authenticate: falhas respondem 403
+
+    def setUp(self):
+        caches['tokens'].clear()
+        self.user = User.objects.create_user('eva', 'eva@example.com', 'senha-segura-123')
+        self.token = Token.objects.create(user=self.user)
+
+    def get(self, key):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Token {key}')
+        token_queries = [query for query in context.captured_queries if 'authtoken_token' in query['sql']]
+        return response.status_code, len(token_queries)
+
+    def test_lookup_is_cached(self):
+        self.assertEqual(self.get(self.token.key), (200, 1))
+        self.assertEqual(self.get(self.token.key), (200, 0))
+        self.assertEqual(self.get('invalido'), (403, 1))
+
+    def test_regenerate_and_delete_revoke_immediately(self):
+        self.get(self.token.key)
+        response = self.client.post('/finances/api/regenerate-token/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        new_key = response.json()['token']
+        self.assertEqual(self.get(self.token.key)[0], 403)
+
+        self.assertEqual(self.get(new_key), (200, 1))
+        self.client.delete('/finances/api/delete-token/', HTTP_AUTHORIZATION=f'Token {new_key}')
+        self.assertEqual(self.get(new_key)[0], 403)
+
+    def test_deactivation_revokes_immediately(self):
+        self.get(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get(self.token.key)[0], 403)
+
+
+class AsyncReadViewsTests(TestCase):
+    """As views assíncronas devolvem o mesmo JSON dos endpoints síncronos"""
+
+    def setUp(self):
+        cache.clear()
+        caches['tokens'].clear()
+        self.user = User.objects.create_user('noa', 'noa@example.com', 'senha-segura-123')
+        wallet = Wallet.objects.create(user=self.user, name='Principal')
+        Wallet.objects.create(user=self.user, name='Reserva')
+        today = now().date()
+        for index, transaction_type in enumerate(['deposit', 'withdrawal', 'dividend'] * 10):
+            Transaction.objects.create(wallet=wallet, transaction_type=transaction_type,
+                                       amount=Decimal('7.35') * (index + 1), date=today - timedelta(days=index))
+        self.token = Token.objects.create(user=self.user)
+
+    def test_same_output_as_sync_endpoints(self):
+        self.client.force_login(self.user)
+        async_client = AsyncClient()
+        auth = {'Authorization': f'Token {self.token.key}'}
+        pairs = [
+            ('/finances/api/wallets/', '/finances/api/async/wallets/'),
+            ('/finances/api/wallets/summary/', '/finances/api/async/wallets/summary/'),
+            ('/finances/api/transactions/?page_size=7', '/finances/api/async/transactions/?page_size=7'),
+            ('/finances/api/transactions/monthly_summary/', '/finances/api/async/transactions/monthly_summary/'),
+        ]
+        for sync_url, async_url in pairs:
+            expected = self.client.get(sync_url).json()
+            response = async_to_sync(async_client.get)(async_url, headers=auth)
+            self.assertEqual(response.status_code, 200, async_url)
+            data = response.json()
+            for key in ('next', 'previous'):
+                if expected.get(key):
+                    expected[key] = expected[key].replace('/api/', '/api/async/')
+            self.assertEqual(data, expected, async_url)
+
+        next_url = async_to_sync(async_client.get)(pairs[2][1], headers=auth).json()['next']
+        next_page = async_to_sync(async_client.get)(next_url, headers=auth).json()
+        self.assertEqual(next_page['results'], self.client.get(
+            next_url.replace('/api/async/', '/api/')).json()['results'])
+
+    def test_dashboard_and_auth(self):
+        async_client = AsyncClient()
+        self.assertEqual(async_to_sync(async_client.get)('/finances/api/async/dashboard/').status_code, 403)
+
+        async_client.force_login(self.user)
+        data = async_to_sync(async_client.get)('/finances/api/async/dashboard/').json()
+        self.assertEqual(len(data['wallets']), 2)
+        self.assertEqual(data['total'], float(Wallet.objects.get(name='Principal').balance))
+        self.assertEqual(
+            data['rendimento_total'],
+            float(sum(t.amount for t in Transaction.objects.filter(transaction_type='dividend'))),
+        )
+        # A página síncrona reaproveita os indicadores calculados pela view assíncrona
+        self.assertEqual(dashboard_cache.stats()['misses'], 1)
+        self.client.force_login(self.user)
+        self.client.get(reverse('dashboard'))
+        self.assertEqual(dashboard_cache.stats()['hits'], 1)
+
+
+class SeriesTests(TestCase):
+    """Séries de fluxo e saldo agrupadas no banco, com lacunas preenchidas"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('teo', 'teo@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.other = Wallet.objects.create(user=self.user, name='Reserva')
+        for wallet, transaction_type, amount, day in [
+            (self.wallet, 'deposit', '1000', date(2024, 12, 20)),   # antes do intervalo
+            (self.wallet, 'deposit', '200', date(2025, 1, 6)),
+            (self.wallet, 'withdrawal', '50', date(2025, 1, 8)),
+            (self.wallet, 'dividend', '10', date(2025, 3, 31)),
+            (self.wallet, 'withdrawal', '400', date(2025, 5, 2)),   # depois do intervalo
+            (self.other, 'deposit', '70', date(2025, 2, 14)),
+        ]:
+            Transaction.objects.create(wallet=wallet, transaction_type=transaction_type,
+                                       amount=Decimal(amount), date=day)
+        self.client.force_login(self.user)
+
+    def test_monthly_wallet_series(self):
+        url = f'/finances/api/wallets/{self.wallet.id}/series/?start=2025-01-01&end=2025-03-31'
+        with CaptureQueriesContext(connection) as context:
+            data = self.client.get(url).json()
+        transaction_queries = [q for q in context.captured_queries if 'finances_transaction' in q['sql']]
+        self.assertEqual(len(transaction_queries), 1)
+
+        self.assertEqual(data['opening_balance'], 1000)
+        self.assertEqual(data['closing_balance'], 1160)
+        self.assertEqual([bucket['period'] for bucket in data['buckets']], ['2025-01-01', '2025-02-01', '2025-03-01'])
+        self.assertEqual([bucket['balance'] for bucket in data['buckets']], [1150, 1150, 1160])
+        self.assertEqual(data['buckets'][0]['deposits'], 200)
+        self.assertEqual(data['buckets'][0]['withdrawals'], 50)
+        self.assertEqual(data['buckets'][1]['transaction_count'], 0)
+
+    def test_weekly_all_wallets_and_validation(self):
+        data = self.client.get('/finances/api/wallets/series/?start=2025-02-10&end=2025-02-23&granularity=week').json()
+        self.assertEqual([bucket['period'] for bucket in data['buckets']], ['2025-02-10', '2025-02-17'])
+        self.assertEqual(data['opening_balance'], 1150)
+        self.assertEqual([bucket['balance'] for bucket in data['buckets']], [1220, 1220])
+
+        daily = self.client.get('/finances/api/wallets/series/?start=2025-01-01&end=2025-12-31&granularity=day').json()
+        self.assertEqual(len(daily['buckets']), 365)
+        self.assertEqual(daily['closing_balance'], 830)
+
+        self.assertEqual(self.client.get('/finances/api/wallets/series/?granularity=year').status_code, 400)
+        self.assertEqual(self.client.get('/finances/api/wallets/series/?start=2025-13-01').status_code, 400)
+        self.assertEqual(self.client.get('/finances/api/wallets/series/?start=2000-01-01&granularity=day').status_code, 400)
+
+
+@skipUnless(analytics.is_available(), 'NumPy não instalado')
+class AnalyticsTests(TestCase):
+    """Indicadores vetorizados conferidos com valores calculados à mão"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bia', 'bia@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.other = Wallet.objects.create(user=self.user, name='Reserva')
+        for wallet, transaction_type, amount, day in [
+            (self.wallet, 'deposit', '1000', date(2025, 1, 2)),
+            (self.wallet, 'dividend', '10', date(2025, 1, 20)),
+            (self.wallet, 'withdrawal', '500', date(2025, 2, 10)),   # pico 1010 -> 510
+            (self.wallet, 'dividend', '20', date(2025, 4, 5)),       # março sem transações
+            (self.other, 'deposit', '100', date(2025, 2, 1)),
+        ]:
+            Transaction.objects.create(wallet=wallet, transaction_type=transaction_type,
+                                       amount=Decimal(amount), date=day)
+        self.client.force_login(self.user)
+
+    def test_wallet_metrics(self):
+        columns = analytics.load_columns(Transaction.objects.filter(wallet=self.wallet))
+        result = analytics.portfolio_analytics(columns, window=2)
+        monthly = result['monthly']
+        self.assertEqual(monthly['months'], ['2025-01', '2025-02', '2025-03', '2025-04'])
+        self.assertEqual(monthly['balance'], [1010, 510, 510, 530])
+        self.assertEqual(monthly['income_moving_average'], [10, 5, 0, 10])
+        self.assertEqual(monthly['dividend_yield'], [None, 0, 0, round(20 / 510, 6)])
+        self.assertEqual(result['drawdown']['max_drawdown'], round(500 / 1010, 6))
+        self.assertEqual((result['drawdown']['peak_date'], result['drawdown']['trough_date']),
+                         ('2025-01-20', '2025-02-10'))
+        self.assertEqual(result['contributions'],
+                         [{'wallet': self.wallet.id, 'contributions': 500, 'returns': 30,
+                           'return_on_contributions': 0.06}])
+
+    def test_api(self):
+        with CaptureQueriesContext(connection) as context:
+            data = self.client.get('/finances/api/wallets/analytics/').json()
+        self.assertEqual(len([q for q in context.captured_queries if 'finances_transaction' in q['sql']]), 1)
+        self.assertEqual(data['transaction_count'], 5)
+        self.assertEqual([row['wallet'] for row in data['contributions']], [self.wallet.id, self.other.id])
+
+        response = self.client.get(f'/finances/api/wallets/{self.other.id}/analytics/?window=0')
+        self.assertEqual(response.status_code, 400)
+        empty = Wallet.objects.create(user=self.user, name='Vazia')
+        data = self.client.get(f'/finances/api/wallets/{empty.id}/analytics/').json()
+        self.assertEqual((data['transaction_count'], data['monthly']['months']), (0, []))
+
+
+@skipUnless(analytics.is_available(), 'NumPy não instalado')
+class ForecastTests(TestCase):
+    """Projeção Monte Carlo: ajuste ao histórico, paralelismo determinístico e cache por versão"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('gil', 'gil@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Aposentadoria')
+        for month in range(1, 13):
+            Transaction.objects.create(wallet=self.wallet, transaction_type='deposit',
+                                       amount=Decimal('1000'), date=date(2024, month, 5))
+            Transaction.objects.create(wallet=self.wallet, transaction_type='dividend',
+                                       amount=Decimal(10 * month), date=date(2024, month, 25))
+        self.client.force_login(self.user)
+
+    def test_fit_and_parallel_matches_serial(self):
+        from . import forecasting
+        fitted = forecasting.fit(analytics.load_columns(Transaction.objects.filter(wallet=self.wallet)))
+        self.assertEqual((fitted.contribution_mean, fitted.contribution_std, fitted.history_months), (1000, 0, 12))
+        self.assertGreater(fitted.yield_mean, 0)
+
+        serial = forecasting.run_simulation(10000, fitted, 3, 12000, seed=7, workers=1)
+        parallel = forecasting.run_simulation(10000, fitted, 3, 12000, seed=7, workers=2, parallel_threshold=1)
+        self.assertEqual(serial, parallel)
+        # O pool do módulo é reaproveitado entre as chamadas
+        pool = forecasting.get_pool()
+        self.assertEqual(forecasting.run_simulation(10000, fitted, 3, 12000, seed=7, workers=2, parallel_threshold=1),
+                         serial)
+        self.assertIs(forecasting.get_pool(), pool)
+        self.assertEqual([band['year'] for band in serial], [1, 2, 3])
+        for band in serial:
+            self.assertLessEqual(band['p5'], band['p50'])
+            self.assertLessEqual(band['p50'], band['p95'])
+        # Sem variância nos aportes, o caminho mediano cresce pelo menos 12 mil por ano
+        self.assertGreater(serial[0]['p50'], 22000)
+
+    def test_api_cached_per_version(self):
+        url = f'/finances/api/wallets/{self.wallet.id}/forecast/?years=5&paths=2000'
+        first = self.client.get(url).json()
+        self.assertFalse(first['cached'])
+        self.assertEqual(len(first['bands']), 5)
+
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get(url).json()
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['bands'], first['bands'])
+        self.assertFalse([q for q in context.captured_queries if 'finances_transaction' in q['sql']])
+        # A carteira é lida uma única vez, com todos os campos da chave do cache
+        self.assertEqual(len([q for q in context.captured_queries if 'FROM "finances_wallet"' in q['sql']]), 1)
+
+        Transaction.objects.create(wallet=self.wallet, transaction_type='deposit',
+                                   amount=Decimal('5000'), date=date(2025, 1, 5))
+        self.assertFalse(self.client.get(url).json()['cached'])
+        self.assertEqual(self.client.get(url + '&paths=10').status_code, 400)
+
+    def test_cache_key_includes_shard_and_owner(self):
+        from . import forecasting
+        self.assertFalse(forecasting.forecast(self.wallet, years=2, paths=500)[1])
+        self.assertTrue(forecasting.forecast(self.wallet, years=2, paths=500)[1])
+        # Mesmo id e versão em outro shard, de outro usuário: não reaproveita a projeção
+        other = Wallet(pk=self.wallet.pk, user_id=self.user.pk + 1, version=self.wallet.version)
+        other._state.db = 'shard1'
+        self.assertFalse(forecasting.forecast(other, years=2, paths=500)[1])
+
+
+class RequestMetricsTests(TestCase):
+    """Server-Timing em cada resposta e histogramas por rota para staff"""
+
+    def setUp(self):
+        metrics.registry.reset()
+        self.user = User.objects.create_user('ana', 'ana@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.client.force_login(self.user)
+
+    def timings(self, response):
+        return {item.split(';')[0]: item for item in response['Server-Timing'].split(', ')}
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('wallet-list'))
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'view', 'render', 'total'})
+        self.assertRegex(timings['db'], r'desc="[1-9]\d* queries"')
+
+        # Views sem renderização adiada medem só a view
+        response = self.client.get(reverse('async_wallet_list'))
+        self.assertEqual(set(self.timings(response)), {'db', 'view', 'total'})
+
+    def test_metrics_endpoint_requires_staff(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+
+        self.client.get(reverse('wallet-list'))
+        self.client.get(reverse('wallet-list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('finances_requests_total{route="wallet-list",method="GET",status="200"} 2', text)
+        self.assertIn('finances_request_duration_seconds_count{route="wallet-list",method="GET"} 2', text)
+        self.assertIn('finances_request_db_queries_bucket{route="wallet-list",le="+Inf"} 2', text)
+        self.assertIn('finances_requests_total{route="metrics",method="GET",status="403"} 1', text)
+
+
+class RequestProfilingTests(TestCase):
+    """Perfil sob demanda: só para staff, gravado no diretório configurado"""
+    # O segundo usuário pode ficar em outro shard (com FINANCES_DB_SHARDS)
+    databases = '__all__'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        settings_override = override_settings(FINANCES_PROFILE_DIR=self.directory.name, FINANCES_PROFILE_KEEP=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('ana', 'ana@example.com', 'senha-segura-123', is_staff=True)
+        wallet = Wallet.objects.create(user=self.user, name='Principal')
+        Transaction.objects.create(wallet=wallet, transaction_type='deposit', amount=100, date=date(2025, 1, 10))
+
+    def test_ignored_for_non_staff(self):
+        user = User.objects.create_user('bia', 'bia@example.com', 'senha-segura-123')
+        self.client.force_login(user)
+        response = self.client.get(reverse('all_transactions') + '?_profile=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(os.listdir(self.directory.name), [])
+        self.assertEqual(self.client.get(reverse('profile_list')).status_code, 403)
+
+    def test_profile_saved_and_listed(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('all_transactions') + '?_profile=memory')
+        profile_id = response['X-Profile-Id']
+        self.assertTrue(os.path.isfile(os.path.join(self.directory.name, f'{profile_id}.prof')))
+
+        detail = self.client.get(reverse('profile_detail', args=[profile_id])).json()
+        self.assertEqual(detail['route'], 'all_transactions')
+        self.assertEqual(detail['user'], 'ana')
+        self.assertGreater(detail['query_count'], 0)
+        self.assertTrue(any('finances_transaction' in query['sql'] for query in detail['queries']))
+        self.assertTrue(detail['top_cumulative'])
+        self.assertIn('peak_kb', detail['memory'])
+
+        listed = self.client.get(reverse('profile_list')).json()
+        self.assertEqual([profile['id'] for profile in listed], [profile_id])
+        self.assertNotIn('queries', listed[0])
+        download = self.client.get(reverse('profile_download', args=[profile_id]))
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(self.client.get(reverse('profile_detail', args=['settings'])).status_code, 404)
+
+    def test_memory_skipped_while_traced_elsewhere(self):
+        self.client.force_login(self.user)
+        tracemalloc.start()
+        try:
+            response = self.client.get(reverse('all_transactions') + '?_profile=memory')
+            # O rastreamento de quem já o usava continua ativo
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(response.status_code, 200)
+        detail = self.client.get(reverse('profile_detail', args=[response['X-Profile-Id']])).json()
+        self.assertEqual(detail['memory'], {'skipped': True})
+        self.assertTrue(detail['top_cumulative'])
+
+    def test_token_header_and_pruning(self):
+        token = Token.objects.create(user=self.user)
+        for _ in range(3):
+            response = self.client.get(reverse('wallet-summary'), headers={
+                'Authorization': f'Token {token.key}', 'X-Profile': '1',
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('X-Profile-Id', response)
+        self.assertEqual(len(profiling.recent_profiles()), 2)
+        self.assertEqual(len(os.listdir(self.directory.name)), 4)
+
+
+@override_settings(FINANCES_READ_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Leituras nas réplicas só dentro de requisições e até a primeira escrita"""
+    # Sem a transação do TestCase: fora de atomic() as leituras podem ir às réplicas
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Wallet), 'default')
+        with override_settings(FINANCES_READ_REPLICAS=[]), routers.request_scope():
+            self.assertEqual(self.router.db_for_read(Wallet), 'default')
+
+    def test_write_pins_rest_of_request(self):
+        with routers.request_scope() as scope:
+            self.assertIn(self.router.db_for_read(Wallet), ['replica1', 'replica2'])
+            self.assertEqual(self.router.db_for_write(Transaction), 'default')
+            self.assertTrue(scope.pinned)
+            self.assertEqual(self.router.db_for_read(Wallet), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'finances'))
+        self.assertIsNone(self.router.allow_migrate('default', 'finances'))
+
+    def test_reads_inside_atomic_use_primary(self):
+        with routers.request_scope(), db_transaction.atomic():
+            self.assertEqual(self.router.db_for_read(Wallet), 'default')
+
+    def test_middleware_sets_pin_cookie_after_write(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Wallet))
+            if request.method == 'POST':
+                self.router.db_for_write(Transaction)
+                seen.append(self.router.db_for_read(Wallet))
+            return HttpResponse()
+
+        middleware = routers.ReplicaPinningMiddleware(view)
+        response = middleware(RequestFactory().post('/'))
+        self.assertNotEqual(seen[0], 'default')
+        self.assertEqual(seen[1], 'default')
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], settings.FINANCES_REPLICA_PIN_SECONDS)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        response = middleware(request)
+        self.assertEqual(seen[2], 'default')
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_sync_replica_copies_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source, target = os.path.join(directory, 'a.sqlite3'), os.path.join(directory, 'b.sqlite3')
+            with sqlite3.connect(source) as db:
+                db.execute('CREATE TABLE t (x INTEGER)')
+                db.executemany('INSERT INTO t VALUES (?)', [(1,), (2,)])
+            copy_database(source, target)
+            db = sqlite3.connect(target)
+            self.assertEqual(db.execute('SELECT SUM(x) FROM t').fetchone(), (3,))
+            db.close()
+        with self.assertRaises(CommandError):
+            call_command('sync_replica', stdout=StringIO())
+
+
+class SeedAndBenchmarkCommandTests(TestCase):
+    # Os comandos percorrem todos os shards (com FINANCES_DB_SHARDS)
+    databases = '__all__'
+
+    def test_seed_then_benchmark(self):
+        cache.clear()
+        call_command('seed_finances', users=2, wallets=2, transactions=300, years=2, seed=3,
+                     batch_size=250, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(self.count_transactions(), 1200)
+        self.assertEqual(
+            {kind for alias in settings.FINANCES_SHARDS
+             for kind in Transaction.objects.using(alias).values_list('transaction_type', flat=True)},
+            {'deposit', 'withdrawal', 'dividend'},
+        )
+        call_command('rebuild_wallet_totals', verify=True, stdout=StringIO())
+
+        out = StringIO()
+        call_command('benchmark_endpoints', iterations=3, warmup=0, only='api', stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['transactions'], 600)
+        self.assertNotIn('dashboard', report['endpoints'])
+        for name, result in report['endpoints'].items():
+            self.assertIn(result['status'], (200, 201), name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['queries'], 0)
+        # As escritas feitas pelos endpoints POST são desfeitas
+        self.assertEqual(self.count_transactions(), 1200)
+
+    def count_transactions(self):
+        return sum(Transaction.objects.using(alias).count() for alias in settings.FINANCES_SHARDS)
+
+
+class ConcurrencyBenchmarkTests(TransactionTestCase):
+    """As threads usam conexões próprias: sem a transação do TestCase"""
+    databases = '__all__'
+
+    def test_mixed_traffic_report(self):
+        cache.clear()
+        # Sem --user, o benchmark escolhe o usuário com mais transações somando todos os shards
+        other = User.objects.create_user('bia', 'bia@example.com', 'senha-segura-123')
+        with sharding.user_scope(other.pk):
+            Transaction.objects.create(wallet=Wallet.objects.create(user=other, name='Reserva'),
+                                       transaction_type='deposit', amount=1, date=date(2025, 1, 10))
+        user = User.objects.create_user('ana', 'ana@example.com', 'senha-segura-123')
+        with sharding.user_scope(user.pk):
+            wallet = Wallet.objects.create(user=user, name='Principal')
+            for amount in (60, 40):
+                Transaction.objects.create(wallet=wallet, transaction_type='deposit', amount=amount, date=date(2025, 1, 10))
+
+        out = StringIO()
+        call_command('benchmark_concurrency', threads=1, requests=12, write_ratio=0.5, seed=1, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['errors'], 0)
+        self.assertEqual(report['read']['count'] + report['write']['count'], 12)
+        self.assertGreater(report['write']['count'], 0)
+        self.assertEqual(report['meta']['profile'], settings.FINANCES_DB_PROFILE)
+        self.assertEqual(report['meta']['user'], 'ana')
+        # As transações criadas são removidas ao final, com os totais corrigidos
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.transaction_count, 2)
+        self.assertEqual(wallet.balance, Decimal('100'))
+
+
+@override_settings(FINANCES_SHARDS=['default', 'shard1', 'shard2'], FINANCES_SHARD_CACHE_ALIAS='default')
+class ShardRoutingTests(SimpleTestCase):
+    """Posição por hash e decisões do ShardRouter, sem consultas ao banco"""
+
+    def setUp(self):
+        self.router = routers.ShardRouter()
+        cache.clear()
+
+    def test_placement_is_stable_and_spreads_users(self):
+        shards = sharding.get_shards()
+        placed = [sharding.placement(user_id) for user_id in range(300)]
+        self.assertEqual(placed, [sharding.placement(user_id) for user_id in range(300)])
+        self.assertEqual(set(placed), set(shards))
+        # Um shard novo só recebe usuários; ninguém troca entre os antigos
+        grown = [sharding.placement(user_id, [*shards, 'shard3']) for user_id in range(300)]
+        changed = [(old, new) for old, new in zip(placed, grown) if old != new]
+        self.assertTrue(all(new == 'shard3' for old, new in changed))
+        self.assertLess(len(changed), 150)
+
+    def test_router_follows_scope_and_instances(self):
+        self.assertEqual(self.router.db_for_read(Wallet), 'default')
+        self.assertIsNone(self.router.db_for_read(User))
+        with sharding.shard_scope('shard2'):
+            self.assertEqual(self.router.db_for_read(Transaction), 'shard2')
+            self.assertEqual(self.router.db_for_write(WalletMonthlySummary), 'shard2')
+
+        cache.set(sharding._cache_key(7), 'shard1')
+        self.assertEqual(self.router.db_for_write(Wallet, instance=Wallet(user_id=7)), 'shard1')
+        self.assertEqual(self.router.db_for_read(Wallet, instance=User(pk=7)), 'shard1')
+        wallet = Wallet(user_id=7)
+        wallet._state.db = 'shard2'
+        self.assertEqual(self.router.db_for_write(Transaction, instance=Transaction(wallet=wallet)), 'shard2')
+        self.assertTrue(self.router.allow_relation(wallet, User(pk=7)))
+
+    def test_request_scope_uses_authenticated_user(self):
+        cache.set(sharding._cache_key(7), 'shard1')
+        request = RequestFactory().get('/')
+        seen = []
+
+        def view(request):
+            seen.append(sharding.current_shard())
+            request.user = User(pk=7)
+            seen.append(sharding.current_shard())
+            return HttpResponse()
+
+        request.user = AnonymousUser()
+        sharding.ShardScopeMiddleware(view)(request)
+        self.assertEqual(seen, ['default', 'shard1'])
+        self.assertEqual(sharding.current_shard(), 'default')
+
+    def test_single_shard_routes_nothing(self):
+        with override_settings(FINANCES_SHARDS=['default']), sharding.shard_scope('shard1'):
+            self.assertIsNone(self.router.db_for_read(Wallet))
+            self.assertEqual(sharding.shard_for_user(7), 'default')
+
+
+@override_settings(FINANCES_SHARDS=['default', 'shard1', 'shard2'])
+class ShardDirectoryTests(TestCase):
+    """Sem cache compartilhado, a posição vem sempre do diretório"""
+
+    def test_directory_is_read_without_process_cache(self):
+        user = User.objects.create_user('ana', 'ana@example.com', 'senha-segura-123')
+        # Posição antiga deixada no cache local por outro processo: ignorada
+        cache.set(sharding._cache_key(user.pk), 'shard2')
+        sharding.assign(user.pk, 'shard1')
+        self.assertEqual(sharding.shard_for_user(user.pk), 'shard1')
+        sharding.assign(user.pk, 'shard2')
+        with self.assertNumQueries(1):
+            self.assertEqual(sharding.shard_for_user(user.pk), 'shard2')
+
+
+@skipUnless(len(settings.FINANCES_SHARDS) > 1, 'defina FINANCES_DB_SHARDS para testar com vários shards')
+class ShardedStorageTests(TestCase):
+    """Dados de cada usuário inteiros no shard dele (rode com FINANCES_DB_SHARDS)"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', 'ana@example.com', 'senha-segura-123')
+        self.source = sharding.shard_for_user(self.user.pk)
+        self.target = next(alias for alias in settings.FINANCES_SHARDS if alias != self.source)
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        for day in range(1, 6):
+            Transaction.objects.create(wallet=self.wallet, transaction_type='deposit', amount=10,
+                                       date=date(2025, 1, day))
+
+    def test_writes_go_to_user_shard(self):
+        self.assertEqual(self.source, sharding.placement(self.user.pk))
+        self.assertEqual(self.wallet._state.db, self.source)
+        self.assertEqual(Transaction.objects.using(self.source).filter(wallet_id=self.wallet.pk).count(), 5)
+        self.assertEqual(list(self.user.wallets.all()), [self.wallet])
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('wallet-summary'))
+        self.assertEqual(response.json()['total_balance'], 50)
+
+    def test_move_user_copies_and_switches_directory(self):
+        archive.archive_wallet(self.wallet, date(2025, 1, 3))
+        copied = sharding.move_user(self.user.pk, self.source, self.target, batch_size=2)
+        self.assertEqual(copied, {
+            'wallets': 1, 'transactions': 3, 'monthly_summaries': 1,
+            'balance_checkpoints': ledger.months_between(date(2025, 1, 1), ledger.last_closed_month_end()),
+            'archived_transactions': 2, 'opening_balances': 1,
+        })
+        self.assertEqual(sharding.shard_for_user(self.user.pk), self.target)
+        self.assertFalse(Wallet.objects.using(self.source).filter(user_id=self.user.pk).exists())
+
+        wallet = self.user.wallets.get()
+        self.assertEqual(wallet._state.db, self.target)
+        self.assertEqual(wallet.balance, Decimal('50'))
+        self.assertEqual(wallet.created_at, self.wallet.created_at)
+        self.assertEqual(wallet.transactions.count(), 3)
+        self.assertEqual(wallet.opening_balance.balance, Decimal('20'))
+        self.assertEqual(wallet.balance_as_of(date(2025, 1, 4)), Decimal('40'))
+        call_command('rebuild_wallet_totals', verify=True, stdout=StringIO())
+
+    def test_export_streams_from_user_shard(self):
+        if self.source == 'default':
+            sharding.move_user(self.user.pk, self.source, self.target)
+        self.client.force_login(self.user)
+        response = self.client.get('/finances/api/transactions/export/?file_format=csv')
+        # O fluxo é lido depois que o escopo da requisição terminou
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 6)
+
+
+@skipUnless(len(settings.FINANCES_SHARDS) > 1, 'defina FINANCES_DB_SHARDS para testar com vários shards')
+class ShardMigrationTests(TransactionTestCase):
+    """As migrações de dados de um shard novo não tocam os dados dos outros bancos"""
+    databases = '__all__'
+
+    def test_migrating_shard_keeps_default_data(self):
+        user = User.objects.create_user('ana', 'ana@example.com', 'senha-segura-123')
+        sharding.assign(user.pk, 'default')
+        wallet = Wallet.objects.create(user=user, name='Principal')
+        for month in (1, 2):
+            Transaction.objects.create(wallet=wallet, transaction_type='deposit', amount=10, date=date(2025, month, 1))
+        summaries = list(WalletMonthlySummary.objects.using('default').values_list('wallet_id', 'month', 'total_amount'))
+
+        shard = settings.FINANCES_SHARDS[1]
+        call_command('migrate', 'finances', '0005', database=shard, verbosity=0)
+        call_command('migrate', 'finances', database=shard, verbosity=0)
+
+        self.assertEqual(
+            list(WalletMonthlySummary.objects.using('default').values_list('wallet_id', 'month', 'total_amount')),
+            summaries,
+        )
+        self.assertEqual(Wallet.objects.using('default').get(pk=wallet.pk).balance, Decimal('20'))
+        self.assertFalse(WalletMonthlySummary.objects.using(shard).exists())
+
+
+class ArchiveTests(TestCase):
+    """Transações antigas vão para o arquivo sem mudar saldos, séries e resumos"""
+    # Os comandos percorrem todos os shards (com FINANCES_DB_SHARDS)
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', 'ana@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        for transaction_type, amount, day in [
+            ('deposit', '1000', date(2022, 3, 5)),
+            ('withdrawal', '150', date(2022, 3, 20)),
+            ('dividend', '12.5', date(2023, 6, 1)),
+            ('deposit', '300', date(2025, 1, 10)),
+            ('withdrawal', '40', date(2025, 2, 3)),
+        ]:
+            Transaction.objects.create(wallet=self.wallet, transaction_type=transaction_type,
+                                       amount=Decimal(amount), date=day)
+        self.client.force_login(self.user)
+
+    def snapshot(self):
+        urls = [
+            f'/finances/api/wallets/{self.wallet.id}/',
+            f'/finances/api/wallets/{self.wallet.id}/series/?start=2022-01-01&end=2025-03-31&granularity=month',
+            '/finances/api/wallets/series/?start=2023-01-01&end=2025-03-31&granularity=week',
+            '/finances/api/transactions/yearly_summary/?year=2022',
+        ]
+        return [self.client.get(url).json() for url in urls]
+
+    def test_archive_keeps_totals_exact(self):
+        before = self.snapshot()
+        version = self.wallet.version
+        self.assertEqual(archive.archive_wallet(self.wallet, date(2024, 1, 1), batch_size=2), 3)
+
+        self.assertEqual(Transaction.objects.filter(wallet=self.wallet).count(), 2)
+        self.assertEqual(ArchivedTransaction.objects.filter(wallet=self.wallet).count(), 3)
+        opening = WalletOpeningBalance.objects.get(wallet=self.wallet)
+        self.assertEqual(opening.archived_before, date(2024, 1, 1))
+        self.assertEqual(opening.balance, Decimal('862.50'))
+        self.assertEqual(opening.transaction_count, 3)
+
+        self.assertEqual(self.snapshot(), before)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('1122.50'))
+        self.assertGreater(self.wallet.version, version)
+        self.assertEqual(ledger.live_totals([self.wallet.pk])[self.wallet.pk]['balance'], Decimal('1122.50'))
+        call_command('rebuild_wallet_totals', verify=True, stdout=StringIO())
+        call_command('rebuild_monthly_summaries', stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+
+        # Nada mais a arquivar: o saldo de abertura não muda
+        self.assertEqual(archive.archive_wallet(self.wallet, date(2024, 1, 1)), 0)
+
+    def test_archived_transactions_stay_readable(self):
+        call_command('archive_transactions', before='2024-01-01', stdout=StringIO())
+        data = self.client.get(f'/finances/api/wallets/{self.wallet.id}/archived_transactions/').json()
+        self.assertEqual([row['date'] for row in data['results']], ['2023-06-01', '2022-03-20', '2022-03-05'])
+        self.assertEqual(data['results'][0]['created_at'][:4], str(now().year))
+
+        response = self.client.get('/finances/api/transactions/export/?file_format=ndjson&archived=1')
+        dates = [json.loads(line)['date'] for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(dates, ['2022-03-05', '2022-03-20', '2023-06-01', '2025-01-10', '2025-02-03'])
+        response = self.client.get('/finances/api/transactions/export/?file_format=ndjson')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+
+    def test_period_totals_include_archive(self):
+        query = '?start=2022-01-01&end=2025-01-31'
+        before = self.client.get(reverse('wallet_detail', args=[self.wallet.id]) + query).context['totals']
+        archive.archive_wallet(self.wallet, date(2024, 1, 1))
+        for url in (reverse('wallet_detail', args=[self.wallet.id]), reverse('all_transactions')):
+            response = self.client.get(url + query)
+            self.assertEqual(response.context['totals'], {**before, 'count': 1})
+            self.assertEqual(response.context['transaction_count'], 1)
+        self.assertEqual(before['net'], Decimal('1162.50'))
+
+    def test_command_dry_run_and_opening_repair(self):
+        out = StringIO()
+        call_command('archive_transactions', days=365 * 100, dry_run=True, stdout=out)
+        self.assertIn('0 transações', out.getvalue())
+        call_command('archive_transactions', before='2024-01-01', dry_run=True, stdout=out)
+        self.assertEqual(ArchivedTransaction.objects.count(), 0)
+        with self.assertRaises(CommandError):
+            call_command('archive_transactions', before='2024-13-01', stdout=StringIO())
+
+        call_command('archive_transactions', before='2024-01-01', stdout=StringIO())
+        WalletOpeningBalance.objects.filter(wallet=self.wallet).update(balance=0)
+        # Totais e saldo de abertura divergentes: a carteira conta uma vez
+        Wallet.objects.filter(pk=self.wallet.pk).update(balance=0)
+        with self.assertRaisesMessage(CommandError, '1 de 1 carteiras'):
+            call_command('rebuild_wallet_totals', verify=True, stdout=StringIO())
+        out = StringIO()
+        call_command('rebuild_wallet_totals', stdout=out)
+        self.assertIn('1 carteiras processadas, 1 corrigidas', out.getvalue())
+        self.assertEqual(WalletOpeningBalance.objects.get(wallet=self.wallet).balance, Decimal('862.50'))
+        call_command('rebuild_wallet_totals', verify=True, stdout=StringIO())
+
+
+class BalanceCheckpointTests(TestCase):
+    """Saldo em uma data a partir dos checkpoints de fim de mês"""
+    # Os comandos percorrem todos os shards (com FINANCES_DB_SHARDS)
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('bia', 'bia@example.com', 'senha-segura-123')
+        self.wallet = Wallet.objects.create(user=self.user, name='Principal')
+        self.add('deposit', '1000', date(2025, 1, 10))
+        self.add('withdrawal', '200', date(2025, 3, 15))
+        self.add('dividend', '5', now().date())
+        self.client.force_login(self.user)
+
+    def add(self, transaction_type, amount, day):
+        return Transaction.objects.create(wallet=self.wallet, transaction_type=transaction_type,
+                                          amount=Decimal(amount), date=day)
+
+    def checkpoints(self):
+        return list(
+            WalletBalanceCheckpoint.objects.filter(wallet=self.wallet).order_by('date')
+            .values_list('date', 'balance', 'transaction_count')
+        )
+
+    def test_checkpoints_follow_back_dated_writes(self):
+        checkpoints = self.checkpoints()
+        self.assertEqual(len(checkpoints), ledger.months_between(date(2025, 1, 1), ledger.last_closed_month_end()))
+        self.assertEqual(checkpoints[:3], [
+            (date(2025, 1, 31), Decimal('1000'), 1),
+            (date(2025, 2, 28), Decimal('1000'), 1),
+            (date(2025, 3, 31), Decimal('800'), 2),
+        ])
+
+        # Lançamento com data antiga corrige todos os checkpoints a partir do mês dele
+        late = self.add('deposit', '50', date(2025, 2, 1))
+        self.assertEqual([row[1] for row in self.checkpoints()[:3]], [Decimal('1000'), Decimal('1050'), Decimal('850')])
+        late.date = date(2024, 12, 31)
+        late.save()
+        Transaction.objects.filter(transaction_type='withdrawal').delete()
+        self.assertEqual(self.wallet.balance_as_of(date(2024, 12, 31)), Decimal('50'))
+        self.assertEqual(self.wallet.balance_as_of(date(2025, 3, 31)), Decimal('1050'))
+        self.assertEqual(self.checkpoints()[-1][1:], (Decimal('1050'), 2))
+
+        with CaptureQueriesContext(connection) as context:
+            totals, checkpoint = self.wallet.totals_as_of(date(2025, 3, 20))
+        self.assertEqual(checkpoint, date(2025, 2, 28))
+        self.assertEqual(totals['total_deposits'], Decimal('1050'))
+        self.assertLessEqual(len(context.captured_queries), 3)
+
+        before = self.checkpoints()
+        call_command('rebuild_monthly_summaries', stdout=StringIO())
+        self.assertEqual(self.checkpoints(), before)
+
+        # Virada do mês: a primeira escrita no mês corrente cria o checkpoint do mês encerrado
+        WalletBalanceCheckpoint.objects.filter(date=ledger.last_closed_month_end()).delete()
+        self.add('deposit', '1', now().date())
+        self.assertEqual(self.checkpoints(), before)
+
+    def test_balance_endpoint(self):
+        archive.archive_wallet(self.wallet, date(2025, 2, 1))
+        url = f'/finances/api/wallets/{self.wallet.id}/balance/'
+        data = self.client.get(url, {'date': '2025-03-20'}).json()
+        self.assertEqual(data['balance'], 800)
+        self.assertEqual(data['withdrawals'], 200)
+        self.assertEqual(data['transaction_count'], 2)
+        self.assertEqual(data['checkpoint'], '2025-02-28')
+        self.assertEqual(self.client.get(url, {'date': '2025-01-09'}).json()['balance'], 0)
+        self.assertEqual(self.client.get(url).json()['balance'], 805)
+
+        self.assertEqual(self.client.get(url, {'date': '2025-02-30'}).status_code, 400)
+        other = User.objects.create_user('caio', 'caio@example.com', 'senha-segura-123')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -1,6 +1,9 @@
 from django.urls import path, include
 from . import views
 from . import token_views
+from . import async_views
+from . import metrics
+from . import profiling
 
 urlpatterns = [
     # URLs das views tradicionais (Function Based Views e Class Based Views)
@@ -16,6 +19,21 @@ urlpatterns = [
     # URLs de gerenciamento de tokens
     path('token-management/', token_views.token_management, name='token_management'),
     
+    # Versões assíncronas (ASGI) dos endpoints de leitura da API
+    path('api/async/wallets/', async_views.wallet_list, name='async_wallet_list'),
+    path('api/async/wallets/summary/', async_views.wallet_summary, name='async_wallet_summary'),
+    path('api/async/transactions/', async_views.transaction_list, name='async_transaction_list'),
+    path('api/async/transactions/monthly_summary/', async_views.monthly_summary, name='async_monthly_summary'),
+    path('api/async/dashboard/', async_views.dashboard_data, name='async_dashboard'),
+    
+    # Métricas por rota no formato do Prometheus (somente staff)
+    path('metrics/', metrics.metrics_view, name='metrics'),
+    
+    # Perfis de requisições feitos com ?_profile=1 (somente staff)
+    path('profiles/', profiling.profile_list, name='profile_list'),
+    path('profiles/<str:profile_id>/', profiling.profile_detail, name='profile_detail'),
+    path('profiles/<str:profile_id>/download/', profiling.profile_download, name='profile_download'),
+    
     # URLs da API REST (ViewSets)
     path('api/', include('finances.api_urls')),
 ]
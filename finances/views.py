@@ -1,14 +1,35 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils.dateparse import parse_date
 from django.utils.timezone import now
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
+from django.core.paginator import Paginator
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse
 from django.views.generic import TemplateView
 from datetime import timedelta
+from decimal import Decimal
+from . import dashboard_cache
 from .forms import WalletForm
-from .models import Wallet, Transaction
+from .models import ArchivedTransaction, Wallet, Transaction, WalletMonthlySummary
+
+
+def dividend_aggregates(today):
+    """Agregações dos rendimentos do dashboard sobre WalletMonthlySummary (tipo dividend)"""
+    last_month = today.replace(day=1) - timedelta(days=1)
+    
+    def dividend_sum(**period):
+        period_filter = models.Q(**period) if period else None
+        return Coalesce(models.Sum('total_amount', filter=period_filter), models.Value(Decimal('0')))
+    
+    return {
+        'rendimento_total': dividend_sum(),
+        'rendimento_mes_atual': dividend_sum(year=today.year, month=today.month),
+        'rendimento_mes_anterior': dividend_sum(year=last_month.year, month=last_month.month),
+        'rendimento_ano': dividend_sum(year=today.year),
+    }
 
 
 class DashboardView(LoginRequiredMixin, TemplateView):
@@ -21,44 +42,36 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         # Inicializa o formulário vazio por padrão
         context['form'] = WalletForm()
         
-        # Todas as carteiras do usuário
-        wallets = Wallet.objects.filter(user=user)
-        context['wallets'] = wallets
-        
-        # Total de todas as carteiras
-        total = sum([w.get_total_balance() for w in wallets])
-        context['total'] = float(total)
-        
-        # Todas as transações de rendimentos do usuário
-        from django.db.models import Q
-        transactions = Transaction.objects.filter(
-            Q(wallet__user=user, transaction_type="dividend")
-        )
-        
-        # Rendimento total
-        rendimento_total = transactions.aggregate(total_sum=models.Sum("amount"))["total_sum"]
-        context['rendimento_total'] = float(rendimento_total) if rendimento_total else 0.0
-        
-        # Datas para filtros
+        # Indicadores vêm do cache por usuário; só são recalculados após escritas
         today = now().date()
-        start_month = today.replace(day=1)
-        last_month_end = start_month - timedelta(days=1)
-        last_month_start = last_month_end.replace(day=1)
-        start_year = today.replace(month=1, day=1)
+        context.update(dashboard_cache.get_or_compute(
+            user.id, today, lambda: self._compute_kpis(user, today)
+        ))
         
-        # Rendimento mês atual
-        rendimento_mes_atual = transactions.filter(date__gte=start_month).aggregate(total_sum=models.Sum("amount"))["total_sum"]
-        context['rendimento_mes_atual'] = float(rendimento_mes_atual) if rendimento_mes_atual else 0.0
+        return context
+    
+    def _compute_kpis(self, user, today):
+        """Calcula os indicadores do dashboard em valores simples, prontos para o cache"""
+        # Todas as carteiras do usuário, com saldos calculados em uma única consulta
+        wallets = list(Wallet.objects.filter(user=user).with_balances())
+        kpis = {
+            'wallets': [
+                {'id': w.id, 'name': w.name, 'total_balance': float(w.total_balance)}
+                for w in wallets
+            ],
+        }
         
-        # Rendimento mês anterior
-        rendimento_mes_anterior = transactions.filter(date__gte=last_month_start, date__lte=last_month_end).aggregate(total_sum=models.Sum("amount"))["total_sum"]
-        context['rendimento_mes_anterior'] = float(rendimento_mes_anterior) if rendimento_mes_anterior else 0.0
+        # Total de todas as carteiras
+        kpis['total'] = float(sum(w.total_balance for w in wallets))
         
-        # Rendimento no ano
-        rendimento_ano = transactions.filter(date__gte=start_year).aggregate(total_sum=models.Sum("amount"))["total_sum"]
-        context['rendimento_ano'] = float(rendimento_ano) if rendimento_ano else 0.0
+        # Rendimentos (total, mês atual, mês anterior e ano) em uma única
+        # consulta sobre os resumos mensais, sem varrer as transações
+        dividends = WalletMonthlySummary.objects.filter(
+            wallet__user=user, transaction_type="dividend"
+        ).aggregate(**dividend_aggregates(today))
+        kpis.update({key: float(value) for key, value in dividends.items()})
         
-        return context
+        return kpis
     
     def post(self, request, *args, **kwargs):
         user = request.user
@@ -140,6 +153,82 @@ def add_wallet(request):
         return redirect("dashboard")
 
 
+TRANSACTIONS_PER_PAGE = 50
+
+# Tipos aceitos no filtro das listagens
+TRANSACTION_TYPES = dict(Transaction._meta.get_field('transaction_type').choices)
+
+
+def _date_param(value):
+    """Converte um parâmetro AAAA-MM-DD em date, ignorando valores inválidos"""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def _transaction_listing(request, transactions, archived=None):
+    """
+    Aplica os filtros da query string (start, end, type), calcula os totais do
+    conjunto filtrado no banco e devolve apenas a página pedida. Com filtros,
+    as transações arquivadas (``archived``) entram também nos totais do
+    período, mas não na listagem.
+    """
+    filters = {
+        'start': _date_param(request.GET.get('start')),
+        'end': _date_param(request.GET.get('end')),
+        'type': request.GET.get('type') if request.GET.get('type') in TRANSACTION_TYPES else '',
+    }
+
+    def apply_filters(queryset):
+        if filters['start']:
+            queryset = queryset.filter(date__gte=filters['start'])
+        if filters['end']:
+            queryset = queryset.filter(date__lte=filters['end'])
+        if filters['type']:
+            queryset = queryset.filter(transaction_type=filters['type'])
+        return queryset
+
+    def type_sum(transaction_type):
+        return Coalesce(models.Sum('amount', filter=models.Q(transaction_type=transaction_type)), models.Value(Decimal('0')))
+
+    def period_totals(queryset):
+        return queryset.order_by().aggregate(
+            deposits=type_sum('deposit'),
+            withdrawals=type_sum('withdrawal'),
+            dividends=type_sum('dividend'),
+            count=models.Count('id'),
+        )
+
+    # Totais e contagem do conjunto filtrado em uma única consulta
+    transactions = apply_filters(transactions)
+    totals = period_totals(transactions)
+    if archived is not None and any(filters.values()):
+        # Períodos anteriores ao arquivamento: os totais somam também o arquivo
+        archived_totals = period_totals(apply_filters(archived))
+        for key in ('deposits', 'withdrawals', 'dividends'):
+            totals[key] += archived_totals[key]
+    totals['net'] = totals['deposits'] - totals['withdrawals'] + totals['dividends']
+
+    paginator = Paginator(transactions, TRANSACTIONS_PER_PAGE)
+    paginator.count = totals['count']  # evita um segundo COUNT(*)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    query = request.GET.copy()
+    query.pop('page', None)
+
+    return {
+        'transactions': page_obj.object_list,
+        'page_obj': page_obj,
+        'transaction_count': totals['count'],
+        'totals': totals,
+        'filters': filters,
+        'is_filtered': any(filters.values()),
+        'filter_query': query.urlencode(),
+        'transaction_types': TRANSACTION_TYPES,
+    }
+
+
 @login_required
 def all_transactions_view(request):
     """
@@ -147,38 +236,29 @@ def all_transactions_view(request):
     """
     user = request.user
     
-    # Buscar todas as transações do usuário (de carteiras)
-    from django.db.models import Q
+    # Transações do usuário (de carteiras); só a página pedida é carregada
     transactions = Transaction.objects.filter(
-        Q(wallet__user=user)
-    ).select_related('wallet').order_by('-date', '-created_at')
+        user=user
+    ).select_related('wallet').order_by('-date', '-created_at', '-id')
     
-    # Calcular total geral (simulando uma carteira principal)
-    total_balance = 0
-    for transaction in transactions:
-        if transaction.transaction_type == 'deposit':
-            total_balance += float(transaction.amount)
-        elif transaction.transaction_type == 'withdrawal':
-            total_balance -= float(transaction.amount)
-        elif transaction.transaction_type == 'dividend':
-            total_balance += float(transaction.amount)
+    # Saldo geral a partir dos saldos armazenados das carteiras
+    total_balance = Wallet.objects.filter(user=user).aggregate(total=models.Sum('balance'))['total'] or 0
     
     # Criar um objeto "carteira virtual" para usar no template
     class VirtualWallet:
-        def __init__(self, name, balance, transactions):
+        def __init__(self, name, balance):
             self.name = name
             self.balance = balance
-            self.transactions = transactions
         
         def get_total_balance(self):
             return f"{self.balance:.2f}"
     
-    virtual_wallet = VirtualWallet("Todas as Carteiras", total_balance, transactions)
+    virtual_wallet = VirtualWallet("Todas as Carteiras", total_balance)
 
     context = {
         'wallet': virtual_wallet,
-        'transactions': transactions,
-        'is_all_transactions': True  # Flag para identificar que é a view de todas as transações
+        'is_all_transactions': True,  # Flag para identificar que é a view de todas as transações
+        **_transaction_listing(request, transactions, ArchivedTransaction.objects.filter(wallet__user=user)),
     }
     
     return render(request, "finances/wallet_detail.html", context)
@@ -188,12 +268,12 @@ def all_transactions_view(request):
 def wallet_detail(request, wallet_id):
     wallet = get_object_or_404(Wallet, id=wallet_id, user=request.user)
     
-    # Buscar todas as transações da carteira
-    transactions = Transaction.objects.filter(wallet=wallet).order_by('-date', '-created_at')
+    # Transações da carteira, filtradas e paginadas
+    transactions = Transaction.objects.filter(wallet=wallet).order_by('-date', '-created_at', '-id')
     
     context = {
         "wallet": wallet,
-        "transactions": transactions,
+        **_transaction_listing(request, transactions, ArchivedTransaction.objects.filter(wallet=wallet)),
     }
     return render(request, "finances/wallet_detail.html", context)
 